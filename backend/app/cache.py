@@ -0,0 +1,91 @@
+# backend/app/cache.py
+# Cache simples em memória (por processo) com tempo de expiração, usado pelos routers
+# para respostas de leitura que mudam pouco (ex: ambientes).
+
+# =============================================
+# Importações
+# =============================================
+import os # Leitura das configurações via variáveis de ambiente
+import time # time.monotonic para controlar a expiração (não é afetado por ajustes no relógio)
+from typing import Any, Dict, Hashable, Optional, Tuple # Type hints
+
+# =============================================
+# Configuração
+# =============================================
+# Tempo de vida (em segundos) das respostas de ambientes em cache.
+# O cache é por processo: com vários workers, uma escrita só limpa o cache do worker que a recebeu,
+# e os demais podem servir o dado antigo até o TTL vencer. Por isso o TTL é curto e configurável.
+AMBIENTES_CACHE_TTL = int(os.getenv("AMBIENTES_CACHE_TTL", "300"))
+# Máximo de respostas de ambientes guardadas: a chave da listagem vem de skip/limit/filtros do cliente,
+# então sem limite qualquer usuário logado poderia encher a memória do worker variando os parâmetros.
+AMBIENTES_CACHE_MAX = int(os.getenv("AMBIENTES_CACHE_MAX", "200"))
+
+# Tempo de vida (em segundos) das respostas do dashboard público (GET /reservas/dashboard/dia-turno).
+# Bem menor que o dos ambientes: reservas mudam o tempo todo (mesma ressalva dos vários workers).
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "30"))
+# Máximo de combinações (data, turno) guardadas: a rota é pública e aceita qualquer data.
+DASHBOARD_CACHE_MAX = int(os.getenv("DASHBOARD_CACHE_MAX", "1000"))
+
+
+# =============================================
+# Cache com TTL
+# =============================================
+class TTLCache:
+    """
+    Dicionário chave -> valor em que cada entrada expira após 'ttl' segundos.
+
+    Sem 'max_entradas', não tem limite de tamanho: só deve guardar conjuntos pequenos e limitados
+    de chaves (ex: combinações de filtros de uma listagem). Para desligar, use ttl=0.
+
+    'geracao' muda a cada clear(): quem calcula um valor depois de um await (consulta, streaming)
+    guarda a geração lida antes e a repassa ao set(), que descarta o valor se o cache foi limpo
+    no meio do caminho (o valor pode ter sido calculado com dados anteriores à escrita).
+    """
+
+    def __init__(self, ttl: int, max_entradas: Optional[int] = None):
+        self.ttl = ttl
+        self.max_entradas = max_entradas # Limite de entradas (None = sem limite)
+        self.geracao = 0 # Incrementada a cada clear()
+        self._dados: Dict[Hashable, Tuple[float, Any]] = {} # chave -> (instante de expiração, valor)
+
+    def get(self, chave: Hashable) -> Optional[Any]:
+        """Retorna o valor em cache para a chave, ou None se não existir ou tiver expirado."""
+        entrada = self._dados.get(chave)
+        if entrada is None:
+            return None
+        expira_em, valor = entrada
+        if time.monotonic() >= expira_em:
+            self._dados.pop(chave, None) # Entrada vencida: remove
+            return None
+        return valor
+
+    def set(self, chave: Hashable, valor: Any, geracao: Optional[int] = None) -> None:
+        """
+        Guarda o valor para a chave (ignorado se o cache estiver desligado com ttl <= 0).
+        Com 'geracao', também é ignorado se o cache foi limpo depois que ela foi lida.
+        Com o cache cheio, descarta as entradas vencidas e, se ainda faltar espaço, a mais antiga.
+        """
+        if self.ttl <= 0 or (geracao is not None and geracao != self.geracao):
+            return
+        agora = time.monotonic()
+        if self.max_entradas is not None and chave not in self._dados and len(self._dados) >= self.max_entradas:
+            self._dados = {k: e for k, e in self._dados.items() if e[0] > agora}
+            if len(self._dados) >= self.max_entradas:
+                # O TTL é o mesmo para todas: a primeira inserida (ordem do dict) é a que vence antes.
+                self._dados.pop(next(iter(self._dados)))
+        self._dados[chave] = (agora + self.ttl, valor)
+
+    def clear(self) -> None:
+        """Remove todas as entradas (chamado pelas rotas de escrita para invalidar o cache)."""
+        self._dados.clear()
+        self.geracao += 1
+
+
+# Respostas de GET /ambientes e GET /ambientes/{id}, já serializadas em JSON (bytes).
+# Limpo por criar/atualizar/deletar ambiente.
+ambientes_cache = TTLCache(AMBIENTES_CACHE_TTL, max_entradas=AMBIENTES_CACHE_MAX)
+
+# Respostas de GET /reservas/dashboard/dia-turno por (data, turno), já serializadas em JSON (bytes).
+# Limpo por qualquer escrita em reservas e pela atualização de ambientes (nome/tipo aparecem no dashboard).
+# Mudança de nome de usuário só aparece depois do TTL.
+dashboard_cache = TTLCache(DASHBOARD_CACHE_TTL, max_entradas=DASHBOARD_CACHE_MAX)
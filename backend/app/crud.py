@@ -5,10 +5,14 @@
 # Importações
 # =============================================
 import logging # Importa o módulo de logging padrão do Python
+import asyncio # Para calcular vários hashes de senha em paralelo (criação em lote)
 from sqlalchemy.exc import IntegrityError, ProgrammingError # Importa exceção específica do SQLAlchemy
-from sqlmodel import Session, select, and_, or_ # Importa o necessário do SQLModel para consultas
+from sqlmodel import select, and_, or_ # Importa o necessário do SQLModel para consultas
+from sqlmodel.ext.asyncio.session import AsyncSession # Sessão assíncrona (todas as operações de banco usam await)
+from sqlalchemy import exists, delete, insert, update, lambda_stmt, bindparam, func, tuple_, literal, DateTime, Integer # EXISTS, DELETE/UPDATE ... RETURNING e statements pré-compilados
+from sqlalchemy.dialects.postgresql import insert as pg_insert # INSERT com suporte a ON CONFLICT / RETURNING (PostgreSQL)
 from fastapi import HTTPException, status # Importa exceções HTTP do FastAPI
-from typing import List, Optional # Importa tipos para type hints (listas e valores opcionais)
+from typing import List, Optional, AsyncIterator, Tuple # Importa tipos para type hints (listas e valores opcionais)
 import uuid # Importa uuid para lidar com IDs do tipo UUID
 from datetime import datetime, time, date, timezone
 # Importações dos seus módulos locais
@@ -16,40 +20,122 @@ from app.models import Usuario, TipoUsuario, Ambiente, TipoAmbiente, Reserva, St
 # Importa schemas relevantes. UsuarioUpdate será necessário para a função de atualização.
 from app.schemas import UsuarioCreate, UsuarioUpdate, AmbienteCreate, AmbienteUpdate, ReservaCreate, ReservaUpdate, HistoricoReservaRead, ReservaDashboard
 # Importa funções de segurança para hash e verificação de senhas
-from app.security import hash_password, verify_password
+# As versões assíncronas executam o bcrypt em um executor dedicado (fora do event loop).
+from app.security import hash_password, hash_password_async, verify_password_async, password_needs_rehash, HASH_WORKERS
 
 # Importações para carregar relacionamentos (útil para ReservaRead)
-from sqlalchemy.orm import selectinload, join # Importe selectinload
+from sqlalchemy.orm import joinedload, raiseload, aliased # Carregamento dos relacionamentos (joinedload/raiseload) e alias de entidade
+from sqlalchemy.orm.attributes import set_committed_value # Preenche um relacionamento já conhecido sem marcá-lo como alterado
+from app.database import DEBUG # Flag de desenvolvimento (ativa raiseload nas listagens)
+import app.database as database # Estado lido em tempo de execução (restricao_sobreposicao_confirmada, definido no startup)
 
 # =============================================
 # Configuração do Logger 
 # =============================================
-# Configuração básica para imprimir logs no console.
-# Em um ambiente de produção real, configurar para enviar logs para um sistema centralizado.
-logging.basicConfig(level=logging.INFO) # Define o nível mínimo de log a ser exibido
+# A configuração dos handlers/nível (logging.basicConfig) é feita uma única vez no main.py.
+# As mensagens usam formatação preguiçosa ("%s", args): a string só é montada se o log for emitido.
 logger = logging.getLogger(__name__) # Cria um logger específico para este módulo (app.crud)
 
+# Hash fictício usado em autenticar_usuario quando o e-mail não existe.
+# Verificar a senha contra ele garante que o login gaste o mesmo tempo de CPU
+# exista ou não o usuário (evita enumeração de contas por tempo de resposta).
+_DUMMY_HASH = hash_password("senha-ficticia")
+
+# Statements executados em toda requisição de login e nas checagens antes de deletar.
+# lambda_stmt guarda a construção/compilação em cache: nas chamadas seguintes o SQLAlchemy
+# só faz a busca no cache e aplica os parâmetros (bindparam) informados na execução.
+_STMT_CREDENCIAIS_POR_EMAIL = lambda_stmt(
+    lambda: select(Usuario.id, Usuario.senha_hash).where(Usuario.email == bindparam("email"))
+)
+_STMT_EMAIL_EM_USO = lambda_stmt(
+    lambda: select(exists().where(Usuario.email == bindparam("email")))
+)
+_STMT_AMBIENTE_TEM_RESERVAS = lambda_stmt(
+    lambda: select(exists().where(Reserva.ambiente_id == bindparam("ambiente_id")))
+)
+_STMT_USUARIO_TEM_RESERVAS = lambda_stmt(
+    lambda: select(exists().where(Reserva.usuario_id == bindparam("usuario_id")))
+)
+
+# Colunas de Usuario lidas pelo schema UsuarioRead (tudo menos o senha_hash).
+# Usadas com load_only quando o usuário vem aninhado em listagens de reservas.
+_COLUNAS_USUARIO_READ = (Usuario.id, Usuario.nome, Usuario.email, Usuario.tipo, Usuario.ativo, Usuario.data_criacao)
+
+# Checagem de sobreposição de verificar_disponibilidade_ambiente (chamada em toda criação de reserva).
+# Statement montado uma vez com bindparam: a estrutura é sempre a mesma, então a compilação fica em cache.
+# reserva_id_excluir = -1 quando não há reserva a excluir (nenhum id real é negativo).
+# Os status entram como parâmetro (expanding) porque valores Enum dentro do lambda não são rastreáveis.
+_STATUS_BLOQUEANTES = [StatusReserva.PENDENTE, StatusReserva.CONFIRMADA] # Status que ocupam o ambiente
+_STMT_RESERVA_SOBREPOSTA = lambda_stmt(
+    lambda: select(exists().where(
+        Reserva.ambiente_id == bindparam("ambiente_id"),
+        Reserva.status.in_(bindparam("status_bloqueantes", expanding=True)),
+        func.tstzrange(Reserva.data_inicio, Reserva.data_fim).op("&&")(func.tstzrange(
+            bindparam("data_inicio", type_=DateTime(timezone=True)),
+            bindparam("data_fim", type_=DateTime(timezone=True))
+        )),
+        Reserva.id != bindparam("reserva_id_excluir")
+    ))
+)
+
+# Carregamento dos relacionamentos aninhados por ReservaRead nas listagens de reservas.
+# usuario e ambiente são muitos-para-um com FK NOT NULL: joinedload(innerjoin=True) traz tudo
+# em um único SELECT com INNER JOIN (sem linhas duplicadas), em vez de 1 + 2 consultas do selectinload.
+# Do usuário, só as colunas usadas por UsuarioRead: o senha_hash nem sai do banco.
+# raiseload("*"): qualquer outro relacionamento acessado levanta erro em vez de gerar N+1.
+_OPCOES_RESERVA_READ = (
+    joinedload(Reserva.usuario, innerjoin=True).load_only(*_COLUNAS_USUARIO_READ).raiseload("*"),
+    joinedload(Reserva.ambiente, innerjoin=True).raiseload("*"),
+    raiseload("*"),
+)
+
+# Listagem de reservas sem filtros nem cursor (o caso mais comum de obter_reservas).
+# Montada uma vez com skip/limit como bindparam: nada de construir filtros a cada chamada,
+# e a forma fixa casa com o índice de cobertura idx_reserva_list_default (index-only scan).
+_STMT_RESERVAS_PADRAO = (
+    select(Reserva)
+    .options(*_OPCOES_RESERVA_READ)
+    .order_by(Reserva.data_inicio.desc(), Reserva.id.desc())
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+)
+
+# Listagem das reservas de um único usuário (GET /reservas/ de um usuário comum, sem outros filtros).
+# Mesmo esquema do statement acima, com o filtro por usuario_id fixo; usa o índice idx_reserva_usuario_list.
+_STMT_RESERVAS_DO_USUARIO = (
+    select(Reserva)
+    .options(*_OPCOES_RESERVA_READ)
+    .where(Reserva.usuario_id == bindparam("usuario_id"))
+    .order_by(Reserva.data_inicio.desc(), Reserva.id.desc())
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+)
+
+# Tamanho do lote buscado do cursor nas listagens em streaming (stream_usuarios/stream_ambientes).
+STREAM_YIELD_PER = 500
+
 
 # TODO: Definir Enums ou lógicas para Turnos
 # Ex: class Turno(str, Enum): manha = "manha"; tarde = "tarde"; noite = "noite"
 # Ou apenas usar strings literais e mapeá-las para períodos de tempo.
 # Vamos usar strings literais e mapear.
 # Ex: manha = 8:00 - 12:00, tarde = 13:00 - 18:00, noite = 19:00 - 23:00
+# Intervalo (início, fim) de cada turno do dashboard público.
+TURNOS: dict[str, tuple[time, time]] = {
+    'manha': (time(8, 0), time(12, 0)),  # 08:00 a 12:00
+    'tarde': (time(13, 0), time(18, 0)), # 13:00 a 18:00
+    'noite': (time(19, 0), time(23, 0)), # 19:00 a 23:00
+}
+
 def get_time_range_for_turno(turno: str) -> tuple[time, time] | None:
-    """Retorna o intervalo de tempo (hora, minuto) para um turno específico."""
-    if turno.lower() == 'manha':
-        return (time(8, 0), time(12, 0)) # 08:00 a 12:00
-    elif turno.lower() == 'tarde':
-        return (time(13, 0), time(18, 0)) # 13:00 a 18:00
-    elif turno.lower() == 'noite':
-        return (time(19, 0), time(23, 0)) # 19:00 a 23:00
-    return None # Turno inválido
+    """Retorna o intervalo de tempo (hora, minuto) para um turno específico (None se o turno for inválido)."""
+    return TURNOS.get(turno.lower())
 
 # =============================================
 # Funções CRUD para Usuário (Usuario)
 # =============================================
 
-def criar_usuario(usuario_create: UsuarioCreate, session: Session) -> Usuario:
+async def criar_usuario(usuario_create: UsuarioCreate, session: AsyncSession) -> Usuario:
     """
     Cria um novo usuário no banco de dados com senha hasheada e tipo padrão 'user'.
 
@@ -64,52 +150,69 @@ def criar_usuario(usuario_create: UsuarioCreate, session: Session) -> Usuario:
         HTTPException: Se o e-mail já estiver em uso (status 400) ou
                        se ocorrer um erro inesperado ao salvar no banco (status 500).
     """
-    # 1. Verifica se o e-mail já está cadastrado para garantir unicidade antes de tentar salvar.
-    # Usa .first() pois o campo email tem restrição UNIQUE no modelo, esperamos no máximo um resultado.
-    usuario_existente: Optional[Usuario] = session.exec(
-        select(Usuario).where(Usuario.email == usuario_create.email)
-    ).first()
-
-    if usuario_existente:
-        # Se encontrou um usuário com o mesmo e-mail, levanta uma exceção HTTP 400 Bad Request.
-        logger.warning(f"Tentativa de criar usuário com email duplicado: {usuario_create.email}")
+    # 0. Checagem barata ANTES do bcrypt: um SELECT EXISTS (statement em cache) descarta e-mails já
+    #    cadastrados sem pagar os ~100 ms de CPU do hash. Sem isso, uma rajada de cadastros duplicados
+    #    saturaria o executor de hash. O ON CONFLICT abaixo continua sendo a garantia atômica.
+    if (await session.exec(_STMT_EMAIL_EM_USO, params={"email": usuario_create.email})).scalar_one():
+        await session.rollback() # Encerra a transação aberta pelo SELECT
+        logger.warning("Tentativa de criar usuário com email duplicado: %s", usuario_create.email)
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, # 400: Requisição Inválida
+            status_code=status.HTTP_400_BAD_REQUEST,
             detail="E-mail já está em uso."
         )
 
-    # 2. Gera hash seguro da senha fornecida no schema de criação.
-    senha_hashed: str = hash_password(usuario_create.senha)
+    # 1. Gera hash seguro da senha fornecida no schema de criação.
+    #    O bcrypt roda no executor dedicado para não bloquear outras requisições.
+    senha_hashed: str = await hash_password_async(usuario_create.senha)
 
-    # 3. Cria uma instância do modelo ORM Usuario com os dados e a senha hasheada.
+    # 2. Cria uma instância do modelo ORM Usuario com os dados e a senha hasheada.
     # O tipo é forçado para 'user' por segurança, impedindo que um usuário comum se cadastre como admin.
-    novo_usuario = Usuario(
+    # Os campos 'id' e 'ativo' recebem os valores padrão definidos no modelo; 'data_criacao' fica None
+    # e é preenchido pelo banco (server_default).
+    dados_usuario = Usuario(
         nome=usuario_create.nome,
         email=usuario_create.email,
         senha_hash=senha_hashed,
         tipo=TipoUsuario.user,  # Define o tipo padrão (user)
-        # Os campos 'ativo' e 'data_criacao' usarão os valores padrão definidos no modelo (True e datetime.now()).
     )
 
-    # 4. Adiciona o novo objeto à sessão e tenta persistir as mudanças no banco.
-    session.add(novo_usuario) # Prepara o objeto para ser inserido/salvo
+    # 3. Insere o usuário em um único round trip: INSERT ... ON CONFLICT (email) DO NOTHING RETURNING.
+    #    A restrição UNIQUE do e-mail faz a checagem de duplicidade de forma atômica
+    #    (cobre a janela de corrida entre a checagem do passo 0 e o INSERT).
+    stmt = (
+        pg_insert(Usuario)
+        .values(**dados_usuario.model_dump(exclude_none=True)) # Sem os campos None: o banco aplica o DEFAULT now() em data_criacao
+        .on_conflict_do_nothing(index_elements=["email"])
+        .returning(Usuario)
+    )
     try:
-        session.commit() # Tenta commitar a transação (inserir no DB)
-        # Atualiza a instância do objeto Python com quaisquer dados gerados pelo banco (como o ID gerado, se fosse autoincremental).
-        # É crucial para ter o objeto completo e atualizado após o commit.
-        session.refresh(novo_usuario)
+        novo_usuario: Optional[Usuario] = (await session.exec(stmt)).scalars().first()
+
+        if novo_usuario is None:
+            # Nenhuma linha retornada: o e-mail já existe. Levanta uma exceção HTTP 400 Bad Request.
+            await session.rollback()
+            logger.warning("Tentativa de criar usuário com email duplicado: %s", usuario_create.email)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, # 400: Requisição Inválida
+                detail="E-mail já está em uso."
+            )
+
+        await session.commit() # Confirma a transação (o INSERT já foi executado)
+        # Sem refresh: o RETURNING já trouxe a linha completa para a instância.
+    except HTTPException:
+        raise
     except IntegrityError as e:
-        # Captura erros de integridade do banco que possam ocorrer durante o commit (ex: outra restrição UNIQUE que não o email que não foi checada antes).
-        session.rollback() # Desfaz quaisquer operações na sessão em caso de erro para manter o banco consistente.
-        logger.error(f"Erro de integridade ao salvar usuário {usuario_create.email}: {e}", exc_info=True) # Loga o erro com traceback.
+        # Captura erros de integridade do banco que possam ocorrer (ex: outra restrição que não a do e-mail).
+        await session.rollback() # Desfaz quaisquer operações na sessão em caso de erro para manter o banco consistente.
+        logger.error("Erro de integridade ao salvar usuário %s: %s", usuario_create.email, e, exc_info=True) # Loga o erro com traceback.
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, # 500: Erro Interno do Servidor
             detail="Ocorreu um erro inesperado ao salvar o usuário."
         )
     except Exception as e:
          # Captura quaisquer outros erros inesperados que possam acontecer durante commit/refresh.
-        session.rollback() # Desfaz as operações da sessão.
-        logger.error(f"Erro inesperado ao salvar usuário {usuario_create.email}: {e}", exc_info=True) # Loga o erro com traceback.
+        await session.rollback() # Desfaz as operações da sessão.
+        logger.error("Erro inesperado ao salvar usuário %s: %s", usuario_create.email, e, exc_info=True) # Loga o erro com traceback.
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ocorreu um erro interno no servidor."
@@ -117,7 +220,90 @@ def criar_usuario(usuario_create: UsuarioCreate, session: Session) -> Usuario:
 
     return novo_usuario # Retorna a instância do objeto Usuario criado, incluindo o ID gerado.
 
-def obter_usuario(session: Session, usuario_id: uuid.UUID) -> Usuario:
+async def criar_usuarios_bulk(session: AsyncSession, usuarios_create: List[UsuarioCreate]) -> List[Usuario]:
+    """
+    Cria vários usuários (tipo 'user') em uma única instrução INSERT e um único commit.
+    Usado em importações feitas por administradores, evitando um commit por usuário.
+
+    Args:
+        session: A sessão do banco de dados.
+        usuarios_create: Lista de objetos UsuarioCreate (nome, email, senha).
+
+    Returns:
+        Lista com as instâncias de Usuario efetivamente inseridas. E-mails já cadastrados
+        (ou repetidos dentro do próprio lote) são ignorados e não aparecem no retorno.
+
+    Raises:
+        HTTPException: Se ocorrer um erro inesperado ao salvar no banco (status 500).
+    """
+    if not usuarios_create:
+        return []
+
+    # 0. Descarta, antes de qualquer hash, os e-mails já cadastrados (um único SELECT ... IN) e os
+    #    repetidos dentro do próprio lote: o bcrypt só roda para linhas que de fato podem ser inseridas.
+    emails_em_uso = set((await session.exec(
+        select(Usuario.email).where(Usuario.email.in_([u.email for u in usuarios_create]))
+    )).all())
+    candidatos: List[UsuarioCreate] = []
+    for u in usuarios_create:
+        if u.email not in emails_em_uso:
+            emails_em_uso.add(u.email) # Próximas ocorrências do mesmo e-mail no lote são ignoradas
+            candidatos.append(u)
+
+    if not candidatos:
+        await session.rollback() # Encerra a transação aberta pelo SELECT
+        logger.warning("Criação em lote: %s usuário(s) ignorado(s) por e-mail já em uso.", len(usuarios_create))
+        return []
+
+    # 1. Gera os hashes das senhas em paralelo no executor dedicado.
+    #    O bcrypt libera o GIL, então as threads do executor calculam os hashes simultaneamente.
+    #    Em blocos do tamanho do executor: a fila dele é FIFO, e enviar o lote inteiro de uma vez
+    #    deixaria todo login/cadastro feito nesse meio tempo esperando atrás de todos os hashes.
+    #    Entre um bloco e outro, as requisições que chegaram entram na fila.
+    senhas_hashed: List[str] = []
+    for inicio in range(0, len(candidatos), HASH_WORKERS):
+        senhas_hashed.extend(await asyncio.gather(
+            *(hash_password_async(u.senha) for u in candidatos[inicio:inicio + HASH_WORKERS])
+        ))
+
+    # 2. Monta as linhas a inserir. Instanciar Usuario aplica os defaults do modelo (id, ativo);
+    #    data_criacao é omitida (exclude_none) para o banco preencher com now().
+    linhas = [
+        Usuario(
+            nome=u.nome,
+            email=u.email,
+            senha_hash=senha_hashed,
+            tipo=TipoUsuario.user, # Cadastro em lote nunca cria administradores
+        ).model_dump(exclude_none=True)
+        for u, senha_hashed in zip(candidatos, senhas_hashed)
+    ]
+
+    # 3. Um único INSERT multi-linha. ON CONFLICT (email) DO NOTHING descarta e-mails duplicados
+    #    sem abortar a transação; RETURNING devolve apenas as linhas realmente inseridas.
+    stmt = (
+        pg_insert(Usuario)
+        .values(linhas)
+        .on_conflict_do_nothing(index_elements=["email"])
+        .returning(Usuario)
+    )
+    try:
+        novos_usuarios: List[Usuario] = list((await session.exec(stmt)).scalars().all())
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        logger.error("Erro inesperado ao criar usuários em lote (%s registros): %s", len(linhas), e, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Ocorreu um erro interno no servidor ao salvar os usuários."
+        )
+
+    ignorados = len(usuarios_create) - len(novos_usuarios)
+    if ignorados:
+        logger.warning("Criação em lote: %s usuário(s) ignorado(s) por e-mail já em uso.", ignorados)
+
+    return novos_usuarios
+
+async def obter_usuario(session: AsyncSession, usuario_id: uuid.UUID) -> Usuario:
     """
     Busca um usuário no banco de dados pelo seu ID (UUID).
 
@@ -133,11 +319,11 @@ def obter_usuario(session: Session, usuario_id: uuid.UUID) -> Usuario:
     """
     # session.get() é a forma eficiente de buscar um objeto pela sua chave primária.
     # Ele retorna a instância do objeto ou None se não for encontrado.
-    usuario: Optional[Usuario] = session.get(Usuario, usuario_id)
+    usuario: Optional[Usuario] = await session.get(Usuario, usuario_id)
 
     if not usuario:
         # Se o usuário não foi encontrado, levanta uma exceção HTTP 404 Not Found.
-        logger.warning(f"Usuário com ID {usuario_id} não encontrado.")
+        logger.warning("Usuário com ID %s não encontrado.", usuario_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, # 404: Não Encontrado
             detail="Usuário não encontrado."
@@ -145,7 +331,7 @@ def obter_usuario(session: Session, usuario_id: uuid.UUID) -> Usuario:
 
     return usuario # Retorna a instância do objeto Usuario encontrado.
 
-def obter_usuarios(session: Session, skip: int = 0, limit: int = 100) -> List[Usuario]:
+async def obter_usuarios(session: AsyncSession, skip: int = 0, limit: int = 100) -> List[Usuario]:
     """
     Retorna uma lista paginada de usuários.
 
@@ -157,16 +343,43 @@ def obter_usuarios(session: Session, skip: int = 0, limit: int = 100) -> List[Us
     Returns:
         Uma lista de instâncias do modelo Usuario.
     """
-    # Cria uma query para selecionar usuários, aplica offset (skip) e limit.
     # Usa .all() para executar a query e obter todos os resultados.
-    usuarios: List[Usuario] = session.exec(
-        select(Usuario).offset(skip).limit(limit)
-    ).all()
+    usuarios: List[Usuario] = (await session.exec(_query_usuarios(skip, limit))).all()
 
     return usuarios # Retorna a lista de objetos Usuario.
 
-def atualizar_usuario(
-    session: Session,
+def _query_usuarios(skip: int, limit: int):
+    """Monta a query paginada de usuários (compartilhada entre a listagem e o streaming)."""
+    # Cria uma query para selecionar usuários, aplica offset (skip) e limit.
+    query = select(Usuario).offset(skip).limit(limit)
+    # O schema UsuarioRead não acessa 'reservas', então nenhum relacionamento é carregado.
+    # Em desenvolvimento, raiseload('*') faz qualquer lazy load acidental (N+1) falhar imediatamente.
+    if DEBUG:
+        query = query.options(raiseload("*"))
+    return query
+
+async def stream_usuarios(session: AsyncSession, skip: int = 0, limit: int = 100) -> AsyncIterator[Usuario]:
+    """
+    Versão em streaming de obter_usuarios: entrega os usuários um a um, buscando-os em lotes.
+
+    Args:
+        session: A sessão do banco de dados (deve permanecer aberta enquanto o iterador é consumido).
+        skip: O número de registros a serem pulados (para paginação).
+        limit: O número máximo de registros a serem retornados.
+
+    Returns:
+        Um iterador assíncrono de instâncias do modelo Usuario.
+    """
+    # yield_per usa um cursor no servidor: só STREAM_YIELD_PER linhas ficam na memória por vez,
+    # em vez da lista inteira (memória O(lote) e não O(limit)).
+    resultado = await session.stream_scalars(_query_usuarios(skip, limit).execution_options(yield_per=STREAM_YIELD_PER))
+    async for usuario in resultado:
+        yield usuario
+        # Tira a instância do identity map depois de entregue, senão a sessão acumularia todas elas.
+        session.expunge(usuario)
+
+async def atualizar_usuario(
+    session: AsyncSession,
     usuario_existente: Usuario, # A instância do usuário já obtida 
     usuario_update: UsuarioUpdate # Os dados de atualização fornecidos pelo usuário (schema de entrada)
 ) -> Usuario:
@@ -181,7 +394,7 @@ def atualizar_usuario(
                          (excluídos por exclude_unset=True no model_dump) NÃO são atualizados.
 
     Returns:
-        A instância do modelo Usuario atualizada (após o commit e refresh).
+        A instância do modelo Usuario atualizada (valores devolvidos pelo UPDATE ... RETURNING).
 
     Raises:
          HTTPException: Se ocorrer um erro inesperado ao salvar as mudanças no banco (status 500).
@@ -193,45 +406,51 @@ def atualizar_usuario(
     update_data = usuario_update.model_dump(exclude_unset=True)
 
     # 2. Trata a atualização da senha separadamente.
-    #    Se o campo 'senha' estiver presente no dicionário de atualização (foi enviado na requisição).
-    if "senha" in update_data and update_data["senha"] is not None:
-        # Remove a senha em texto puro do dicionário para não salvar no campo errado.
-        senha_plain = update_data.pop("senha")
+    #    A senha em texto puro nunca vai para o UPDATE; só gravamos o hash quando uma senha foi enviada.
+    senha_plain = update_data.pop("senha", None)
+    if senha_plain is not None:
         # Adiciona a senha hasheada ao dicionário com o nome correto do campo no modelo (senha_hash).
-        update_data["senha_hash"] = hash_password(senha_plain)
-
-    # 3. Aplica os dados de atualização (do dicionário update_data) à instância do usuário existente.
-    #    O método sqlmodel_update (disponível no SQLModel v2+) é a forma idiomática de fazer isso.
-    #    Ele itera sobre os itens do dicionário update_data e atualiza os atributos correspondentes
-    #    na instância usuario_existente.
-    usuario_existente.sqlmodel_update(update_data)
-
-
-    # 4. Adiciona a instância modificada à sessão.
-    #    Mesmo que a instância já esteja na sessão, chamar add() novamente
-    #    é uma boa prática para garantir que as mudanças sejam detectadas para o UPDATE.
-    session.add(usuario_existente)
+        update_data["senha_hash"] = await hash_password_async(senha_plain)
+
+    # Descarta campos enviados com o mesmo valor já gravado (ex: frontend que reenvia o formulário inteiro).
+    # A senha não entra nessa comparação: o bcrypt usa salt, então só dá para saber se ela foi enviada.
+    update_data = {
+        campo: valor for campo, valor in update_data.items()
+        if campo == "senha_hash" or getattr(usuario_existente, campo) != valor
+    }
+
+    # Nada a atualizar (PATCH vazio ou sem mudanças): devolve a instância sem ir ao banco.
+    if not update_data:
+        return usuario_existente
+
+    # 3. Emite um UPDATE direto (Core) com RETURNING, sem passar pelo unit of work do ORM
+    #    (histórico de atributos, varredura de objetos sujos, ordenação do flush).
+    #    O RETURNING traz a linha atualizada e sincroniza a instância já carregada na sessão.
+    stmt = (
+        update(Usuario)
+        .where(Usuario.id == usuario_existente.id)
+        .values(**update_data)
+        .returning(Usuario)
+    )
     try:
-        # 5. Commita a transação para persistir as mudanças no banco (executa o UPDATE).
-        session.commit()
-        # 6. Atualiza a instância do objeto Python com os dados do banco após o commit.
-        #    sqlmodel_update geralmente mantém a instância atualizada, mas refresh é seguro.
-        session.refresh(usuario_existente)
+        # 4. Executa o UPDATE e commita a transação.
+        usuario_atualizado: Usuario = (await session.exec(stmt)).scalars().one()
+        await session.commit()
     except Exception as e:
-        # Em caso de erro inesperado durante o commit, desfaz a transação.
-        session.rollback()
+        # Em caso de erro inesperado (ex: e-mail já usado por outro usuário), desfaz a transação.
+        await session.rollback()
         # Loga o erro para diagnóstico, incluindo o traceback.
-        logger.error(f"Erro inesperado ao atualizar usuário {usuario_existente.id}: {e}", exc_info=True)
+        logger.error("Erro inesperado ao atualizar usuário %s: %s", usuario_existente.id, e, exc_info=True)
         # Levanta uma HTTPException 500 para o cliente.
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ocorreu um erro interno no servidor ao atualizar o usuário."
         )
 
-    # 7. Retorna a instância do usuário atualizada.
-    return usuario_existente
+    # 5. Retorna a instância do usuário atualizada.
+    return usuario_atualizado
 
-def deletar_usuario(session: Session, usuario_id: uuid.UUID) -> Usuario:
+async def deletar_usuario(session: AsyncSession, usuario_id: uuid.UUID) -> Usuario:
     """
     Deleta um usuário do banco de dados pelo seu ID (UUID).
 
@@ -240,31 +459,35 @@ def deletar_usuario(session: Session, usuario_id: uuid.UUID) -> Usuario:
         usuario_id: O UUID do usuário a ser deletado.
 
     Returns:
-        A instância do modelo Usuario que foi deletada. (Nota: O objeto estará desanexado/stale após o commit).
+        A instância do modelo Usuario que foi deletada (dados retornados pelo próprio DELETE).
 
     Raises:
         HTTPException: Se o usuário com o ID fornecido não for encontrado (status 404).
     """
-    # Primeiro, busca o usuário para garantir que ele existe.
-    # Reutiliza a função obter_usuario que já trata o erro 404 se não encontrar.
-    usuario = obter_usuario(session, usuario_id) # Este já lança 404 se não existir
-
-    # Se chegou aqui, o usuário foi encontrado. Prepara para deletar.
-    session.delete(usuario) # Marca o objeto para ser deletado na próxima transação.
+    # DELETE ... WHERE id = :id RETURNING *: remove e devolve a linha em um único round trip.
+    # Se nenhuma linha voltar, o usuário não existia (sem SELECT prévio e sem corrida entre SELECT e DELETE).
+    stmt = delete(Usuario).where(Usuario.id == usuario_id).returning(Usuario)
     try:
-        session.commit() # Executa o DELETE no banco.
-        # Nota: session.refresh(usuario) não é geralmente útil após delete, o objeto está "morto" na sessão.
-        # Retornamos o objeto antes do commit para que quem chamou ainda tenha acesso aos seus dados (como ID).
+        usuario: Optional[Usuario] = (await session.exec(stmt)).scalars().first()
+        if usuario is None:
+            logger.warning("Usuário com ID %s não encontrado.", usuario_id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, # 404: Não Encontrado
+                detail="Usuário não encontrado."
+            )
+        await session.commit() # Confirma o DELETE no banco.
+    except HTTPException:
+        await session.rollback()
+        raise
     except Exception as e:
-        session.rollback()
-        logger.error(f"Erro inesperado ao deletar usuário {usuario_id}: {e}", exc_info=True)
+        await session.rollback()
+        logger.error("Erro inesperado ao deletar usuário %s: %s", usuario_id, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ocorreu um erro interno no servidor ao deletar o usuário."
         )
 
-    # Retorna a instância do usuário que foi deletada.
-    # O objeto pode não ser totalmente útil após o commit, mas confirma a operação.
+    # Retorna a instância montada a partir da linha removida (dados como estavam antes do DELETE).
     return usuario
 
 
@@ -272,7 +495,7 @@ def deletar_usuario(session: Session, usuario_id: uuid.UUID) -> Usuario:
 # Funções CRUD para Ambiente (Ambiente)
 # =============================================
 
-def criar_ambiente(ambiente_create: AmbienteCreate, session: Session) -> Ambiente:
+async def criar_ambiente(ambiente_create: AmbienteCreate, session: AsyncSession) -> Ambiente:
     """
     Cria um novo ambiente no banco de dados.
 
@@ -304,12 +527,11 @@ def criar_ambiente(ambiente_create: AmbienteCreate, session: Session) -> Ambient
     # 2. Adiciona o novo objeto à sessão e tenta persistir as mudanças.
     session.add(novo_ambiente)
     try:
-        session.commit()
-        session.refresh(novo_ambiente) # Atualiza a instância com o ID gerado pelo banco
+        await session.commit() # O ID gerado pelo banco volta no próprio INSERT (RETURNING), sem refresh
     except Exception as e:
          # Captura erros inesperados durante commit/refresh.
-        session.rollback()
-        logger.error(f"Erro inesperado ao salvar ambiente {ambiente_create.nome}: {e}", exc_info=True)
+        await session.rollback()
+        logger.error("Erro inesperado ao salvar ambiente %s: %s", ambiente_create.nome, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ocorreu um erro interno no servidor ao salvar o ambiente."
@@ -317,7 +539,7 @@ def criar_ambiente(ambiente_create: AmbienteCreate, session: Session) -> Ambient
 
     return novo_ambiente
 
-def obter_ambiente(session: Session, ambiente_id: int) -> Ambiente:
+async def obter_ambiente(session: AsyncSession, ambiente_id: int) -> Ambiente:
     """
     Busca um ambiente no banco de dados pelo seu ID.
 
@@ -332,10 +554,10 @@ def obter_ambiente(session: Session, ambiente_id: int) -> Ambiente:
         HTTPException: Se o ambiente com o ID fornecido não for encontrado (status 404).
     """
     # Usa session.get() para buscar um objeto pela chave primária.
-    ambiente: Optional[Ambiente] = session.get(Ambiente, ambiente_id)
+    ambiente: Optional[Ambiente] = await session.get(Ambiente, ambiente_id)
 
     if not ambiente:
-        logger.warning(f"Ambiente com ID {ambiente_id} não encontrado.")
+        logger.warning("Ambiente com ID %s não encontrado.", ambiente_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Ambiente não encontrado."
@@ -343,8 +565,8 @@ def obter_ambiente(session: Session, ambiente_id: int) -> Ambiente:
 
     return ambiente
 
-def obter_ambientes(
-    session: Session,
+async def obter_ambientes(
+    session: AsyncSession,
     skip: int = 0,
     limit: int = 100,
     tipo: Optional[TipoAmbiente] = None, # Opcional: Filtrar por tipo de ambiente
@@ -363,6 +585,13 @@ def obter_ambientes(
     Returns:
         Uma lista de instâncias do modelo Ambiente.
     """
+    # Executa a query e obtém todos os resultados
+    ambientes: List[Ambiente] = (await session.exec(_query_ambientes(skip, limit, tipo, ativo))).all()
+
+    return ambientes
+
+def _query_ambientes(skip: int, limit: int, tipo: Optional[TipoAmbiente], ativo: Optional[bool]):
+    """Monta a query filtrada e paginada de ambientes (compartilhada entre a listagem e o streaming)."""
     # Cria uma query para selecionar ambientes
     query = select(Ambiente)
 
@@ -374,14 +603,38 @@ def obter_ambientes(
 
     # Aplica offset (skip) e limit
     query = query.offset(skip).limit(limit)
+    # AmbienteRead não acessa 'reservas'; em desenvolvimento, lazy loads acidentais levantam erro.
+    if DEBUG:
+        query = query.options(raiseload("*"))
+    return query
 
-    # Executa a query e obtém todos os resultados
-    ambientes: List[Ambiente] = session.exec(query).all()
+async def stream_ambientes(
+    session: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    tipo: Optional[TipoAmbiente] = None,
+    ativo: Optional[bool] = None
+) -> AsyncIterator[Ambiente]:
+    """
+    Versão em streaming de obter_ambientes: entrega os ambientes um a um, buscando-os em lotes.
 
-    return ambientes
+    Args:
+        session: A sessão do banco de dados (deve permanecer aberta enquanto o iterador é consumido).
+        skip: O número de registros a serem pulados.
+        limit: O número máximo de registros a serem retornados.
+        tipo: Opcional. Filtra ambientes por TipoAmbiente.
+        ativo: Opcional. Filtra ambientes por status ativo (True/False).
 
-def atualizar_ambiente(
-    session: Session,
+    Returns:
+        Um iterador assíncrono de instâncias do modelo Ambiente.
+    """
+    resultado = await session.stream_scalars(_query_ambientes(skip, limit, tipo, ativo).execution_options(yield_per=STREAM_YIELD_PER))
+    async for ambiente in resultado:
+        yield ambiente
+        session.expunge(ambiente) # Mantém o identity map pequeno (ver stream_usuarios)
+
+async def atualizar_ambiente(
+    session: AsyncSession,
     ambiente_existente: Ambiente, # Instância do ambiente já obtida
     ambiente_update: AmbienteUpdate # Dados de atualização
 ) -> Ambiente:
@@ -402,25 +655,37 @@ def atualizar_ambiente(
     # Converte o schema de atualização para um dicionário, excluindo campos não definidos.
     update_data = ambiente_update.model_dump(exclude_unset=True)
 
-    # Aplica os dados de atualização à instância existente usando sqlmodel_update.
-    ambiente_existente.sqlmodel_update(update_data)
-
-    # Adiciona a instância modificada à sessão.
-    session.add(ambiente_existente)
+    # Descarta campos enviados com o mesmo valor já gravado.
+    update_data = {
+        campo: valor for campo, valor in update_data.items()
+        if getattr(ambiente_existente, campo) != valor
+    }
+
+    # Nada a atualizar (PATCH vazio ou sem mudanças): devolve a instância sem ir ao banco.
+    if not update_data:
+        return ambiente_existente
+
+    # UPDATE direto (Core) com RETURNING: evita o unit of work do ORM e já devolve a linha atualizada.
+    stmt = (
+        update(Ambiente)
+        .where(Ambiente.id == ambiente_existente.id)
+        .values(**update_data)
+        .returning(Ambiente)
+    )
     try:
-        session.commit()
-        session.refresh(ambiente_existente)
+        ambiente_atualizado: Ambiente = (await session.exec(stmt)).scalars().one()
+        await session.commit()
     except Exception as e:
-        session.rollback()
-        logger.error(f"Erro inesperado ao atualizar ambiente {ambiente_existente.id}: {e}", exc_info=True)
+        await session.rollback()
+        logger.error("Erro inesperado ao atualizar ambiente %s: %s", ambiente_existente.id, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ocorreu um erro interno no servidor ao atualizar o ambiente."
         )
 
-    return ambiente_existente
+    return ambiente_atualizado
 
-def deletar_ambiente(session: Session, ambiente_id: int) -> Ambiente:
+async def deletar_ambiente(session: AsyncSession, ambiente_id: int) -> Ambiente:
     """
     Deleta um ambiente do banco de dados pelo seu ID.
 
@@ -434,17 +699,23 @@ def deletar_ambiente(session: Session, ambiente_id: int) -> Ambiente:
     Raises:
         HTTPException: Se o ambiente com o ID fornecido não for encontrado (status 404).
     """
-    # Busca o ambiente para garantir que ele existe (obter_ambiente já lida com 404).
-    ambiente = obter_ambiente(session, ambiente_id) # Lança 404 se não existir
-
-    # Prepara para deletar.
-    session.delete(ambiente)
+    # DELETE ... RETURNING em um único round trip (nenhuma linha devolvida = ambiente inexistente).
+    stmt = delete(Ambiente).where(Ambiente.id == ambiente_id).returning(Ambiente)
     try:
-        session.commit()
-        # Retornamos o objeto antes do commit, mas ele pode não ser totalmente útil depois.
+        ambiente: Optional[Ambiente] = (await session.exec(stmt)).scalars().first()
+        if ambiente is None:
+            logger.warning("Ambiente com ID %s não encontrado.", ambiente_id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Ambiente não encontrado."
+            )
+        await session.commit()
+    except HTTPException:
+        await session.rollback()
+        raise
     except Exception as e:
-        session.rollback()
-        logger.error(f"Erro inesperado ao deletar ambiente {ambiente_id}: {e}", exc_info=True)
+        await session.rollback()
+        logger.error("Erro inesperado ao deletar ambiente %s: %s", ambiente_id, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ocorreu um erro interno no servidor ao deletar o ambiente."
@@ -453,7 +724,7 @@ def deletar_ambiente(session: Session, ambiente_id: int) -> Ambiente:
     # Retorna a instância do ambiente que foi deletada.
     return ambiente
 
-def ambiente_tem_reservas(session: Session, ambiente_id: int) -> bool:
+async def ambiente_tem_reservas(session: AsyncSession, ambiente_id: int) -> bool:
     """
     Verifica se um ambiente tem alguma reserva associada (ativa ou histórica).
 
@@ -465,11 +736,13 @@ def ambiente_tem_reservas(session: Session, ambiente_id: int) -> bool:
         True se o ambiente tiver pelo menos uma reserva (na tabela Reserva ou HistoricoReserva), False caso contrário.
     """
     # Verificar na tabela Reserva (onde a restrição FK está)
-    reserva_ativa = session.exec(
-        select(Reserva.id).where(Reserva.ambiente_id == ambiente_id).limit(1) # Limit 1 para eficiência
-    ).first()
+    # SELECT EXISTS(...): o banco para na primeira linha encontrada e devolve um booleano,
+    # sem projetar/materializar nenhuma coluna da reserva.
+    tem_reserva = (await session.exec(
+        _STMT_AMBIENTE_TEM_RESERVAS, params={"ambiente_id": ambiente_id}
+    )).scalar_one()
 
-    if reserva_ativa:
+    if tem_reserva:
         return True
 
     # Se você quer verificar histórico também (embora a restrição FK seja só na tabela Reserva), descomente e ajuste:
@@ -486,7 +759,7 @@ def ambiente_tem_reservas(session: Session, ambiente_id: int) -> bool:
 # Funções Específicas (Autenticação, Promoção/Demote, etc.)
 # =============================================
 
-def autenticar_usuario(session: Session, email: str, senha: str) -> Optional[Usuario]:
+async def autenticar_usuario(session: AsyncSession, email: str, senha: str) -> Optional[uuid.UUID]:
     """
     Autentica um usuário buscando por email e verificando a senha fornecida.
 
@@ -496,26 +769,42 @@ def autenticar_usuario(session: Session, email: str, senha: str) -> Optional[Usu
         senha: A senha em texto puro fornecida pelo usuário.
 
     Returns:
-        A instância do modelo Usuario se a autenticação for bem-sucedida (usuário encontrado e senha correta),
-        ou None caso contrário.
-    """
-    # 1. Buscar o usuário por email.
-    # Usa .first() pois email é UNIQUE.
-    usuario: Optional[Usuario] = session.exec(
-        select(Usuario).where(Usuario.email == email)
-    ).first()
-
-    # 2. Verificar se o usuário foi encontrado E se a senha fornecida corresponde ao hash armazenado.
-    # Usa verify_password() do módulo de segurança.
-    # Se o usuário não for encontrado (usuario is None) OU a senha não verificar, a condição falha.
-    if not usuario or not verify_password(senha, usuario.senha_hash):
-        # Se o usuário não foi encontrado OU a senha não corresponde, retorna None indicando falha na autenticação.
+        O ID (UUID) do usuário se a autenticação for bem-sucedida (usuário encontrado e senha correta),
+        ou None caso contrário. O ID é tudo o que o login precisa para gerar o token.
+    """
+    # 1. Buscar por email apenas as colunas usadas na autenticação (id e senha_hash),
+    #    em vez da linha inteira do usuário. Usa .first() pois email é UNIQUE.
+    credenciais = (await session.exec(
+        _STMT_CREDENCIAIS_POR_EMAIL, params={"email": email}
+    )).first()
+
+    # 2. Verifica a senha SEMPRE exatamente uma vez (bcrypt no executor dedicado): contra o hash
+    #    armazenado ou, se o e-mail não existe, contra o hash fictício. Assim todo login custa o mesmo
+    #    tempo de CPU (sem oráculo de tempo para enumerar e-mails) e a carga do executor fica previsível.
+    usuario_id, senha_hash = credenciais if credenciais else (None, _DUMMY_HASH)
+    senha_ok = await verify_password_async(senha, senha_hash)
+
+    # 3. Falha se o usuário não existe ou se a senha não corresponde.
+    if usuario_id is None or not senha_ok:
         return None
 
-    # 3. Se chegou aqui, o usuário existe e a senha está correta. A autenticação foi bem-sucedida.
-    return usuario # Retorna a instância do objeto Usuario autenticado.
-
-def promover_usuario_admin(session: Session, usuario_id: uuid.UUID) -> Usuario:
+    # 4. Se o hash foi gerado com um custo diferente do configurado (BCRYPT_ROUNDS),
+    #    aproveita a senha em texto puro (só disponível aqui) para regravá-lo com o custo atual.
+    #    Falhas nessa etapa não impedem o login.
+    if password_needs_rehash(senha_hash):
+        try:
+            novo_hash = await hash_password_async(senha)
+            await session.exec(update(Usuario).where(Usuario.id == usuario_id).values(senha_hash=novo_hash))
+            await session.commit()
+            logger.info("Hash de senha do usuário %s atualizado para o custo atual.", usuario_id)
+        except Exception as e:
+            await session.rollback()
+            logger.warning("Não foi possível atualizar o hash de senha do usuário %s: %s", usuario_id, e)
+
+    # 5. Se chegou aqui, o usuário existe e a senha está correta. A autenticação foi bem-sucedida.
+    return usuario_id # Retorna o ID do usuário autenticado.
+
+async def promover_usuario_admin(session: AsyncSession, usuario_id: uuid.UUID) -> Usuario:
     """
     Promove um usuário para o tipo 'admin'.
 
@@ -532,7 +821,7 @@ def promover_usuario_admin(session: Session, usuario_id: uuid.UUID) -> Usuario:
         # Opcional: Poderia levantar 400 se o usuário já for admin, dependendo da lógica de negócio desejada.
     """
     # Busca o usuário a ser promovido. Reutiliza obter_usuario que já trata o 404.
-    usuario_a_promover = obter_usuario(session, usuario_id) # Lança 404 se não existir
+    usuario_a_promover = await obter_usuario(session, usuario_id) # Lança 404 se não existir
 
     # Opcional: Verifique se já é admin se quiser um tratamento específico.
     # if usuario_a_promover.tipo == TipoUsuario.admin:
@@ -544,17 +833,16 @@ def promover_usuario_admin(session: Session, usuario_id: uuid.UUID) -> Usuario:
     # Adiciona a instância modificada à sessão (marca para update)
     session.add(usuario_a_promover)
     try:
-        session.commit() # Commita a transação (executa o UPDATE)
-        session.refresh(usuario_a_promover) # Atualiza a instância
+        await session.commit() # Commita a transação (executa o UPDATE); a instância já reflete a mudança
     except Exception as e: # Captura possíveis erros no commit
-        session.rollback()
-        logger.error(f"Erro inesperado ao promover usuário {usuario_id} para admin: {e}", exc_info=True)
+        await session.rollback()
+        logger.error("Erro inesperado ao promover usuário %s para admin: %s", usuario_id, e, exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro ao atualizar usuário no banco.")
 
     return usuario_a_promover # Retorna o objeto Usuario promovido.
 
 # Função para rebaixar admin para user
-def rebaixar_admin_para_usuario(session: Session, usuario_id: uuid.UUID) -> Usuario:
+async def rebaixar_admin_para_usuario(session: AsyncSession, usuario_id: uuid.UUID) -> Usuario:
     """
     Rebaixa um usuário com privilégios de administrador para o tipo 'user'.
     Requer privilégios de administrador para chamar esta função no router.
@@ -572,7 +860,7 @@ def rebaixar_admin_para_usuario(session: Session, usuario_id: uuid.UUID) -> Usua
                        se ocorrer um erro inesperado ao salvar (500).
     """
     # 1. Obter o usuário a ser rebaixado (obter_usuario já lida com 404).
-    usuario_a_rebaixar = obter_usuario(session, usuario_id) # Lança 404 se não existir
+    usuario_a_rebaixar = await obter_usuario(session, usuario_id) # Lança 404 se não existir
 
     # 2. Verificar se o usuário é realmente um administrador antes de tentar rebaixar.
     if usuario_a_rebaixar.tipo != TipoUsuario.admin:
@@ -592,17 +880,16 @@ def rebaixar_admin_para_usuario(session: Session, usuario_id: uuid.UUID) -> Usua
     # 4. Adicionar a instância modificada à sessão e commitar.
     session.add(usuario_a_rebaixar)
     try:
-        session.commit()
-        session.refresh(usuario_a_rebaixar) # Atualiza a instância
+        await session.commit() # A instância já reflete a mudança; sem refresh (SELECT extra)
     except Exception as e:
-        session.rollback()
-        logger.error(f"Erro inesperado ao rebaixar usuário {usuario_id} para user: {e}", exc_info=True)
+        await session.rollback()
+        logger.error("Erro inesperado ao rebaixar usuário %s para user: %s", usuario_id, e, exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro ao atualizar usuário no banco.")
 
     # 5. Retorna a instância do usuário rebaixado.
     return usuario_a_rebaixar
 
-def usuario_tem_reservas(session: Session, usuario_id: uuid.UUID) -> bool:
+async def usuario_tem_reservas(session: AsyncSession, usuario_id: uuid.UUID) -> bool:
     """
     Verifica se um usuário tem alguma reserva associada (ativa ou histórica).
 
@@ -614,11 +901,13 @@ def usuario_tem_reservas(session: Session, usuario_id: uuid.UUID) -> bool:
         True se o usuário tiver pelo menos uma reserva (na tabela Reserva ou HistoricoReserva), False caso contrário.
     """
     # Verificar na tabela Reserva
-    reserva_ativa = session.exec(
-        select(Reserva.id).where(Reserva.usuario_id == usuario_id).limit(1) # Limit 1 para eficiência
-    ).first()
+    # SELECT EXISTS(...): o banco para na primeira linha encontrada e devolve um booleano,
+    # sem projetar/materializar nenhuma coluna da reserva.
+    tem_reserva = (await session.exec(
+        _STMT_USUARIO_TEM_RESERVAS, params={"usuario_id": usuario_id}
+    )).scalar_one()
 
-    if reserva_ativa:
+    if tem_reserva:
         return True
 
     # Verificar na tabela HistoricoReserva (se considerar histórico também)
@@ -641,8 +930,8 @@ def usuario_tem_reservas(session: Session, usuario_id: uuid.UUID) -> bool:
 # Funções de Verificação de Disponibilidade
 # =============================================
 
-def verificar_disponibilidade_ambiente(
-    session: Session,
+async def verificar_disponibilidade_ambiente(
+    session: AsyncSession,
     ambiente_id: int,
     data_inicio: datetime,
     data_fim: datetime,
@@ -662,9 +951,9 @@ def verificar_disponibilidade_ambiente(
     Returns:
         True se o ambiente estiver disponível, False caso contrário.
     """
-    # Garante que data_inicio é antes de data_fim
-    if data_inicio >= data_fim:
-        logger.warning(f"Verificação de disponibilidade com datas inválidas: inicio={data_inicio}, fim={data_fim}")
+    # Garante que data_inicio é antes de data_fim (aceita datas com e sem fuso misturadas)
+    if not periodo_valido(data_inicio, data_fim):
+        logger.warning("Verificação de disponibilidade com datas inválidas: inicio=%s, fim=%s", data_inicio, data_fim)
         # Trate isso no validador do schema ou na função de criação/atualização do router/CRUD
         # Para esta função, simplesmente retorna False ou lança um erro.
         # Vamos retornar False, pois não está disponível com datas inválidas.
@@ -674,32 +963,52 @@ def verificar_disponibilidade_ambiente(
     # Consideramos sobreposição se os períodos se cruzam.
     # Duas datas [A, B] e [C, D] se sobrepõem se (A < D e C < B).
 
-    query = select(Reserva).where(
-        Reserva.ambiente_id == ambiente_id,
+    # A sobreposição é escrita com o operador de intervalos && sobre tstzrange(inicio, fim), a mesma
+    # expressão da restrição excl_reserva_sobreposicao: assim o planner usa o índice GiST dela.
+    # Limites [inicio, fim): equivale a (data_inicio < data_fim_nova E data_fim > data_inicio_nova).
+    # SELECT EXISTS(...): a resposta é um único booleano, sem montar (hidratar) nenhum objeto Reserva.
+    # O banco para na primeira linha sobreposta que encontrar.
+    # Usa o statement pré-montado do módulo (mesmos filtros de _condicoes_sobreposicao).
+    ha_sobreposicao: bool = (await session.exec(_STMT_RESERVA_SOBREPOSTA, params={
+        "ambiente_id": ambiente_id,
+        "data_inicio": data_inicio,
+        "data_fim": data_fim,
+        "reserva_id_excluir": reserva_id_excluir if reserva_id_excluir is not None else -1,
+        "status_bloqueantes": _STATUS_BLOQUEANTES,
+    })).scalar_one()
+
+    # Se existe reserva sobreposta -> ambiente NÃO está disponível.
+    return not ha_sobreposicao # Retorna True se NÃO encontrou sobreposição, False se encontrou.
+
+def _condicoes_sobreposicao(
+    entidade, # Reserva ou um alias dela (aliased(Reserva)) quando usada em subquery
+    ambiente_id: int,
+    data_inicio: datetime,
+    data_fim: datetime,
+    reserva_id_excluir: Optional[int] = None
+) -> list:
+    """Monta os filtros de 'reserva ativa do ambiente sobreposta ao período' sobre a entidade informada."""
+    condicoes = [
+        entidade.ambiente_id == ambiente_id,
         # Considera apenas status que bloqueiam a reserva
-        Reserva.status.in_([StatusReserva.PENDENTE, StatusReserva.CONFIRMADA]),
+        entidade.status.in_([StatusReserva.PENDENTE, StatusReserva.CONFIRMADA]),
         # Condição de sobreposição: a nova reserva começa antes do fim da existente E a existente começa antes do fim da nova.
-        and_(
-            Reserva.data_inicio < data_fim,
-            Reserva.data_fim > data_inicio
-        )
-    )
+        func.tstzrange(entidade.data_inicio, entidade.data_fim).op("&&")(func.tstzrange(data_inicio, data_fim))
+    ]
 
     # Se estiver verificando disponibilidade para uma atualização de reserva,
     # exclua a reserva original da checagem para evitar conflito com ela mesma.
     if reserva_id_excluir is not None:
-        query = query.where(Reserva.id != reserva_id_excluir)
-
-    # Executa a query para ver se encontra ALGUMA reserva sobreposta.
-    # Usamos .first() porque precisamos apenas saber se existe pelo menos uma.
-    reserva_sobreposta: Optional[Reserva] = session.exec(query).first()
+        condicoes.append(entidade.id != reserva_id_excluir)
+    return condicoes
 
-    # Se .first() retornou uma reserva, significa que há sobreposição -> ambiente NÃO está disponível.
-    return reserva_sobreposta is None # Retorna True se NÃO encontrou sobreposição, False se encontrou.
+def _viola_sobreposicao(erro: IntegrityError) -> bool:
+    """Indica se o IntegrityError veio da restrição de exclusão excl_reserva_sobreposicao (SQLSTATE 23P01)."""
+    return getattr(erro.orig, "sqlstate", None) == "23P01"
 
 # **NOVA FUNÇÃO:** Chamada por endpoint para verificar disponibilidade e retornar status
-def check_reserva_availability(
-    session: Session,
+async def check_reserva_availability(
+    session: AsyncSession,
     ambiente_id: int,
     data_inicio: datetime,
     data_fim: datetime,
@@ -723,7 +1032,7 @@ def check_reserva_availability(
         HTTPException: Se as datas forem inválidas (data_inicio >= data_fim) - Opcional, pode validar no frontend.
     """
     # Opcional: Validação de datas básicas aqui também (embora validateDates no frontend já faça)
-    if data_inicio >= data_fim:
+    if not periodo_valido(data_inicio, data_fim):
         # Levantar 400 aqui ou apenas retornar False?
         # Se retornar False, o endpoint chamador decide se é um 400 ou outra mensagem.
         # Vamos retornar False para simplicidade na função CRUD.
@@ -731,7 +1040,7 @@ def check_reserva_availability(
         return False
 
     # Chama a função de verificação de disponibilidade real.
-    is_available = verificar_disponibilidade_ambiente(
+    is_available = await verificar_disponibilidade_ambiente(
         session,
         ambiente_id,
         data_inicio,
@@ -745,11 +1054,16 @@ def check_reserva_availability(
 # Funções CRUD para Reserva (Reserva)
 # =============================================
 
-def criar_reserva(reserva_create: ReservaCreate, session: Session, usuario_id_para_reserva: uuid.UUID) -> Reserva: # <--- MODIFICADO: Aceita o ID a ser associado
+async def criar_reserva(reserva_create: ReservaCreate, session: AsyncSession, usuario_id_para_reserva: uuid.UUID) -> Reserva: # <--- MODIFICADO: Aceita o ID a ser associado
     """
-    Cria uma nova reserva no banco de dados para um usuário específico após verificar disponibilidade.
+    Cria uma nova reserva no banco de dados para um usuário específico.
     Define o status inicial como PENDENTE.
 
+    A disponibilidade é garantida pela restrição EXCLUDE excl_reserva_sobreposicao do banco:
+    o próprio INSERT falha (e vira 409) se houver sobreposição, sem janela entre checar e inserir.
+    Enquanto o startup não confirmar que a restrição existe (database.restricao_sobreposicao_confirmada),
+    a disponibilidade também é checada com um SELECT antes do INSERT.
+
     Args:
         reserva_create: Dados da reserva (ambiente_id, data_inicio, data_fim, motivo).
         session: Sessão do banco de dados.
@@ -763,19 +1077,26 @@ def criar_reserva(reserva_create: ReservaCreate, session: Session, usuario_id_pa
                        se ocorrer um erro inesperado ao salvar (500), ou
                        se ambiente_id não existir (se adicionar checagem).
     """
-    # Opcional: Verificar se o ambiente com ambiente_id existe (antes de verificar disponibilidade).
-
-    # 1. Verifica a disponibilidade do ambiente (como antes).
-    is_available = verificar_disponibilidade_ambiente(
+    # Carrega o ambiente e o usuário que o schema ReservaRead aninha na resposta.
+    # session.get consulta primeiro o identity map: o usuário já foi carregado pela rota
+    # (current_user ou a checagem do admin), então só o ambiente pode custar um SELECT.
+    # Isso substitui o refresh após o commit (que fazia uma nova consulta para cada relacionamento).
+    ambiente = await session.get(Ambiente, reserva_create.ambiente_id)
+    if ambiente is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ambiente não encontrado.")
+    usuario = await session.get(Usuario, usuario_id_para_reserva)
+
+    # 1. Sem a restrição confirmada no banco, a checagem explícita é a única proteção contra dupla reserva.
+    if not database.restricao_sobreposicao_confirmada and not await verificar_disponibilidade_ambiente(
         session,
         reserva_create.ambiente_id,
         reserva_create.data_inicio,
         reserva_create.data_fim
-    )
-
-    if not is_available:
-        # ... (lógica de erro 409) ...
-        raise HTTPException(...)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="O ambiente não está disponível para o período solicitado."
+        )
 
     # 2. Cria uma instância do modelo ORM Reserva.
     #    Usa o ID passado como parâmetro para associar a reserva.
@@ -787,19 +1108,136 @@ def criar_reserva(reserva_create: ReservaCreate, session: Session, usuario_id_pa
         motivo=reserva_create.motivo,
         status=StatusReserva.PENDENTE,
     )
+    nova_reserva.ambiente = ambiente
+    nova_reserva.usuario = usuario
 
-    # 3. Adiciona a nova reserva à sessão e salva (como antes).
+    # 3. Adiciona a nova reserva à sessão e salva.
     session.add(nova_reserva)
     try:
-        session.commit()
-        session.refresh(nova_reserva)
+        # id e demais colunas voltam no próprio INSERT (RETURNING); os relacionamentos já estão preenchidos.
+        await session.commit()
+    except IntegrityError as e:
+        await session.rollback()
+        if not _viola_sobreposicao(e):
+            # Ex: FK de um usuário excluído entre a checagem da rota e o INSERT.
+            logger.error("Reserva para o ambiente %s rejeitada pelo banco: %s", reserva_create.ambiente_id, e.orig)
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Dados da reserva inválidos.")
+        # Já existe reserva PENDENTE/CONFIRMADA sobreposta no mesmo ambiente
+        # (a restrição de exclusão do banco barrou a dupla reserva).
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="O ambiente não está disponível para o período solicitado."
+        )
     except Exception as e:
-        # ... (lógica de erro 500) ...
-        raise HTTPException(...)
+        await session.rollback()
+        logger.error("Erro inesperado ao salvar reserva para o ambiente %s: %s", reserva_create.ambiente_id, e, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Ocorreu um erro interno no servidor ao salvar a reserva."
+        )
 
     return nova_reserva
 
-def obter_reserva(session: Session, reserva_id: int) -> Reserva:
+async def criar_reservas_bulk(
+    session: AsyncSession,
+    reservas_create: List[ReservaCreate],
+    usuario_id_para_reserva: uuid.UUID
+) -> List[Reserva]:
+    """
+    Cria várias reservas (status PENDENTE) para um usuário em uma única transação.
+    Usado em importações e reservas recorrentes (ex: a mesma aula em todos os dias da semana).
+    Tudo ou nada: se alguma reserva estiver indisponível, nenhuma é criada.
+
+    Args:
+        session: Sessão do banco de dados.
+        reservas_create: Lista de ReservaCreate (ambiente_id, data_inicio, data_fim, motivo).
+        usuario_id_para_reserva: ID do usuário que será o responsável pelas reservas.
+
+    Returns:
+        Lista com as instâncias de Reserva criadas, na mesma ordem da entrada.
+
+    Raises:
+        HTTPException: Se algum ambiente não existir (404), se algum período for inválido,
+                       se sobrepor outra reserva do lote ou uma reserva ativa existente (409),
+                       ou se ocorrer um erro inesperado ao salvar (500).
+    """
+    if not reservas_create:
+        return []
+
+    # 1. Todos os ambientes do lote em um único SELECT (session.get um por um seria N consultas).
+    ids_ambientes = {r.ambiente_id for r in reservas_create}
+    ambientes = {a.id: a for a in (await session.exec(select(Ambiente).where(Ambiente.id.in_(ids_ambientes)))).all()}
+    if len(ambientes) != len(ids_ambientes):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ambiente não encontrado.")
+    usuario = await session.get(Usuario, usuario_id_para_reserva) # Já está no identity map (carregado pela rota)
+
+    # 2. Conflitos dentro do próprio lote: ordena por ambiente/início e compara cada reserva com a anterior.
+    #    Mesma regra do tstzrange [inicio, fim): reservas encostadas (fim == início) não conflitam.
+    periodos = sorted(
+        (r.ambiente_id, _como_utc(r.data_inicio), _como_utc(r.data_fim)) for r in reservas_create
+    )
+    anterior = None
+    for ambiente_id, data_inicio, data_fim in periodos:
+        if data_inicio >= data_fim or (
+            anterior is not None and anterior[0] == ambiente_id and data_inicio < anterior[2]
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="O lote contém períodos inválidos ou sobrepostos para o mesmo ambiente."
+            )
+        anterior = (ambiente_id, data_inicio, data_fim)
+
+    # 3. Conflitos com reservas ativas já gravadas: a restrição EXCLUDE barra o INSERT (ver criar_reserva)
+    #    e o lote inteiro é desfeito. Sem a restrição confirmada, uma única consulta com OR dos períodos do lote.
+    if not database.restricao_sobreposicao_confirmada:
+        conflito = (await session.exec(select(exists().where(or_(*(
+            and_(*_condicoes_sobreposicao(Reserva, ambiente_id, data_inicio, data_fim))
+            for ambiente_id, data_inicio, data_fim in periodos
+        )))))).first()
+        if conflito:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="O ambiente não está disponível para um ou mais períodos solicitados."
+            )
+
+    # 4. Um único flush/commit: o SQLAlchemy agrupa os INSERTs em lotes multi-linha com RETURNING.
+    novas_reservas = [
+        Reserva(
+            ambiente_id=r.ambiente_id,
+            usuario_id=usuario_id_para_reserva,
+            data_inicio=r.data_inicio,
+            data_fim=r.data_fim,
+            motivo=r.motivo,
+            status=StatusReserva.PENDENTE,
+            ambiente=ambientes[r.ambiente_id], # Relacionamentos já conhecidos: sem refresh depois do commit
+            usuario=usuario,
+        )
+        for r in reservas_create
+    ]
+    session.add_all(novas_reservas)
+    try:
+        await session.commit()
+    except IntegrityError as e:
+        await session.rollback()
+        if not _viola_sobreposicao(e):
+            logger.error("Lote de %s reservas rejeitado pelo banco: %s", len(novas_reservas), e.orig)
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Dados da reserva inválidos.")
+        # Algum período sobrepõe uma reserva ativa já gravada (barrado pela restrição de exclusão).
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="O ambiente não está disponível para um ou mais períodos solicitados."
+        )
+    except Exception as e:
+        await session.rollback()
+        logger.error("Erro inesperado ao criar reservas em lote (%s registros): %s", len(novas_reservas), e, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Ocorreu um erro interno no servidor ao salvar as reservas."
+        )
+
+    return novas_reservas
+
+async def obter_reserva(session: AsyncSession, reserva_id: int) -> Reserva:
     """
     Busca uma reserva no banco de dados pelo seu ID.
     Carrega os dados aninhados de usuário e ambiente.
@@ -814,16 +1252,19 @@ def obter_reserva(session: Session, reserva_id: int) -> Reserva:
     Raises:
         HTTPException: Se a reserva não for encontrada (status 404).
     """
-    # Usa select com options para carregar os relacionamentos 'usuario' e 'ambiente'.
-    # selectinload é geralmente eficiente para relacionamentos Many-to-One ou One-to-Many com um número limitado de itens relacionados.
-    query = select(Reserva).where(Reserva.id == reserva_id).options(
-        selectinload(Reserva.usuario), # Carrega os dados do usuário relacionado
-        selectinload(Reserva.ambiente) # Carrega os dados do ambiente relacionado
-    )
-    reserva: Optional[Reserva] = session.exec(query).first()
+    # session.get() busca pela chave primária e consulta primeiro o identity map da sessão:
+    # se a reserva já foi carregada nesta requisição (ex: rota e CRUD buscando a mesma reserva),
+    # não há nova ida ao banco. Na primeira busca, as options carregam os relacionamentos
+    # 'usuario' e 'ambiente'.
+    # Busca de UMA linha com relacionamentos Many-to-One: joinedload traz tudo no mesmo SELECT
+    # (LEFT OUTER JOIN pelas FKs), em vez de uma query extra por relacionamento como o selectinload.
+    # Mesmo carregamento das listagens (_OPCOES_RESERVA_READ): usuário e ambiente no mesmo SELECT
+    # (INNER JOIN, as FKs não são nulas), só as colunas de UsuarioRead (sem senha_hash) e
+    # raiseload('*') para qualquer outro relacionamento levantar erro em vez de um lazy load silencioso.
+    reserva: Optional[Reserva] = await session.get(Reserva, reserva_id, options=list(_OPCOES_RESERVA_READ))
 
     if not reserva:
-        logger.warning(f"Reserva com ID {reserva_id} não encontrada.")
+        logger.warning("Reserva com ID %s não encontrada.", reserva_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Reserva não encontrada."
@@ -831,9 +1272,116 @@ def obter_reserva(session: Session, reserva_id: int) -> Reserva:
 
     return reserva
 
-# Esta função é necessária para a rota GET /reservas/.
-def obter_reservas(
-    session: Session,
+def _como_utc(valor: datetime) -> datetime:
+    """Devolve o datetime com fuso: valores sem fuso (naive) são interpretados como UTC."""
+    return valor.replace(tzinfo=timezone.utc) if valor.tzinfo is None else valor
+
+def periodo_valido(data_inicio: datetime, data_fim: datetime) -> bool:
+    """Indica se o período é válido (início antes do fim), aceitando datas com ou sem fuso (sem fuso = UTC)."""
+    return _como_utc(data_inicio) < _como_utc(data_fim)
+
+def _filtrar(stmt, params: dict, valor, nome: str, condicao):
+    """
+    Acrescenta um filtro opcional a uma listagem montada com lambda_stmt.
+
+    O valor não entra no lambda: vai em 'params' e a condição usa bindparam(nome).
+    Assim o SQL compilado fica em cache por combinação de filtros ativos, e não por valor.
+
+    Args:
+        stmt: StatementLambdaElement sendo montado.
+        params: Dicionário de parâmetros da execução (recebe params[nome] = valor).
+        valor: Valor do filtro (None = filtro não informado, nada é acrescentado).
+        nome: Nome do bindparam usado na condição.
+        condicao: Lambda que recebe o statement e devolve o statement com o .where(...).
+
+    Returns:
+        O statement com o filtro (ou o próprio statement, se valor for None).
+    """
+    if valor is None:
+        return stmt
+    params[nome] = valor
+    return stmt + condicao
+
+# Parâmetros do cursor (keyset) com tipo explícito: na comparação de tupla o tipo não vem da coluna.
+_CURSOR_DATA_INICIO = bindparam("cursor_data_inicio", type_=DateTime(timezone=True))
+_CURSOR_ID = bindparam("cursor_id", type_=Integer)
+
+def _filtros_reservas(
+    query,
+    params: dict,
+    usuario_id: Optional[uuid.UUID],
+    ambiente_id: Optional[int],
+    status: Optional[StatusReserva],
+    data_inicio_ge: Optional[datetime],
+    data_inicio_le: Optional[datetime],
+    data_fim_ge: Optional[datetime],
+    data_fim_le: Optional[datetime]
+):
+    """
+    Acrescenta os filtros da listagem de reservas a um lambda_stmt (só entram os filtros informados).
+    Todos usam colunas de Reserva: servem tanto para a query da página quanto para a contagem do total.
+    """
+    query = _filtrar(query, params, usuario_id, "usuario_id",
+                     lambda s: s.where(Reserva.usuario_id == bindparam("usuario_id")))
+    query = _filtrar(query, params, ambiente_id, "ambiente_id",
+                     lambda s: s.where(Reserva.ambiente_id == bindparam("ambiente_id")))
+    query = _filtrar(query, params, status, "status",
+                     lambda s: s.where(Reserva.status == bindparam("status")))
+    # Filtros de data/hora podem ser combinados.
+    query = _filtrar(query, params, data_inicio_ge, "data_inicio_ge",
+                     lambda s: s.where(Reserva.data_inicio >= bindparam("data_inicio_ge")))
+    query = _filtrar(query, params, data_inicio_le, "data_inicio_le",
+                     lambda s: s.where(Reserva.data_inicio <= bindparam("data_inicio_le")))
+    query = _filtrar(query, params, data_fim_ge, "data_fim_ge",
+                     lambda s: s.where(Reserva.data_fim >= bindparam("data_fim_ge")))
+    query = _filtrar(query, params, data_fim_le, "data_fim_le",
+                     lambda s: s.where(Reserva.data_fim <= bindparam("data_fim_le")))
+    return query
+
+def _query_reservas(
+    skip: int,
+    limit: int,
+    usuario_id: Optional[uuid.UUID],
+    ambiente_id: Optional[int],
+    status: Optional[StatusReserva],
+    data_inicio_ge: Optional[datetime],
+    data_inicio_le: Optional[datetime],
+    data_fim_ge: Optional[datetime],
+    data_fim_le: Optional[datetime],
+    cursor_data_inicio: Optional[datetime],
+    cursor_id: Optional[int]
+):
+    """Monta a query filtrada e paginada de reservas e seus parâmetros (compartilhada entre a listagem com e sem total)."""
+    # Cria a query base para selecionar Reservas e carregar os relacionamentos para o schema ReservaRead
+    # (um único SELECT com JOIN; ver _OPCOES_RESERVA_READ).
+    # Montada com lambda_stmt: cada lambda é identificado pela posição no código, então o SQL compilado
+    # fica em cache por combinação de filtros ativos e as chamadas seguintes só aplicam os parâmetros.
+    params: dict = {"skip": skip, "limit": limit}
+    query = lambda_stmt(lambda: select(Reserva).options(*_OPCOES_RESERVA_READ))
+
+    # Aplica filtros baseados nos parâmetros fornecidos.
+    query = _filtros_reservas(query, params, usuario_id, ambiente_id, status,
+                              data_inicio_ge, data_inicio_le, data_fim_ge, data_fim_le)
+
+    # Paginação por cursor (keyset): continua logo depois do último item da página anterior.
+    # O banco "salta" direto para a posição pelo índice, em vez de contar e descartar 'skip' linhas.
+    if cursor_id is not None and cursor_data_inicio is not None:
+        # (data_inicio, id) < (:data, :id) -> comparação de tupla (row value), atendida pelo índice em (data_inicio, id).
+        params["cursor_id"] = cursor_id
+        query = _filtrar(query, params, cursor_data_inicio, "cursor_data_inicio",
+                         lambda s: s.where(tuple_(Reserva.data_inicio, Reserva.id) < tuple_(_CURSOR_DATA_INICIO, _CURSOR_ID)))
+    else: # Sem id: compara só a data
+        query = _filtrar(query, params, cursor_data_inicio, "cursor_data_inicio",
+                         lambda s: s.where(Reserva.data_inicio < bindparam("cursor_data_inicio")))
+
+    # Ordem estável (data_inicio, id) decrescente: necessária para o cursor.
+    # skip continua aceito (compatibilidade), mas o cursor é o caminho barato para páginas profundas.
+    query += lambda s: s.order_by(Reserva.data_inicio.desc(), Reserva.id.desc()).offset(bindparam("skip")).limit(bindparam("limit"))
+
+    return query, params
+
+async def obter_reservas(
+    session: AsyncSession,
     skip: int = 0,
     limit: int = 100,
     usuario_id: Optional[uuid.UUID] = None, # Query parameter do router
@@ -842,7 +1390,9 @@ def obter_reservas(
     data_inicio_ge: Optional[datetime] = None, # Query parameter do router
     data_inicio_le: Optional[datetime] = None, # Query parameter do router
     data_fim_ge: Optional[datetime] = None,    # Query parameter do router
-    data_fim_le: Optional[datetime] = None     # Query parameter do router
+    data_fim_le: Optional[datetime] = None,    # Query parameter do router
+    cursor_data_inicio: Optional[datetime] = None, # Paginação por cursor: data_inicio do último item da página anterior
+    cursor_id: Optional[int] = None                # Paginação por cursor: id do último item da página anterior
 ) -> List[Reserva]:
     """
     Retorna uma lista paginada de reservas, opcionalmente filtrada por vários critérios.
@@ -859,47 +1409,76 @@ def obter_reservas(
         data_inicio_le: Opcional. Filtra por data_inicio <= este valor.
         data_fim_ge: Opcional. Filtra por data_fim >= este valor.
         data_fim_le: Opcional. Filtra por data_fim <= este valor.
+        cursor_data_inicio: Opcional. data_inicio do último item recebido (paginação por cursor).
+        cursor_id: Opcional. id do último item recebido (desempata reservas com o mesmo data_inicio).
 
     Returns:
-        Uma lista de instâncias do modelo Reserva com relacionamentos carregados.
+        Uma lista de instâncias do modelo Reserva com relacionamentos carregados,
+        ordenada por data_inicio e id decrescentes.
     """
-    # Cria a query base para selecionar Reservas e carregar os relacionamentos para o schema ReservaRead.
-    query = select(Reserva).options(
-        selectinload(Reserva.usuario),
-        selectinload(Reserva.ambiente)
+    # Casos mais comuns usam statements pré-montados (sem montar filtros a cada chamada):
+    # - sem filtro nenhum (admin listando tudo);
+    # - só usuario_id (usuário comum: a rota força o filtro pelo próprio ID).
+    outros_filtros = (ambiente_id, status, data_inicio_ge, data_inicio_le,
+                      data_fim_ge, data_fim_le, cursor_data_inicio, cursor_id)
+    if all(f is None for f in outros_filtros):
+        if usuario_id is None:
+            return (await session.exec(_STMT_RESERVAS_PADRAO, params={"skip": skip, "limit": limit})).all()
+        return (await session.exec(
+            _STMT_RESERVAS_DO_USUARIO, params={"usuario_id": usuario_id, "skip": skip, "limit": limit}
+        )).all()
+
+    query, params = _query_reservas(
+        skip, limit, usuario_id, ambiente_id, status,
+        data_inicio_ge, data_inicio_le, data_fim_ge, data_fim_le,
+        cursor_data_inicio, cursor_id
     )
 
-    # Aplica filtros baseados nos parâmetros fornecidos.
-    # Usa .where() para adicionar condições à query.
-    if usuario_id is not None:
-        query = query.where(Reserva.usuario_id == usuario_id)
-    if ambiente_id is not None:
-        query = query.where(Reserva.ambiente_id == ambiente_id)
-    if status is not None:
-        query = query.where(Reserva.status == status)
+    # Executa a query e obtém a lista de resultados.
+    # execute + scalars(): o session.exec do SQLModel só devolve objetos (e não linhas) para select() comum.
+    reservas: List[Reserva] = (await session.execute(query, params=params)).scalars().all()
 
-    # Filtros de data/hora podem ser combinados.
-    if data_inicio_ge is not None:
-        query = query.where(Reserva.data_inicio >= data_inicio_ge)
-    if data_inicio_le is not None:
-        query = query.where(Reserva.data_inicio <= data_inicio_le)
+    return reservas # Retorna a lista de objetos Reserva.
 
-    if data_fim_ge is not None:
-        query = query.where(Reserva.data_fim >= data_fim_ge)
-    if data_fim_le is not None:
-        query = query.where(Reserva.data_fim <= data_fim_le)
+async def obter_reservas_com_total(session: AsyncSession, **filtros) -> Tuple[List[Reserva], int]:
+    """
+    Igual a obter_reservas, mas também devolve o total de reservas que casam com os filtros.
 
-    # Aplica paginação (offset e limit).
-    query = query.offset(skip).limit(limit)
+    O total vem de um COUNT separado e enxuto: só a tabela reserva com os filtros, sem os JOINs
+    de usuário/ambiente da página (que só são feitos para as 'limit' linhas devolvidas) e sem
+    cursor/skip. Só use quando o cliente pedir o total: a contagem percorre todas as linhas filtradas.
 
-    # Executa a query e obtém a lista de resultados.
-    reservas: List[Reserva] = session.exec(query).all()
+    Args:
+        session: Sessão do banco de dados.
+        **filtros: Os mesmos parâmetros de obter_reservas (skip, limit, filtros e cursor).
 
-    return reservas # Retorna a lista de objetos Reserva.
+    Returns:
+        Tupla (reservas da página, total de reservas filtradas, independente da página).
+    """
+    parametros = {
+        "skip": 0, "limit": 100, "usuario_id": None, "ambiente_id": None, "status": None,
+        "data_inicio_ge": None, "data_inicio_le": None, "data_fim_ge": None, "data_fim_le": None,
+        "cursor_data_inicio": None, "cursor_id": None,
+    }
+    parametros.update(filtros)
+    reservas = await obter_reservas(session, **parametros)
+
+    # Primeira página incompleta: ela já contém todas as reservas filtradas, não precisa contar.
+    if parametros["skip"] == 0 and parametros["cursor_data_inicio"] is None and len(reservas) < parametros["limit"]:
+        return reservas, len(reservas)
+
+    params_total: dict = {}
+    query_total = lambda_stmt(lambda: select(func.count()).select_from(Reserva))
+    query_total = _filtros_reservas(
+        query_total, params_total, parametros["usuario_id"], parametros["ambiente_id"], parametros["status"],
+        parametros["data_inicio_ge"], parametros["data_inicio_le"], parametros["data_fim_ge"], parametros["data_fim_le"]
+    )
+    total: int = (await session.execute(query_total, params=params_total)).scalar_one()
+    return reservas, total
 
 # Implementar atualizar_reserva (sem status).
-def atualizar_reserva(
-    session: Session,
+async def atualizar_reserva(
+    session: AsyncSession,
     reserva_existente: Reserva, # Instância da reserva já obtida (do DB, por exemplo, pela rota)
     reserva_update: ReservaUpdate, # Dados de atualização (schema de entrada)
     current_user: Usuario # Para verificar permissões
@@ -946,56 +1525,100 @@ def atualizar_reserva(
     # caso ele tenha sido acidentalmente incluído no schema ou na requisição.
     update_data.pop("status", None) # Remove a chave 'status' se existir. 'None' evita erro se não existir.
 
+    # Datas sem fuso (naive) são tratadas como UTC, igual às gravadas no banco (sempre com fuso).
+    # Sem isso, 10:00 naive != 10:00+00:00 e a comparação abaixo veria mudança onde não há
+    # (e a comparação inicio >= fim levantaria TypeError ao misturar naive e aware).
+    for campo in ("data_inicio", "data_fim"):
+        if update_data.get(campo) is not None:
+            update_data[campo] = _como_utc(update_data[campo])
+
+    # Uma única passada: mantém só os campos cujo valor realmente muda (como em atualizar_usuario).
+    update_data = {
+        campo: valor for campo, valor in update_data.items()
+        if getattr(reserva_existente, campo) != valor
+    }
+
     # Verificar se datas ou ambiente_id foram modificados para re-verificar disponibilidade.
-    # Precisamos verificar se a *chave* está em update_data E o *valor* é diferente do valor existente.
-    dates_or_ambiente_changed = False
-    if "data_inicio" in update_data and update_data["data_inicio"] != reserva_existente.data_inicio:
-        dates_or_ambiente_changed = True
-    if "data_fim" in update_data and update_data["data_fim"] != reserva_existente.data_fim:
-        dates_or_ambiente_changed = True
-    if "ambiente_id" in update_data and update_data["ambiente_id"] != reserva_existente.ambiente_id:
-         dates_or_ambiente_changed = True
-
-    # Se datas ou ambiente_id mudaram, verificar disponibilidade.
+    # Novos valores (os do update_data se presentes, senão os existentes) comparados em uma única tupla.
+    new_data_inicio, new_data_fim, new_ambiente_id = novo_periodo = (
+        update_data.get("data_inicio", reserva_existente.data_inicio),
+        update_data.get("data_fim", reserva_existente.data_fim),
+        update_data.get("ambiente_id", reserva_existente.ambiente_id),
+    )
+    dates_or_ambiente_changed = novo_periodo != (
+        reserva_existente.data_inicio, reserva_existente.data_fim, reserva_existente.ambiente_id
+    )
+
+    # Sem nada para alterar, não há UPDATE a executar.
+    if not update_data:
+        return reserva_existente
+
+    # Um único UPDATE ... RETURNING aplica os dados de atualização.
+    stmt = (
+        update(Reserva)
+        .where(Reserva.id == reserva_existente.id)
+        .values(**update_data)
+        .returning(Reserva)
+    )
+
+    # Se datas ou ambiente_id mudaram, a checagem de disponibilidade vai no próprio UPDATE:
+    # UPDATE ... WHERE NOT EXISTS (reserva sobreposta). Um round trip em vez de SELECT + UPDATE,
+    # e a checagem e a escrita acontecem no mesmo statement.
     # Excluímos a reserva original da checagem de sobreposição.
     if dates_or_ambiente_changed:
-         # Use os novos valores do update_data se presentes, senão use os valores existentes da reserva.
-         # Isso garante que usamos os valores *corretos* para a checagem.
-         new_data_inicio = update_data.get("data_inicio", reserva_existente.data_inicio)
-         new_data_fim = update_data.get("data_fim", reserva_existente.data_fim)
-         new_ambiente_id = update_data.get("ambiente_id", reserva_existente.ambiente_id)
-
-         is_available = verificar_disponibilidade_ambiente(
-             session,
-             new_ambiente_id,
-             new_data_inicio,
-             new_data_fim,
-             reserva_id_excluir=reserva_existente.id # Exclui a própria reserva da checagem
-         )
-
-         if not is_available:
+         # Período inválido nunca está disponível (mesma regra de verificar_disponibilidade_ambiente).
+         if new_data_inicio >= new_data_fim:
              raise HTTPException(
                  status_code=status.HTTP_409_CONFLICT,
                  detail="O ambiente não está disponível para o novo período solicitado."
              )
 
-    # Aplica os dados de atualização à instância existente usando sqlmodel_update.
-    reserva_existente.sqlmodel_update(update_data)
+         # Alias obrigatório: sem ele a subquery se correlacionaria com a própria linha sendo atualizada.
+         outra_reserva = aliased(Reserva)
+         stmt = stmt.where(~exists().where(*_condicoes_sobreposicao(
+             outra_reserva,
+             new_ambiente_id,
+             new_data_inicio,
+             new_data_fim,
+             reserva_id_excluir=reserva_existente.id # Exclui a própria reserva da checagem
+         )))
 
-    session.add(reserva_existente)
     try:
-        session.commit()
-        session.refresh(reserva_existente)
+        # Nenhuma linha devolvida = o NOT EXISTS falhou (há reserva sobreposta).
+        reserva_atualizada: Optional[Reserva] = (await session.exec(stmt)).scalars().first()
+        if reserva_atualizada is not None:
+            await session.commit()
+            # O RETURNING atualiza a mesma instância já carregada (com usuario e ambiente).
+            # Só se o ambiente mudou é preciso trocar o relacionamento (session.get usa o identity map primeiro).
+            if "ambiente_id" in update_data:
+                set_committed_value(reserva_atualizada, "ambiente", await session.get(Ambiente, new_ambiente_id))
+    except IntegrityError as e:
+        await session.rollback()
+        if not _viola_sobreposicao(e):
+            logger.error("Atualização da reserva %s rejeitada pelo banco: %s", reserva_existente.id, e.orig)
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Dados da reserva inválidos.")
+        # Conflito detectado pela restrição de exclusão (corrida com outra reserva concorrente).
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="O ambiente não está disponível para o novo período solicitado."
+        )
     except Exception as e:
-        session.rollback()
-        logger.error(f"Erro inesperado ao atualizar reserva {reserva_existente.id}: {e}", exc_info=True)
+        await session.rollback()
+        logger.error("Erro inesperado ao atualizar reserva %s: %s", reserva_existente.id, e, exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro ao atualizar a reserva.")
 
-    return reserva_existente
+    if reserva_atualizada is None:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="O ambiente não está disponível para o novo período solicitado."
+        )
+
+    return reserva_atualizada
 
 
-def atualizar_status_reserva( 
-    session: Session,
+async def atualizar_status_reserva( 
+    session: AsyncSession,
     reserva_id: int, # ID da reserva a ter o status atualizado
     novo_status: StatusReserva, # O novo status desejado
     # **ADICIONADO:** Passar o usuário logado para verificar permissões
@@ -1024,7 +1647,7 @@ def atualizar_status_reserva(
                        se ocorrer um erro inesperado ao salvar (status 500).
     """
     # 1. Obter a reserva por ID (lidando com 404).
-    reserva_a_atualizar = obter_reserva(session, reserva_id) # Lança 404 se não existir
+    reserva_a_atualizar = await obter_reserva(session, reserva_id) # Lança 404 se não existir
 
     # 2. Lógica de Autorização: Quem pode mudar o status para o novo_status desejado?
     is_admin = current_user.tipo == TipoUsuario.admin
@@ -1067,22 +1690,26 @@ def atualizar_status_reserva(
     reserva_a_atualizar.status = novo_status
 
     # 5. Adicionar a instância modificada à sessão e commitar.
+    # Sem refresh: a sessão não expira os objetos no commit (expire_on_commit=False),
+    # então 'usuario' e 'ambiente' carregados por obter_reserva continuam disponíveis.
     session.add(reserva_a_atualizar)
     try:
-        session.commit()
-        session.refresh(reserva_a_atualizar)
-
         # 6. Se o novo status for FINALIZADA ou CANCELADA, mover para o histórico E DELETAR.
         if novo_status in [StatusReserva.FINALIZADA, StatusReserva.CANCELADA]:
-            logger.info(f"Reserva {reserva_a_atualizar.id} atualizada para status {novo_status}. Movendo para histórico e deletando...")
-            # Chama a função para mover para o histórico.
-            mover_reserva_para_historico(session, reserva_a_atualizar) # Esta função agora deleta a original
-            logger.info(f"Reserva {reserva_a_atualizar.id} movida para histórico e deletada da tabela principal.")
-
-
+            logger.info("Reserva %s atualizada para status %s. Movendo para histórico e deletando...", reserva_a_atualizar.id, novo_status)
+            # Sem commit intermediário: o novo status é enviado (flush) na mesma transação da cópia
+            # para o histórico e da deleção, que mover_reserva_para_historico confirma com UM commit.
+            # Assim a reserva FINALIZADA/CANCELADA nunca fica visível na tabela principal.
+            await mover_reserva_para_historico(session, reserva_a_atualizar) # Esta função agora deleta a original
+            logger.info("Reserva %s movida para histórico e deletada da tabela principal.", reserva_a_atualizar.id)
+        else:
+            await session.commit()
+
+    except HTTPException:
+        raise # Erros já tratados por mover_reserva_para_historico (com rollback feito lá)
     except Exception as e:
-        session.rollback()
-        logger.error(f"Erro inesperado ao atualizar status da reserva {reserva_id}: {e}", exc_info=True)
+        await session.rollback()
+        logger.error("Erro inesperado ao atualizar status da reserva %s: %s", reserva_id, e, exc_info=True)
         # Use valor numérico 500 se a importação de status ainda for problemática
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro ao atualizar status da reserva.")
 
@@ -1090,7 +1717,7 @@ def atualizar_status_reserva(
     return reserva_a_atualizar
 
 # def deletar_reserva(
-#     session: Session,
+#     session: AsyncSession,
 #     reserva_id: int,
 #     current_user: Usuario # Para verificar permissão
 # ) -> Reserva:
@@ -1112,7 +1739,7 @@ def atualizar_status_reserva(
 #                        se ocorrer um erro inesperado ao salvar (500).
 #     """
 #     # 1. Obter a reserva para garantir que ela existe (obter_reserva já lida com 404).
-#     reserva_a_deletar = obter_reserva(session, reserva_id) # Lança 404 se não existir
+#     reserva_a_deletar = await obter_reserva(session, reserva_id) # Lança 404 se não existir
 
 #     # 2. Lógica de Autorização: Apenas o proprietário da reserva (se PENDENTE) OU um administrador pode deletar.
 #     # Regra: Não pode deletar se já foi CONFIRMADA, CANCELADA ou FINALIZADA, A MENOS QUE seja admin.
@@ -1134,7 +1761,7 @@ def atualizar_status_reserva(
 #         # Retornamos o objeto antes do commit, mas ele pode não ser totalmente útil depois.
 #     except Exception as e:
 #         session.rollback()
-#         logger.error(f"Erro inesperado ao deletar reserva {reserva_id}: {e}", exc_info=True)
+#         logger.error("Erro inesperado ao deletar reserva %s: %s", reserva_id, e, exc_info=True)
 #         raise HTTPException(
 #             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
 #             detail="Ocorreu um erro interno no servidor ao deletar a reserva."
@@ -1144,7 +1771,7 @@ def atualizar_status_reserva(
 #     return reserva_a_deletar
 
 # Implementar mover_reserva_para_historico.
-def mover_reserva_para_historico(session: Session, reserva_original: Reserva) -> HistoricoReserva:
+async def mover_reserva_para_historico(session: AsyncSession, reserva_original: Reserva) -> HistoricoReserva:
     """
     Copia os dados de uma reserva para a tabela HistoricoReserva e DELETA a reserva original.
     Geralmente chamada após o status ser atualizado para FINALIZADA ou CANCELADA.
@@ -1160,57 +1787,206 @@ def mover_reserva_para_historico(session: Session, reserva_original: Reserva) ->
         HTTPException: Se ocorrer um erro inesperado ao salvar no histórico ou deletar (status 500).
         # Lida com IntegrityError se já existir um histórico para este ID.
     """
-    # Lógica de cópia de dados. Cria uma nova instância de HistoricoReserva.
+    # Cópia feita inteiramente no banco: INSERT INTO historicoreserva ... SELECT ... FROM reserva
+    # JOIN ambiente JOIN usuario. Os nomes do ambiente e do usuário vêm do JOIN, sem acessar
+    # relacionamentos no Python (nenhum SELECT extra / lazy load).
     # Regra: usar o ID da reserva original como PK do histórico.
-    historico_entry = HistoricoReserva(
-        id=reserva_original.id, # Usa o ID da reserva original como PK do histórico
-        ambiente_id=reserva_original.ambiente_id,
-        nome_amb=reserva_original.ambiente.nome,
-        usuario_id=reserva_original.usuario_id,
-        nome_usu=reserva_original.usuario.nome,
-        data_inicio=reserva_original.data_inicio,
-        data_fim=reserva_original.data_fim,
-        data_criacao=reserva_original.data_criacao,
-        status=reserva_original.status, # O status final (CANCELADA ou FINALIZADA)
-        motivo=reserva_original.motivo
+    copia = (
+        select(
+            Reserva.id, # Usa o ID da reserva original como PK do histórico
+            Reserva.ambiente_id,
+            Ambiente.nome,
+            Reserva.usuario_id,
+            Usuario.nome,
+            Reserva.data_inicio,
+            Reserva.data_fim,
+            Reserva.data_criacao,
+            Reserva.status, # O status final (CANCELADA ou FINALIZADA)
+            Reserva.motivo,
+        )
+        .join(Ambiente, Ambiente.id == Reserva.ambiente_id)
+        .join(Usuario, Usuario.id == Reserva.usuario_id)
+        .where(Reserva.id == reserva_original.id)
+    )
+    stmt_historico = (
+        insert(HistoricoReserva)
+        .from_select(
+            ["id", "ambiente_id", "nome_amb", "usuario_id", "nome_usu",
+             "data_inicio", "data_fim", "data_criacao", "status", "motivo"],
+            copia
+        )
+        .returning(HistoricoReserva)
     )
-
-    # Adiciona a nova entrada de histórico à sessão.
-    session.add(historico_entry)
 
     try:
-        # Tenta commitar a adição do histórico.
         # Se der IntegrityError aqui (ID já existe no histórico), a deleção original não acontecerá.
-        session.commit()
-        session.refresh(historico_entry) # Obtém a instância completa do histórico.
-
-        # DELETA a reserva original da tabela principal APÓS a cópia para o histórico ser bem-sucedida.
-        # session.delete(reserva_original)
-        # session.commit() # Commita a deleção.
+        historico_entry: HistoricoReserva = (await session.exec(stmt_historico)).scalars().one()
 
-        # Alternativa: Incluir a deleção no MESMO commit para garantir atomicidade:
-        session.delete(reserva_original)
-        session.commit() # Commita tanto a adição do histórico quanto a deleção da original.
-        logger.info(f"Reserva original {reserva_original.id} deletada após mover para histórico.")
+        # DELETA a reserva original no MESMO commit da cópia (atomicidade: ou as duas coisas, ou nenhuma).
+        await session.exec(delete(Reserva).where(Reserva.id == reserva_original.id))
+        await session.commit() # Commita tanto a adição do histórico quanto a deleção da original.
+        logger.info("Reserva original %s deletada após mover para histórico.", reserva_original.id)
 
 
     except IntegrityError as e:
         # Se o histórico para este ID já existe (IntegrityError), a deleção original não ocorrerá.
-        session.rollback()
-        logger.error(f"Erro de integridade: Histórico para reserva {reserva_original.id} já existe. Deleção original ABORTADA.", exc_info=True)
+        await session.rollback()
+        logger.error("Erro de integridade: Histórico para reserva %s já existe. Deleção original ABORTADA.", reserva_original.id, exc_info=True)
         # Dependendo da regra, você pode querer lançar um erro aqui ou apenas logar.
         # Vamos logar e lançar um 500 para indicar que algo deu errado no processo.
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro ao mover para histórico: Registro de histórico já existe.")
     except Exception as e:
-        session.rollback()
-        logger.error(f"Erro inesperado ao mover reserva {reserva_original.id} para histórico e deletar: {e}", exc_info=True)
+        await session.rollback()
+        logger.error("Erro inesperado ao mover reserva %s para histórico e deletar: %s", reserva_original.id, e, exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Ocorreu um erro interno ao processar o histórico da reserva.")
 
 
     return historico_entry
 
-def obter_historico_reservas( # Nome corrigido para 'obter'
-    session: Session,
+async def mover_reservas_expiradas(session: AsyncSession) -> int:
+    """
+    Move para o histórico (como FINALIZADA) todas as reservas CONFIRMADAS cujo período já terminou.
+    Mantém a tabela 'reserva' só com reservas ativas, para que as checagens de sobreposição
+    e as listagens não fiquem mais lentas à medida que o histórico cresce.
+
+    Args:
+        session: Sessão do banco de dados.
+
+    Returns:
+        A quantidade de reservas movidas para o histórico.
+
+    Raises:
+        HTTPException: Se ocorrer um erro inesperado ao mover as reservas (status 500).
+    """
+    # Um único statement: WITH movidas AS (DELETE ... RETURNING) INSERT INTO historicoreserva SELECT ...
+    # A linha deletada é exatamente a linha copiada (sem janela entre um SELECT e um DELETE separados).
+    movidas = (
+        delete(Reserva)
+        .where(
+            Reserva.status == StatusReserva.CONFIRMADA,
+            Reserva.data_fim < func.now() # Período já encerrado
+        )
+        .returning(
+            Reserva.id, Reserva.ambiente_id, Reserva.usuario_id,
+            Reserva.data_inicio, Reserva.data_fim, Reserva.data_criacao, Reserva.motivo
+        )
+        .cte("movidas")
+    )
+    copia = (
+        select(
+            movidas.c.id,
+            movidas.c.ambiente_id,
+            Ambiente.nome,
+            movidas.c.usuario_id,
+            Usuario.nome,
+            movidas.c.data_inicio,
+            movidas.c.data_fim,
+            movidas.c.data_criacao,
+            # Reserva confirmada cujo período terminou = FINALIZADA.
+            literal(StatusReserva.FINALIZADA, type_=HistoricoReserva.__table__.c.status.type),
+            movidas.c.motivo,
+        )
+        .join(Ambiente, Ambiente.id == movidas.c.ambiente_id)
+        .join(Usuario, Usuario.id == movidas.c.usuario_id)
+    )
+    stmt = (
+        insert(HistoricoReserva)
+        .from_select(
+            ["id", "ambiente_id", "nome_amb", "usuario_id", "nome_usu",
+             "data_inicio", "data_fim", "data_criacao", "status", "motivo"],
+            copia
+        )
+        .returning(HistoricoReserva.id)
+    )
+
+    try:
+        quantidade = len((await session.exec(stmt)).all())
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        logger.error("Erro inesperado ao mover reservas expiradas para o histórico: %s", e, exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro ao mover reservas expiradas para o histórico.")
+
+    logger.info("%s reserva(s) expirada(s) movida(s) para o histórico.", quantidade)
+    return quantidade
+
+def _filtros_historico(
+    query,
+    params: dict,
+    usuario_id: Optional[uuid.UUID],
+    ambiente_id: Optional[int],
+    status: Optional[StatusReserva],
+    data_inicio_ge: Optional[datetime],
+    data_inicio_le: Optional[datetime],
+    data_fim_ge: Optional[datetime],
+    data_fim_le: Optional[datetime],
+    nome_amb: Optional[str],
+    nome_usu: Optional[str]
+):
+    """Acrescenta os filtros da listagem do histórico a um lambda_stmt (página e contagem do total)."""
+    query = _filtrar(query, params, usuario_id, "usuario_id",
+                     lambda s: s.where(HistoricoReserva.usuario_id == bindparam("usuario_id")))
+    query = _filtrar(query, params, ambiente_id, "ambiente_id",
+                     lambda s: s.where(HistoricoReserva.ambiente_id == bindparam("ambiente_id")))
+    query = _filtrar(query, params, status, "status",
+                     lambda s: s.where(HistoricoReserva.status == bindparam("status")))
+    # Filtros de data/hora.
+    query = _filtrar(query, params, data_inicio_ge, "data_inicio_ge",
+                     lambda s: s.where(HistoricoReserva.data_inicio >= bindparam("data_inicio_ge")))
+    query = _filtrar(query, params, data_inicio_le, "data_inicio_le",
+                     lambda s: s.where(HistoricoReserva.data_inicio <= bindparam("data_inicio_le")))
+    query = _filtrar(query, params, data_fim_ge, "data_fim_ge",
+                     lambda s: s.where(HistoricoReserva.data_fim >= bindparam("data_fim_ge")))
+    query = _filtrar(query, params, data_fim_le, "data_fim_le",
+                     lambda s: s.where(HistoricoReserva.data_fim <= bindparam("data_fim_le")))
+    # **ADICIONADO:** Filtros por nome de ambiente e usuário (busca parcial, case-insensitive)
+    # lower(nome) LIKE '%valor%', com o termo baixado uma vez no Python: é exatamente a expressão dos
+    # índices de trigramas idx_historico_nome_*_lower_trgm, que o planejador usa para a busca parcial.
+    query = _filtrar(query, params, f"%{nome_amb.lower()}%" if nome_amb is not None else None, "nome_amb",
+                     lambda s: s.where(func.lower(HistoricoReserva.nome_amb).like(bindparam("nome_amb"))))
+    query = _filtrar(query, params, f"%{nome_usu.lower()}%" if nome_usu is not None else None, "nome_usu",
+                     lambda s: s.where(func.lower(HistoricoReserva.nome_usu).like(bindparam("nome_usu"))))
+    return query
+
+def _query_historico(
+    skip: int,
+    limit: int,
+    usuario_id: Optional[uuid.UUID],
+    ambiente_id: Optional[int],
+    status: Optional[StatusReserva],
+    data_inicio_ge: Optional[datetime],
+    data_inicio_le: Optional[datetime],
+    data_fim_ge: Optional[datetime],
+    data_fim_le: Optional[datetime],
+    nome_amb: Optional[str],
+    nome_usu: Optional[str],
+    cursor_data_inicio: Optional[datetime],
+    cursor_id: Optional[int]
+):
+    """Monta a query filtrada e paginada do histórico e seus parâmetros (compartilhada entre a listagem e o streaming)."""
+    # Cria a query base para selecionar HistoricoReserva.
+    # Mesma montagem de obter_reservas: lambda_stmt + bindparam, SQL compilado em cache por combinação de filtros.
+    params: dict = {"skip": skip, "limit": limit}
+    query = lambda_stmt(lambda: select(HistoricoReserva))
+
+    # Aplica filtros baseados nos parâmetros fornecidos.
+    query = _filtros_historico(query, params, usuario_id, ambiente_id, status,
+                               data_inicio_ge, data_inicio_le, data_fim_ge, data_fim_le, nome_amb, nome_usu)
+
+    # Aplica paginação: cursor (keyset) + ordem estável (data_inicio, id) decrescente.
+    if cursor_id is not None and cursor_data_inicio is not None:
+        params["cursor_id"] = cursor_id
+        query = _filtrar(query, params, cursor_data_inicio, "cursor_data_inicio",
+                         lambda s: s.where(tuple_(HistoricoReserva.data_inicio, HistoricoReserva.id) < tuple_(_CURSOR_DATA_INICIO, _CURSOR_ID)))
+    else:
+        query = _filtrar(query, params, cursor_data_inicio, "cursor_data_inicio",
+                         lambda s: s.where(HistoricoReserva.data_inicio < bindparam("cursor_data_inicio")))
+    query += lambda s: s.order_by(HistoricoReserva.data_inicio.desc(), HistoricoReserva.id.desc()).offset(bindparam("skip")).limit(bindparam("limit"))
+
+    return query, params
+
+async def obter_historico_reservas( # Nome corrigido para 'obter'
+    session: AsyncSession,
     skip: int = 0,
     limit: int = 100,
     # Query parameters para filtros (usuario_id, ambiente_id, status, período)
@@ -1223,7 +1999,9 @@ def obter_historico_reservas( # Nome corrigido para 'obter'
     data_fim_le: Optional[datetime] = None,
     # **ADICIONADO:** Parâmetros opcionais para filtrar por nome de ambiente e usuário
     nome_amb: Optional[str] = None, # <--- ADICIONADO
-    nome_usu: Optional[str] = None  # <--- ADICIONADO
+    nome_usu: Optional[str] = None, # <--- ADICIONADO
+    cursor_data_inicio: Optional[datetime] = None, # Paginação por cursor (ver obter_reservas)
+    cursor_id: Optional[int] = None
 ) -> List[HistoricoReserva]: # Retorna lista de HistoricoReserva
     """
     Retorna uma lista paginada de registros de histórico de reservas, opcionalmente filtrada.
@@ -1241,56 +2019,89 @@ def obter_historico_reservas( # Nome corrigido para 'obter'
         data_fim_le: Opcional. Filtra histórico por data_fim <= este valor.
         nome_amb: Opcional. Filtra histórico por nome de ambiente (busca parcial, case-insensitive).
         nome_usu: Opcional. Filtra histórico por nome de usuário (busca parcial, case-insensitive).
+        cursor_data_inicio: Opcional. data_inicio do último item recebido (paginação por cursor).
+        cursor_id: Opcional. id do último item recebido.
 
 
     Returns:
-        Uma lista de instâncias do modelo HistoricoReserva.
+        Uma lista de instâncias do modelo HistoricoReserva, ordenada por data_inicio e id decrescentes.
     """
-    # Cria a query base para selecionar HistoricoReserva.
-    query = select(HistoricoReserva)
+    query, params = _query_historico(
+        skip, limit, usuario_id, ambiente_id, status,
+        data_inicio_ge, data_inicio_le, data_fim_ge, data_fim_le,
+        nome_amb, nome_usu, cursor_data_inicio, cursor_id
+    )
 
-    # Aplica filtros baseados nos parâmetros fornecidos.
-    if usuario_id is not None:
-        query = query.where(HistoricoReserva.usuario_id == usuario_id)
-    if ambiente_id is not None:
-        query = query.where(HistoricoReserva.ambiente_id == ambiente_id)
-    if status is not None:
-        query = query.where(HistoricoReserva.status == status)
+    # Executa a query e obtém a lista.
+    historico_reservas: List[HistoricoReserva] = (await session.execute(query, params=params)).scalars().all()
 
-    # Filtros de data/hora.
-    if data_inicio_ge is not None:
-        query = query.where(HistoricoReserva.data_inicio >= data_inicio_ge)
-    if data_inicio_le is not None:
-        query = query.where(HistoricoReserva.data_inicio <= data_inicio_le)
+    return historico_reservas
 
-    if data_fim_ge is not None:
-        query = query.where(HistoricoReserva.data_fim >= data_fim_ge)
-    if data_fim_le is not None:
-        query = query.where(HistoricoReserva.data_fim <= data_fim_le)
+async def obter_historico_reservas_com_total(session: AsyncSession, **filtros) -> Tuple[List[HistoricoReserva], int]:
+    """
+    Igual a obter_historico_reservas, mas também devolve o total de registros (COUNT separado, ver obter_reservas_com_total).
 
-    # **ADICIONADO:** Filtros por nome de ambiente e usuário (busca parcial, case-insensitive)
-    # Usamos .ilike() para busca case-insensitive e '%valor%' para busca parcial.
-    if nome_amb is not None:
-        query = query.where(HistoricoReserva.nome_amb.ilike(f"%{nome_amb}%")) # Busca parcial case-insensitive
-    if nome_usu is not None:
-        query = query.where(HistoricoReserva.nome_usu.ilike(f"%{nome_usu}%")) # Busca parcial case-insensitive
+    Args:
+        session: Sessão do banco de dados.
+        **filtros: Os mesmos parâmetros de obter_historico_reservas.
 
+    Returns:
+        Tupla (registros da página, total de registros filtrados, independente da página).
+    """
+    parametros = {
+        "skip": 0, "limit": 100, "usuario_id": None, "ambiente_id": None, "status": None,
+        "data_inicio_ge": None, "data_inicio_le": None, "data_fim_ge": None, "data_fim_le": None,
+        "nome_amb": None, "nome_usu": None, "cursor_data_inicio": None, "cursor_id": None,
+    }
+    parametros.update(filtros)
+    historico_reservas = await obter_historico_reservas(session, **parametros)
+
+    # Primeira página incompleta: já contém todos os registros filtrados.
+    if parametros["skip"] == 0 and parametros["cursor_data_inicio"] is None and len(historico_reservas) < parametros["limit"]:
+        return historico_reservas, len(historico_reservas)
+
+    params_total: dict = {}
+    query_total = lambda_stmt(lambda: select(func.count()).select_from(HistoricoReserva))
+    query_total = _filtros_historico(
+        query_total, params_total, parametros["usuario_id"], parametros["ambiente_id"], parametros["status"],
+        parametros["data_inicio_ge"], parametros["data_inicio_le"], parametros["data_fim_ge"], parametros["data_fim_le"],
+        parametros["nome_amb"], parametros["nome_usu"]
+    )
+    total: int = (await session.execute(query_total, params=params_total)).scalar_one()
+    return historico_reservas, total
 
-    # Aplica paginação.
-    query = query.offset(skip).limit(limit)
+async def stream_historico_reservas(session: AsyncSession, **filtros) -> AsyncIterator[HistoricoReserva]:
+    """
+    Versão em streaming de obter_historico_reservas (exportação): entrega os registros um a um,
+    buscando-os em lotes.
 
-    # Executa a query e obtém a lista.
-    historico_reservas: List[HistoricoReserva] = session.exec(query).all()
+    Args:
+        session: Sessão do banco de dados.
+        **filtros: Os mesmos parâmetros de obter_historico_reservas (skip, limit, filtros e cursor).
 
-    return historico_reservas
+    Yields:
+        Instâncias de HistoricoReserva, em ordem de data_inicio e id decrescentes.
+    """
+    parametros = {
+        "skip": 0, "limit": 100, "usuario_id": None, "ambiente_id": None, "status": None,
+        "data_inicio_ge": None, "data_inicio_le": None, "data_fim_ge": None, "data_fim_le": None,
+        "nome_amb": None, "nome_usu": None, "cursor_data_inicio": None, "cursor_id": None,
+    }
+    parametros.update(filtros)
+    query, params = _query_historico(**parametros)
+    # yield_per: cursor no servidor, só STREAM_YIELD_PER linhas na memória por vez (ver stream_usuarios).
+    resultado = await session.stream_scalars(query, params=params, execution_options={"yield_per": STREAM_YIELD_PER})
+    async for registro in resultado:
+        yield registro
+        session.expunge(registro) # Mantém o identity map pequeno (ver stream_usuarios)
 
 
 # =============================================
 # Funções para Dashboard Público (Reservas por Dia e Turno)
 # =============================================
 
-def obter_reservas_dashboard(
-    session: Session,
+async def obter_reservas_dashboard(
+    session: AsyncSession,
     data_alvo: date, # A data para filtrar as reservas (apenas o dia)
     turno_alvo: str # O turno para filtrar as reservas ('manha', 'tarde', 'noite')
 ) -> List[ReservaDashboard]:
@@ -1325,53 +2136,42 @@ def obter_reservas_dashboard(
     periodo_fim_dt = datetime.combine(data_alvo, turno_times[1], tzinfo=timezone.utc)
 
     # 2. Criar a query para obter reservas.
-    # **CORREÇÃO:** Selecionar do modelo Reserva e explicitamente juntar com Ambiente
-    # para que a tabela Ambiente esteja na cláusula FROM.
-    # Usamos join() para o join explícito.
-    query = select(Reserva).join(Ambiente).where( # <--- CORRIGIDO: select(Reserva).join(Ambiente)
-        Reserva.status.in_([StatusReserva.PENDENTE, StatusReserva.CONFIRMADA]),
-        and_(
-            Reserva.data_inicio < periodo_fim_dt,
-            Reserva.data_fim > periodo_inicio_dt
+    # Projeção só das colunas exibidas no dashboard, já com os nomes do schema ReservaDashboard:
+    # nenhum objeto ORM (Reserva/Ambiente/Usuario) é montado e o banco só envia essas colunas.
+    # Os joins são internos porque as FKs de Reserva não são nulas.
+    query = (
+        select(
+            Ambiente.nome.label("ambiente_nome"),
+            Ambiente.tipo_ambiente,
+            Reserva.data_inicio,
+            Reserva.data_fim,
+            Usuario.nome.label("usuario_nome"),
+        )
+        .join(Ambiente, Reserva.ambiente_id == Ambiente.id)
+        .join(Usuario, Reserva.usuario_id == Usuario.id)
+        .where(
+            # Mesmo status e mesma expressão de sobreposição da restrição EXCLUDE excl_reserva_sobreposicao:
+            # o planner pode usar o índice GiST dela (tstzrange(data_inicio, data_fim) && período do turno)
+            # em vez de varrer todas as reservas com data_fim posterior ao início do turno.
+            Reserva.status.in_(_STATUS_BLOQUEANTES),
+            func.tstzrange(Reserva.data_inicio, Reserva.data_fim).op("&&")(
+                func.tstzrange(periodo_inicio_dt, periodo_fim_dt)
+            )
         )
-    ).options(
-        # Manter selectinload para carregar os relacionamentos após a consulta principal.
-        # O join já garante que ambiente está disponível para a ordenação,
-        # mas selectinload otimiza o carregamento dos dados do objeto relacionado.
-        selectinload(Reserva.ambiente),
-        selectinload(Reserva.usuario)
+        .order_by(Ambiente.nome, Reserva.data_inicio) # Ordenar por Ambiente.nome e Reserva.data_inicio
     )
 
-    # **CORREÇÃO:** Ordenar por Ambiente.nome e Reserva.data_inicio
-    query = query.order_by(Ambiente.nome, Reserva.data_inicio) # <--- CORRIGIDO (já estava correto, mas agora o JOIN permite)
-
-
     # 3. Executar a query.
     # Adicionar tratamento de erro para ProgrammingError, caso a query ainda esteja inválida.
     try:
-        reservas_no_turno: List[Reserva] = session.exec(query).all()
+        linhas = (await session.execute(query)).mappings().all()
     except ProgrammingError as e:
-        logger.error(f"Erro de programação na query do dashboard: {e}", exc_info=True)
+        logger.error("Erro de programação na query do dashboard: %s", e, exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro interno ao consultar reservas para dashboard.")
-    
+
     # 4. Adaptar os resultados para o schema de saída ReservaDashboard.
-    # Criar manualmente objetos que correspondam ao schema ReservaDashboard,
-    # extraindo os dados dos relacionamentos carregados.
-    reservas_dashboard: List[ReservaDashboard] = []
-    for reserva in reservas_no_turno:
-        # Certifique-se que ambiente e usuario não são None (o que não deve acontecer se a FK não é NULLABLE e o relacionamento foi carregado)
-        if reserva.ambiente and reserva.usuario:
-            reservas_dashboard.append(ReservaDashboard(
-                # id=reserva.id, # Opcional
-                ambiente_nome=reserva.ambiente.nome,
-                tipo_ambiente=reserva.ambiente.tipo_ambiente,
-                data_inicio=reserva.data_inicio,
-                data_fim=reserva.data_fim,
-                usuario_nome=reserva.usuario.nome,
-                # status=reserva.status # Opcional
-            ))
-         # Se ambiente ou usuario for None, podemos pular esta reserva ou logar um warning.
-         # logger.warning(f"Reserva {reserva.id} com relacionamento nulo (ambiente ou usuario).")
+    # Cada linha já tem exatamente as chaves do schema.
+    reservas_dashboard: List[ReservaDashboard] = [ReservaDashboard.model_validate(linha) for linha in linhas]
 
     # 5. Retornar a lista de objetos formatados.
     return reservas_dashboard
\ No newline at end of file
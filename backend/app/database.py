@@ -4,8 +4,18 @@
 # =============================================
 # Importações
 # =============================================
-from sqlmodel import SQLModel, create_engine, Session # Importa o necessário do SQLModel
+from sqlmodel import SQLModel # Importa o necessário do SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession # Sessão assíncrona do SQLModel (suporta session.exec com await)
+from sqlalchemy.ext.asyncio import create_async_engine # Engine assíncrona do SQLAlchemy
+from sqlalchemy import text # SQL literal dos ajustes de schema (catálogo, extensões, advisory lock)
+from sqlalchemy.schema import AddConstraint # ALTER TABLE ... ADD CONSTRAINT gerado a partir do modelo
 import os  # Módulo padrão do Python para interagir com o sistema operacional
+import asyncio # Para abrir as conexões do pré-aquecimento em paralelo
+import logging # Módulo de logging padrão (em vez de print: respeita o nível configurado)
+
+from app.models import Reserva, HistoricoReserva # Modelos cujas restrições/índices são garantidos em bancos existentes
+
+logger = logging.getLogger(__name__) # Logger específico deste módulo (app.database)
 
 # =============================================
 # Configuração da Conexão com o PostgreSQL
@@ -14,24 +24,61 @@ import os  # Módulo padrão do Python para interagir com o sistema operacional
 # Esta variável deve ser definida no seu arquivo .env na raiz e passada para o contêiner backend via docker-compose.
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Debug provisório: imprime a URL lida (REMOVER EM PRODUÇÃO!)
-print("DATABASE_URL =", DATABASE_URL)
+# Modo de desenvolvimento: DEBUG=1 ativa verificações extras (ex: raiseload nas consultas do CRUD,
+# que faz qualquer lazy load acidental de relacionamento levantar erro em vez de gerar N+1 silencioso).
+DEBUG = os.getenv("DEBUG") == "1"
+
+# SQL_ECHO=1 liga o log de todas as queries SQL (e do pool) executadas. Útil para debug em desenvolvimento,
+# mas cada statement vira uma chamada de logging com o SQL e os parâmetros formatados: desligado por padrão.
+SQL_ECHO = os.getenv("SQL_ECHO") == "1"
+
+# RUN_INIT_DB=1 faz o startup da aplicação criar as tabelas que faltam (init_db, abaixo).
+# Desligado por padrão: com vários workers, cada um repetiria a introspecção do schema a cada boot.
+# O docker-compose de desenvolvimento liga a flag; em produção o schema é criado uma vez (ou via Alembic).
+RUN_INIT_DB = os.getenv("RUN_INIT_DB") == "1"
 
 # Verificação básica se a variável de ambiente foi carregada.
 if not DATABASE_URL:
-    print("Erro: Variável de ambiente DATABASE_URL não encontrada no ambiente do contêiner.")
+    logger.error("Variável de ambiente DATABASE_URL não encontrada no ambiente do contêiner.")
     # Considere levantar uma exceção aqui para falhar rapidamente se a variável não estiver definida.
     # raise EnvironmentError("Variável de ambiente DATABASE_URL não configurada.")
+elif DATABASE_URL.startswith(("postgresql://", "postgres://")):
+    # A engine assíncrona precisa de um driver async. Usamos o psycopg 3 (modo async),
+    # que envia os datetimes com fuso horário para as colunas TIMESTAMP WITH TIME ZONE do banco.
+    # As colunas de data precisam continuar timestamptz: a restrição EXCLUDE da reserva usa
+    # tstzrange, que só é imutável (utilizável em índice) sobre timestamptz.
+    # Assim o .env pode continuar com a URL padrão "postgresql://...".
+    DATABASE_URL = "postgresql+psycopg://" + DATABASE_URL.split("://", 1)[1]
+
+
+# =============================================
+# Configuração do Pool de Conexões
+# =============================================
+# O pool padrão do SQLAlchemy (5 conexões + 10 de overflow) trava com ~15 requisições simultâneas.
+# Os valores abaixo podem ser ajustados por variável de ambiente conforme a carga esperada
+# (lembre que pool_size + max_overflow, vezes o número de workers, deve caber no max_connections do PostgreSQL).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20")) # Conexões mantidas abertas no pool
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20")) # Conexões extras permitidas em picos de carga
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "5")) # Segundos esperando uma conexão livre antes de falhar
+                                                        # (curto: melhor responder erro logo do que empilhar requisições)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800")) # Recicla conexões com mais de 30min (evita conexões derrubadas pelo servidor/proxy)
+DB_POOL_PREWARM = int(os.getenv("DB_POOL_PREWARM", "5")) # Conexões abertas já no startup (0 desliga o pre-aquecimento)
 
 
 # =============================================
 # Criação da Engine SQLAlchemy
 # =============================================
-# Cria a "engine" do SQLAlchemy, que é o ponto de partida para interagir com o banco de dados.
-engine = create_engine(
+# Cria a "engine" assíncrona do SQLAlchemy, que é o ponto de partida para interagir com o banco de dados.
+# As rotas aguardam (await) o I/O do banco em vez de ocupar uma thread do threadpool por requisição.
+engine = create_async_engine(
     DATABASE_URL, # Usa a URL lida da variável de ambiente
-    echo=True  # Ativa o log de todas as queries SQL executadas. EXCELENTE para debug em desenvolvimento.
-               # MUDAR para False em produção por performance e segurança.
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True, # Testa a conexão antes de usar (descarta conexões mortas em vez de falhar no commit)
+    echo=SQL_ECHO, # Log das queries SQL só quando SQL_ECHO=1
+    echo_pool="debug" if SQL_ECHO else False # Log de checkout/checkin do pool junto com o das queries
 )
 
 # =============================================
@@ -39,10 +86,36 @@ engine = create_engine(
 # =============================================
 # Esta função geradora é uma "dependência" para as rotas do FastAPI.
 # Ela fornece uma sessão de banco de dados que é fechada automaticamente após o uso.
-def get_session():
-    with Session(engine) as session:
+# O FastAPI executa a dependência uma única vez por requisição: a rota e as dependências
+# aninhadas (ex: get_current_user) recebem a MESMA sessão, ou seja, uma única conexão do pool.
+# expire_on_commit=False: em modo assíncrono não existe lazy load, então os objetos
+# precisam continuar legíveis após o commit (para a serialização da resposta).
+async def get_session():
+    async with AsyncSession(engine, expire_on_commit=False) as session:
         yield session # Fornece a sessão à rota que a injetou.
-    # A sessão é fechada automaticamente quando o bloco 'with' termina.
+    # A sessão é fechada (e a conexão devolvida ao pool) quando o bloco 'async with' termina.
+
+
+# =============================================
+# Pré-aquecimento do Pool de Conexões
+# =============================================
+# Abre algumas conexões no startup para que as primeiras requisições não paguem
+# a conexão TCP + autenticação com o PostgreSQL.
+async def prewarm_pool():
+    quantidade = min(DB_POOL_PREWARM, DB_POOL_SIZE) # Além do pool_size as conexões seriam descartadas ao devolver
+    if quantidade <= 0:
+        return
+
+    async def abrir_conexao():
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("SELECT 1")
+
+    # Em paralelo: cada tarefa segura uma conexão diferente; ao terminar, todas ficam ociosas no pool.
+    try:
+        await asyncio.gather(*(abrir_conexao() for _ in range(quantidade)))
+    except Exception as e:
+        # Banco fora do ar no boot não impede a aplicação de subir; as conexões serão abertas sob demanda.
+        logger.warning("Não foi possível pré-aquecer o pool de conexões: %s", e)
 
 
 # =============================================
@@ -50,17 +123,185 @@ def get_session():
 # =============================================
 # Função para criar todas as tabelas definidas nos modelos SQLModel
 # que ainda não existem no banco de dados.
-def init_db():
+async def init_db():
 
-    print("Tentando criar tabelas do banco de dados (se não existirem)...")
+    logger.debug("Tentando criar tabelas do banco de dados (se não existirem)...")
     # SQLModel.metadata.create_all(engine) usa o metadata de TODAS as classes que herdam de SQLModel
     # e estão definidas e acessíveis no momento da chamada.
 
-    SQLModel.metadata.create_all(engine)
-    print("Tentativa de criação de tabelas finalizada.")
+    # create_all é síncrono; run_sync executa-o sobre a conexão assíncrona.
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    logger.debug("Tentativa de criação de tabelas finalizada.")
 
 # Essa função 'init_db()':
 # - É útil apenas para a configuração inicial do banco de dados em AMBIENTE DE DESENVOLVIMENTO.
 # - Cria tabelas que não existem baseadas nos modelos definidos.
 # - NÃO gerencia ALTERAÇÕES (adição/remoção de colunas, etc.) em tabelas existentes.
-# - NÃO DEVE ser usada em PRODUÇÃO para aplicar mudanças no schema. Use Alembic para migrações em produção.
\ No newline at end of file
+# - NÃO DEVE ser usada em PRODUÇÃO para aplicar mudanças no schema. Use Alembic para migrações em produção.
+
+
+# =============================================
+# Ajustes de Schema em Bancos Existentes
+# =============================================
+# create_all só cria restrições e índices junto com a tabela: num banco em que a tabela já existia
+# (criado antes da mudança no modelo, ou com RUN_INIT_DB desligado) eles nunca aparecem.
+# aplicar_ajustes_schema() roda a cada startup e aplica esses itens de forma idempotente:
+# cada passo confere o catálogo antes e não faz nada se o ajuste já estiver no banco.
+
+# Nome da restrição EXCLUDE de sobreposição de reservas (definida em Reserva.__table_args__).
+RESTRICAO_SOBREPOSICAO = "excl_reserva_sobreposicao"
+
+# True depois que o startup confirmou que a restrição existe no banco. Enquanto for False
+# (banco com reservas sobrepostas, sem permissão para criar a extensão, fora do ar no boot...),
+# a criação de reservas faz a checagem de disponibilidade antes do INSERT (ver crud.criar_reserva).
+restricao_sobreposicao_confirmada = False
+
+# Chave do advisory lock que serializa os ajustes entre workers que sobem ao mesmo tempo.
+_LOCK_AJUSTES_SCHEMA = 724_310_001
+
+# Pares de reservas ativas do mesmo ambiente com períodos sobrepostos. Se existir algum,
+# o ADD CONSTRAINT falharia: a restrição não é criada até que os conflitos sejam resolvidos.
+_SQL_RESERVAS_SOBREPOSTAS = text("""
+    SELECT a.id, b.id
+    FROM reserva a
+    JOIN reserva b
+      ON b.ambiente_id = a.ambiente_id
+     AND b.id > a.id
+     AND tstzrange(b.data_inicio, b.data_fim) && tstzrange(a.data_inicio, a.data_fim)
+    WHERE a.status IN ('PENDENTE', 'CONFIRMADA')
+      AND b.status IN ('PENDENTE', 'CONFIRMADA')
+    LIMIT 20
+""")
+
+
+async def _garantir_restricao_sobreposicao(conn) -> bool:
+    """
+    Adiciona a restrição EXCLUDE excl_reserva_sobreposicao à tabela reserva, se ainda não existir.
+
+    Antes do ALTER TABLE confere se há reservas ativas sobrepostas já gravadas: nesse caso só registra
+    os pares (ids) no log e não cria a restrição. A checagem de disponibilidade da aplicação continua
+    valendo; depois de cancelar/finalizar uma reserva de cada par, o próximo startup cria a restrição.
+
+    Args:
+        conn: Conexão assíncrona dentro da transação dos ajustes.
+
+    Returns:
+        True se a restrição existe no banco ao final (já existia ou foi criada), False caso contrário.
+    """
+    if (await conn.execute(text("SELECT to_regclass('reserva')"))).scalar() is None:
+        return False # Tabela ainda não existe (e RUN_INIT_DB desligado): nada a confirmar.
+    ja_existe = (await conn.execute(
+        text("SELECT 1 FROM pg_constraint WHERE conname = :nome"), {"nome": RESTRICAO_SOBREPOSICAO}
+    )).first()
+    if ja_existe:
+        return True
+
+    sobrepostas = (await conn.execute(_SQL_RESERVAS_SOBREPOSTAS)).all()
+    if sobrepostas:
+        logger.error(
+            "Restrição %s não criada: há reservas ativas sobrepostas no banco (pares de ids: %s). "
+            "Cancele ou finalize uma reserva de cada par; a restrição é criada no próximo startup.",
+            RESTRICAO_SOBREPOSICAO, ", ".join(f"{a}/{b}" for a, b in sobrepostas)
+        )
+        return False
+
+    # Mesma extensão e mesma restrição que o create_all cria junto com a tabela (ver models.py).
+    # O ALTER TABLE constrói o índice GiST com a tabela bloqueada: em tabelas grandes, rode numa janela tranquila.
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+    restricao = next(c for c in Reserva.__table__.constraints if c.name == RESTRICAO_SOBREPOSICAO)
+    await conn.execute(AddConstraint(restricao))
+    logger.info("Restrição %s adicionada à tabela reserva.", RESTRICAO_SOBREPOSICAO)
+    return True
+
+
+# Índices B-tree de sobreposição que o modelo não define mais (o GiST da restrição atende o &&).
+_INDICES_RESERVA_REMOVIDOS = ("idx_reserva_overlap", "idx_reserva_active_overlap")
+# Índice que substitui o prefixo ambiente_id que eles ofereciam (ver models.py).
+_INDICE_RESERVA_AMBIENTE = "idx_reserva_ambiente_list"
+
+
+async def _ajustar_indices_reserva(conn) -> None:
+    """
+    Remove os antigos índices B-tree de sobreposição da reserva e cria idx_reserva_ambiente_list, se faltar.
+
+    Args:
+        conn: Conexão assíncrona dentro da transação dos ajustes.
+    """
+    existentes = set((await conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = 'reserva'")
+    )).scalars())
+    if not existentes:
+        return # Tabela ainda não existe: create_all a cria já com os índices do modelo.
+
+    for nome in _INDICES_RESERVA_REMOVIDOS:
+        if nome in existentes:
+            await conn.execute(text(f"DROP INDEX IF EXISTS {nome}"))
+            logger.info("Índice %s removido da reserva.", nome)
+
+    if _INDICE_RESERVA_AMBIENTE not in existentes:
+        indice = next(i for i in Reserva.__table__.indexes if i.name == _INDICE_RESERVA_AMBIENTE)
+        await conn.run_sync(lambda sync_conn: indice.create(sync_conn))
+        logger.info("Índice %s criado na reserva.", indice.name)
+
+
+# Índices de trigramas da busca por nome no histórico (expressão lower(nome), ver models.py).
+_INDICES_BUSCA_HISTORICO = ("idx_historico_nome_amb_lower_trgm", "idx_historico_nome_usu_lower_trgm")
+
+
+async def _ajustar_busca_nome_historico(conn) -> None:
+    """
+    Deixa a tabela do histórico com os índices de trigramas sobre lower(nome_amb)/lower(nome_usu).
+
+    Remove as antigas colunas geradas nome_amb_lower/nome_usu_lower (e, com elas, os índices antigos),
+    que o modelo não mapeia mais, e cria os índices de expressão que faltarem.
+
+    Args:
+        conn: Conexão assíncrona dentro da transação dos ajustes.
+    """
+    if (await conn.execute(text("SELECT to_regclass('historicoreserva')"))).scalar() is None:
+        return # Tabela ainda não existe: create_all a cria já com os índices.
+
+    colunas_antigas = (await conn.execute(text(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = 'historicoreserva' AND column_name IN ('nome_amb_lower', 'nome_usu_lower')"
+    ))).first()
+    if colunas_antigas:
+        await conn.execute(text(
+            "ALTER TABLE historicoreserva DROP COLUMN IF EXISTS nome_amb_lower, DROP COLUMN IF EXISTS nome_usu_lower"
+        ))
+        logger.info("Colunas geradas nome_amb_lower/nome_usu_lower removidas do histórico.")
+
+    existentes = set((await conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = 'historicoreserva'")
+    )).scalars())
+    faltando = [i for i in HistoricoReserva.__table__.indexes if i.name in _INDICES_BUSCA_HISTORICO and i.name not in existentes]
+    if not faltando:
+        return
+    # Mesma extensão que o create_all cria junto com a tabela (operadores gin_trgm_ops).
+    # O CREATE INDEX bloqueia as escritas no histórico enquanto o índice é construído.
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for indice in faltando:
+        await conn.run_sync(lambda sync_conn: indice.create(sync_conn))
+        logger.info("Índice %s criado no histórico.", indice.name)
+
+
+async def aplicar_ajustes_schema():
+    """
+    Aplica, de forma idempotente, os ajustes de schema que o create_all não faz em tabelas já existentes.
+
+    Roda numa única transação, sob um advisory lock (um worker por vez). Falhas (banco fora do ar,
+    permissão para criar extensão etc.) são registradas no log e não impedem a aplicação de subir.
+    Atualiza restricao_sobreposicao_confirmada.
+    """
+    global restricao_sobreposicao_confirmada
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text("SELECT pg_advisory_xact_lock(:chave)"), {"chave": _LOCK_AJUSTES_SCHEMA})
+            confirmada = await _garantir_restricao_sobreposicao(conn)
+            await _ajustar_indices_reserva(conn)
+            await _ajustar_busca_nome_historico(conn)
+        # Só depois do commit: se algum passo falhar, o ADD CONSTRAINT também é desfeito.
+        restricao_sobreposicao_confirmada = confirmada
+    except Exception as e:
+        logger.warning("Não foi possível aplicar os ajustes de schema: %s", e)
@@ -5,6 +5,7 @@
 # Importações principais do FastAPI
 # =============================================
 from fastapi import FastAPI
+from contextlib import asynccontextmanager  # Para o lifespan (inicialização/encerramento da aplicação)
 from fastapi.middleware.cors import CORSMiddleware  # Para lidar com CORS
 from fastapi.openapi.utils import get_openapi  # Para documentação OpenAPI customizada
 
@@ -14,13 +15,14 @@ from fastapi.openapi.utils import get_openapi  # Para documentação OpenAPI cus
 from app.routers import usuarios  # Importa o router de usuários
 from app.routers import ambientes  # Importa o router de ambientes
 from app.routers import reservas  # Importa o router de reservas
-from app.database import init_db  # Importa a função de inicialização do banco de dados
+from app.database import engine, init_db, aplicar_ajustes_schema, prewarm_pool, RUN_INIT_DB  # Engine, inicialização/ajustes do banco e a flag do init_db
+from app.responses import HEADER_CURSOR, HEADER_CURSOR_DATA_INICIO, HEADER_CURSOR_ID, HEADER_TOTAL  # Cabeçalhos do cursor e do total expostos via CORS
 # Importa os modelos explicitamente para garantir que SQLModel os "encontre" para create_all
 # Mesmo que não use diretamente as classes aqui, esta importação garante que elas sejam carregadas.
 from app.models import Usuario, Ambiente, Reserva, HistoricoReserva
 
 # =============================================
-# Configuração do Logger (Para logs no evento startup, etc.)
+# Configuração do Logger (Para logs do lifespan, etc.)
 # =============================================
 import logging # Importa o módulo de logging padrão
 # Configuração básica do logger para o console
@@ -28,10 +30,39 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# =============================================
+# Ciclo de Vida (Inicialização e Encerramento do servidor)
+# =============================================
+# Substitui o antigo @app.on_event("startup") (descontinuado no FastAPI).
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Executa tarefas na inicialização (DB, pool, OpenAPI) e no encerramento da aplicação."""
+    # Cria tabelas se não existirem, só quando RUN_INIT_DB=1 (ambiente de desenvolvimento).
+    if RUN_INIT_DB:
+        logger.info("Inicializando banco de dados...")
+        await init_db()
+        logger.info("Banco de dados pronto.")
+
+    # Restrições/índices que o create_all não adiciona em tabelas já existentes (idempotente).
+    await aplicar_ajustes_schema()
+
+    # Abre algumas conexões do pool antes de receber requisições.
+    await prewarm_pool()
+
+    # Gera (e guarda em app.openapi_schema) o schema OpenAPI já no boot, com todas as rotas registradas:
+    # a primeira visita a /docs ou /openapi.json não paga a varredura de rotas e schemas.
+    app.openapi()
+
+    yield # A aplicação atende requisições aqui
+
+    # Encerramento: fecha as conexões do pool.
+    await engine.dispose()
+
 # =============================================
 # Cria a instância principal da aplicação FastAPI
 # =============================================
 app = FastAPI(
+    lifespan=lifespan, # Inicialização/encerramento (ver acima)
     # Opcional: Adicione metadados padrão aqui (title, version, description)
     # title="Sistema de Reservas",
     # version="1.0.0",
@@ -50,19 +81,10 @@ app.add_middleware(
     allow_credentials=True,  # Permite cookies, cabeçalhos de autorização, etc.
     allow_methods=["*"],  # Permite todos os métodos HTTP (GET, POST, PUT, DELETE, etc.)
     allow_headers=["*"],  # Permite todos os cabeçalhos (incluindo Content-Type, Authorization, etc.)
+    # Cabeçalhos de resposta que o navegador deixa o frontend ler (cursor da próxima página e total)
+    expose_headers=[HEADER_CURSOR, HEADER_CURSOR_DATA_INICIO, HEADER_CURSOR_ID, HEADER_TOTAL],
 )
 
-# =============================================
-# Evento de Inicialização (Executado ao iniciar o servidor)
-# =============================================
-@app.on_event("startup")
-def startup_event():
-    """Executa tarefas na inicialização da aplicação (ex: inicializar DB)."""
-    logger.info("Inicializando banco de dados...")
-    # Chama a função para criar tabelas se não existirem (ambiente de desenvolvimento)
-    init_db()
-    logger.info("Banco de dados pronto.")
-
 # =============================================
 # Rota Raiz (Health Check Simples)
 # =============================================
@@ -2,8 +2,10 @@
 # # Usa SQLModel para definir os campos e relações.
  
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import func, Index, text, column, event, DDL # now() como default do servidor; índices compostos/parciais
+from sqlalchemy.dialects.postgresql import ExcludeConstraint # Restrição EXCLUDE USING gist (sem sobreposição de reservas)
 from typing import List, Optional
-from datetime import datetime, timezone
+from datetime import datetime
 from enum import Enum
 import uuid
 
@@ -16,6 +18,10 @@ class TipoUsuario(str, Enum):
 # Modelo de Usuário (Tabela do Banco)
 class Usuario(SQLModel, table=True):
     """Representa um usuário do sistema com informações de login e tipo."""
+    # eager_defaults: valores gerados pelo banco voltam no próprio INSERT/UPDATE (RETURNING),
+    # dispensando o session.refresh() (SELECT extra) depois do commit.
+    __mapper_args__ = {"eager_defaults": True}
+
     id: uuid.UUID = Field(
         default_factory=uuid.uuid4,  # Gera UUID automaticamente
         primary_key=True,
@@ -36,7 +42,14 @@ class Usuario(SQLModel, table=True):
     )
 
     ativo: bool = Field(default=True) # usuario por padrão já está ativo, até que algum admin desative
-    data_criacao: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))  # Data da criação do usuário
+    # Data da criação do usuário, preenchida pelo próprio banco (DEFAULT now()) no INSERT.
+    # Evita uma chamada datetime.now() por linha no Python (relevante no cadastro em lote);
+    # com eager_defaults o valor gerado volta no RETURNING do INSERT.
+    data_criacao: Optional[datetime] = Field(
+        default=None,
+        nullable=False,
+        sa_column_kwargs={"server_default": func.now()}
+    )
     # Relacionamento inverso (um Usuario pode ter muitas Reservas)
     reservas: List["Reserva"] = Relationship(back_populates="usuario")
 
@@ -92,6 +105,7 @@ class TipoAmbiente(str, Enum):
     logistica = "logística"
 
 class Ambiente(SQLModel, table=True):
+    __mapper_args__ = {"eager_defaults": True} # Defaults do banco retornados via RETURNING (sem refresh)
     id: Optional[int] = Field(primary_key=True)
     nome: str
     capacidade: int 
@@ -113,16 +127,64 @@ class StatusReserva(str, Enum):
     FINALIZADA = "finalizada"
 
 class Reserva(SQLModel, table=True):
+    # A checagem de sobreposição (verificar_disponibilidade_ambiente, dashboard) compara
+    # tstzrange(data_inicio, data_fim) com &&: quem a atende é o índice GiST da restrição
+    # excl_reserva_sobreposicao (abaixo). Índices B-tree em data_inicio/data_fim não servem para &&.
+    # Obs.: o Enum é gravado pelo NOME no banco ('PENDENTE', 'CONFIRMADA').
+    # - idx_reserva_list_default: índice de cobertura da listagem sem filtros (obter_reservas),
+    #   na mesma ordem do ORDER BY/cursor (data_inicio, id decrescentes). O INCLUDE traz as demais
+    #   colunas da reserva, então a página sai de um index-only scan, sem visitar a tabela.
+    # - idx_reserva_usuario_list: listagem das reservas de um usuário (mesma ordenação);
+    #   também atende as buscas pela FK usuario_id (ex: ao excluir um usuário).
+    # - idx_reserva_ambiente_list: o mesmo para o filtro por ambiente da listagem; também atende
+    #   ambiente_tem_reservas e a FK ambiente_id, que olham todos os status (o GiST da restrição é
+    #   parcial, só com as reservas ativas).
+    __table_args__ = (
+        Index("idx_reserva_usuario_list", "usuario_id", column("data_inicio").desc(), column("id").desc()),
+        Index("idx_reserva_ambiente_list", "ambiente_id", column("data_inicio").desc(), column("id").desc()),
+        Index(
+            "idx_reserva_list_default", column("data_inicio").desc(), column("id").desc(),
+            postgresql_include=["ambiente_id", "usuario_id", "status", "data_fim", "data_criacao", "motivo"]
+        ),
+        # Restrição de exclusão: duas reservas ativas do mesmo ambiente não podem ter períodos
+        # sobrepostos (operador && entre tstzrange). O banco cria um índice GiST para ela, usado
+        # também pela checagem de disponibilidade, e a dupla reserva fica impossível mesmo com
+        # requisições concorrentes (o INSERT/UPDATE que violar levanta IntegrityError).
+        # tstzrange usa limites [inicio, fim): reservas encostadas (fim == início) não conflitam.
+        # Requer a extensão btree_gist (igualdade de inteiro em índice GiST), criada logo abaixo.
+        # Em bancos cuja tabela reserva já existia, a restrição é adicionada no startup
+        # (database.aplicar_ajustes_schema), desde que não haja reservas ativas sobrepostas.
+        ExcludeConstraint(
+            (column("ambiente_id"), "="),
+            (func.tstzrange(column("data_inicio"), column("data_fim")), "&&"),
+            name="excl_reserva_sobreposicao",
+            using="gist",
+            where=text("status IN ('PENDENTE', 'CONFIRMADA')"),
+        ),
+    )
+
+    __mapper_args__ = {"eager_defaults": True} # data_criacao (DEFAULT do banco) volta no RETURNING do INSERT
+
     id: Optional[int] = Field(default=None, primary_key=True)
     
     # Chaves estrangeiras (relacionamentos)
-    ambiente_id: int = Field(foreign_key="ambiente.id", index=True)  # Indexação
-    usuario_id: uuid.UUID = Field(foreign_key="usuario.id", index=True)
+    # ambiente_id, usuario_id e data_inicio não têm índice próprio: são a primeira coluna dos índices
+    # compostos acima (idx_reserva_ambiente_list / idx_reserva_usuario_list / idx_reserva_list_default).
+    # Índices de coluna única redundantes só custariam escrita extra em todo INSERT/UPDATE.
+    ambiente_id: int = Field(foreign_key="ambiente.id")
+    usuario_id: uuid.UUID = Field(foreign_key="usuario.id") # Indexado por idx_reserva_usuario_list
     
     # Datas e horários
-    data_inicio: datetime = Field(index=True)  # Quando a reserva começa
-    data_fim: datetime = Field(index=True)   # Quando a reserva termina
-    data_criacao: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))  # Data da solicitação
+    data_inicio: datetime  # Quando a reserva começa
+    data_fim: datetime = Field(index=True)   # Quando a reserva termina (índice: filtros por data_fim e reservas expiradas)
+    # Data da solicitação, preenchida pelo próprio banco no INSERT, como em Usuario.
+    # clock_timestamp() em vez de now(): now() é o início da transação, então todas as reservas
+    # de um lote (criar_reservas_bulk) teriam o mesmo valor; clock_timestamp() avança a cada linha.
+    data_criacao: Optional[datetime] = Field(
+        default=None,
+        nullable=False,
+        sa_column_kwargs={"server_default": func.clock_timestamp()}
+    )
     
     # Status e metadados
     status: StatusReserva = Field(default=StatusReserva.PENDENTE)
@@ -132,8 +194,41 @@ class Reserva(SQLModel, table=True):
     ambiente: "Ambiente" = Relationship(back_populates="reservas")
     usuario: "Usuario" = Relationship(back_populates="reservas")
 
+# Garante a extensão btree_gist antes do CREATE TABLE da reserva (necessária para a ExcludeConstraint).
+event.listen(Reserva.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+
 class HistoricoReserva(SQLModel, table=True):
     # Tabela de histórico (cópia de reservas passadas)
+    # O histórico só recebe INSERTs, em ordem aproximadamente cronológica: cenário ideal para BRIN.
+    # O índice guarda apenas o mínimo/máximo das datas por faixa de páginas (algumas centenas de KB
+    # em vez de dezenas de MB de um B-tree) e atende os filtros de período de obter_historico_reservas.
+    __table_args__ = (
+        Index(
+            "idx_historico_data_brin", "data_inicio", "data_fim",
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": 32}
+        ),
+        # O BRIN não entrega linhas ordenadas: sem um B-tree na ordem da listagem (data_inicio, id
+        # decrescentes), cada página padrão ordenaria o histórico inteiro antes do LIMIT.
+        # Com estes índices a página é uma leitura de índice que para no LIMIT (ou no cursor).
+        # - idx_historico_lista: histórico geral (admin);
+        # - idx_historico_usuario_lista: histórico pessoal (/historico/me), sempre filtrado por usuario_id.
+        Index("idx_historico_lista", column("data_inicio").desc(), column("id").desc()),
+        Index("idx_historico_usuario_lista", "usuario_id", column("data_inicio").desc(), column("id").desc()),
+        # Busca por trecho do nome (lower(nome) LIKE '%texto%'): o curinga no início impede o uso de B-tree.
+        # Índices GIN de trigramas (pg_trgm) sobre a expressão lower(nome) atendem o LIKE sem precisar
+        # de coluna extra na tabela. O rótulo (label) é o nome pelo qual postgresql_ops acha a expressão.
+        Index(
+            "idx_historico_nome_amb_lower_trgm", func.lower(column("nome_amb")).label("nome_amb_lower"),
+            postgresql_using="gin",
+            postgresql_ops={"nome_amb_lower": "gin_trgm_ops"}
+        ),
+        Index(
+            "idx_historico_nome_usu_lower_trgm", func.lower(column("nome_usu")).label("nome_usu_lower"),
+            postgresql_using="gin",
+            postgresql_ops={"nome_usu_lower": "gin_trgm_ops"}
+        ),
+    )
     id: int = Field(primary_key=True)  # Pode ser o mesmo ID da reserva original
     ambiente_id: int  # Sem FK, pois o ambiente pode ter sido deletado
     nome_amb: str
@@ -143,4 +238,7 @@ class HistoricoReserva(SQLModel, table=True):
     data_fim: datetime
     data_criacao: datetime
     status: StatusReserva
-    motivo: str
\ No newline at end of file
+    motivo: str
+
+# Garante a extensão pg_trgm (operadores gin_trgm_ops) antes do CREATE TABLE do histórico.
+event.listen(HistoricoReserva.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
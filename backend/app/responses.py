@@ -0,0 +1,168 @@
+# backend/app/responses.py
+# Utilitários de resposta HTTP compartilhados pelos routers.
+
+# =============================================
+# Importações
+# =============================================
+import base64 # Codificação do cursor opaco de paginação
+from datetime import datetime # Tipo do data_inicio guardado no cursor
+from typing import AsyncIterator, Callable, Optional, Sequence, Tuple, Type # Tipos para as assinaturas dos helpers
+from fastapi import Response # Resposta da rota (para definir cabeçalhos)
+from fastapi.responses import StreamingResponse # Resposta enviada em pedaços (chunked)
+from pydantic import BaseModel # Tipo base dos schemas de leitura
+
+# Quantidade de objetos serializados por pedaço enviado ao cliente.
+CHUNK_SIZE = 500
+
+# Cabeçalhos com o cursor da próxima página (paginação keyset das listagens de reservas/histórico).
+# Também precisam estar em expose_headers do CORS para o frontend conseguir lê-los.
+HEADER_CURSOR_DATA_INICIO = "X-Next-Cursor-Data-Inicio"
+HEADER_CURSOR_ID = "X-Next-Cursor-Id"
+HEADER_CURSOR = "X-Next-Cursor" # Mesmo cursor, codificado em um único valor opaco (parâmetro 'cursor')
+# Cabeçalho com o total de registros filtrados (quando o cliente pede incluir_total).
+HEADER_TOTAL = "X-Total-Count"
+
+# =============================================
+# Listagens em streaming (array JSON)
+# =============================================
+def json_array_response(
+    fonte: AsyncIterator, # Iterador assíncrono de objetos ORM, já ligado à sessão da requisição (ex: crud.stream_usuarios(session))
+    schema: Type[BaseModel], # Schema de leitura usado para serializar cada item (ex: UsuarioRead)
+    ao_concluir: Optional[Callable[[bytes], None]] = None # Opcional: recebe o corpo completo ao fim do envio (ex: para cache)
+) -> StreamingResponse:
+    """
+    Monta uma StreamingResponse que envia um array JSON à medida que as linhas chegam do banco.
+
+    O corpo continua sendo exatamente o mesmo array que o response_model geraria,
+    mas a lista completa nunca é montada em memória: cada lote é serializado e enviado.
+
+    Args:
+        fonte: Iterador assíncrono de objetos ORM, criado com a sessão da dependência get_session.
+        schema: Schema Pydantic usado para validar/serializar cada objeto.
+        ao_concluir: Opcional. Chamada com o corpo JSON completo depois que o último pedaço é enviado
+            (só quando o envio termina sem erro).
+
+    Returns:
+        Uma StreamingResponse com media_type application/json.
+    """
+    async def pedacos() -> AsyncIterator[str]:
+        # O corpo é consumido DEPOIS que a rota retorna, mas as dependências com yield (get_session)
+        # só são encerradas depois que a resposta inteira foi enviada: o streaming usa a mesma sessão
+        # (e a mesma conexão do pool) da requisição, em vez de segurar uma segunda conexão.
+        # Isso vale a partir do FastAPI 0.118 (mínimo do requirements.txt); antes, a sessão já estaria
+        # fechada aqui e a iteração abriria uma nova transação que nunca devolveria a conexão ao pool.
+        yield "["
+        lote: list[str] = []
+        primeiro = True
+        async for obj in fonte:
+            lote.append(schema.model_validate(obj).model_dump_json())
+            if len(lote) >= CHUNK_SIZE:
+                yield ("" if primeiro else ",") + ",".join(lote)
+                primeiro = False
+                lote = []
+        if lote:
+            yield ("" if primeiro else ",") + ",".join(lote)
+        yield "]"
+
+    async def gerar() -> AsyncIterator[str]:
+        if ao_concluir is None:
+            async for pedaco in pedacos():
+                yield pedaco
+            return
+        # Guarda os pedaços enviados para entregar o corpo completo no final.
+        enviados: list[str] = []
+        async for pedaco in pedacos():
+            enviados.append(pedaco)
+            yield pedaco
+        ao_concluir("".join(enviados).encode())
+
+    return StreamingResponse(gerar(), media_type="application/json")
+
+
+# =============================================
+# Listagens em streaming (NDJSON)
+# =============================================
+# Media type do JSON delimitado por linhas: um objeto JSON por linha, sem array envolvendo.
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def aceita_ndjson(accept: Optional[str]) -> bool:
+    """Indica se o cabeçalho Accept da requisição pede NDJSON."""
+    return accept is not None and NDJSON_MEDIA_TYPE in accept
+
+def ndjson_response(
+    fonte: AsyncIterator, # Iterador assíncrono de objetos ORM, já ligado à sessão da requisição (ex: crud.stream_historico_reservas(session))
+    schema: Type[BaseModel] # Schema de leitura usado para serializar cada item (ex: HistoricoReservaRead)
+) -> StreamingResponse:
+    """
+    Monta uma StreamingResponse em NDJSON: cada objeto vira uma linha assim que chega do banco.
+
+    Diferente de json_array_response, o cliente consegue processar cada linha sem esperar
+    o fim do corpo (exportações grandes).
+
+    Args:
+        fonte: Iterador assíncrono de objetos ORM, criado com a sessão da dependência get_session.
+        schema: Schema Pydantic usado para validar/serializar cada objeto.
+
+    Returns:
+        Uma StreamingResponse com media_type application/x-ndjson.
+    """
+    async def linhas() -> AsyncIterator[str]:
+        # Usa a sessão da requisição, que continua aberta até o fim do envio a partir do FastAPI 0.118
+        # (mínimo do requirements.txt; ver json_array_response).
+        lote: list[str] = []
+        async for obj in fonte:
+            lote.append(schema.model_validate(obj).model_dump_json() + "\n")
+            if len(lote) >= CHUNK_SIZE:
+                yield "".join(lote)
+                lote = []
+        if lote:
+            yield "".join(lote)
+
+    return StreamingResponse(linhas(), media_type=NDJSON_MEDIA_TYPE)
+
+# =============================================
+# Paginação por cursor (keyset)
+# =============================================
+def definir_proximo_cursor(response: Response, itens: Sequence, limit: int) -> None:
+    """
+    Informa ao cliente o cursor da próxima página nos cabeçalhos da resposta.
+
+    O cursor é o (data_inicio, id) do último item, que o cliente reenvia em
+    cursor_data_inicio/cursor_id (ou, codificado, em 'cursor'). Só é definido quando a página veio cheia:
+    página incompleta significa que não há mais itens.
+
+    Args:
+        response: Resposta da rota (parâmetro Response injetado pelo FastAPI).
+        itens: Itens da página, já na ordem (data_inicio, id) decrescente.
+        limit: Tamanho de página pedido.
+    """
+    if not itens or len(itens) < limit:
+        return
+    ultimo = itens[-1]
+    response.headers[HEADER_CURSOR_DATA_INICIO] = ultimo.data_inicio.isoformat()
+    response.headers[HEADER_CURSOR_ID] = str(ultimo.id)
+    response.headers[HEADER_CURSOR] = codificar_cursor(ultimo.data_inicio, ultimo.id)
+
+def codificar_cursor(data_inicio: datetime, id: int) -> str:
+    """Codifica (data_inicio, id) em um cursor opaco: base64 url-safe de 'data_iso|id', sem o padding '='."""
+    bruto = f"{data_inicio.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+def decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Faz o caminho inverso de codificar_cursor.
+
+    Raises:
+        ValueError: Se o cursor não for um valor gerado por codificar_cursor.
+    """
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        data_iso, id_texto = bruto.rsplit("|", 1)
+        return datetime.fromisoformat(data_iso), int(id_texto)
+    except (ValueError, UnicodeDecodeError) as e: # binascii.Error é subclasse de ValueError
+        raise ValueError("Cursor inválido.") from e
+
+
+def definir_total(response: Response, total: int) -> None:
+    """Informa o total de registros filtrados no cabeçalho X-Total-Count."""
+    response.headers[HEADER_TOTAL] = str(total)
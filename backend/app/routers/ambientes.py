@@ -7,8 +7,8 @@
 # =============================================
 # Importações
 # =============================================
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlmodel import Session # Importa Session para tipagem da dependência de sessão
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlmodel.ext.asyncio.session import AsyncSession # Importa AsyncSession para tipagem da dependência de sessão
 from uuid import UUID # Pode não ser necessário para ambientes, mas importado para consistência
 from typing import List, Optional # Importa para type hints
 
@@ -19,7 +19,10 @@ from app.schemas import AmbienteCreate, AmbienteRead, AmbienteUpdate, AmbienteLi
 # Importa dependências de segurança (gerenciamento de ambientes é tipicamente para admin)
 from app.security import get_current_user, get_current_admin
 # Importa o enum TipoAmbiente para uso nos query parameters (filtragem)
-from app.models import TipoAmbiente, Ambiente, Usuario # Importa TipoAmbiente e Ambiente (para type hints de dependências)
+from app.models import TipoAmbiente, Usuario # Importa TipoAmbiente (filtros) e Usuario (type hints das dependências)
+
+from app.responses import json_array_response # Listagens grandes enviadas em streaming
+from app.cache import ambientes_cache, dashboard_cache # Caches em memória (ambientes e dashboard público de reservas)
 
 # Importa o módulo CRUD para chamar suas funções de Ambiente
 import app.crud as crud
@@ -38,10 +41,10 @@ router = APIRouter(tags=["ambientes"])
 # =============================================
 @router.post("/", response_model=AmbienteRead, status_code=status.HTTP_201_CREATED)
 # Requer que o usuário logado seja um administrador.
-def criar_ambiente(
+async def criar_ambiente(
     ambiente_create: AmbienteCreate, # Dados de entrada validados pelo schema
-    session: Session = Depends(get_session), # Dependência da sessão do DB
-    admin_user: Ambiente = Depends(get_current_admin) # <--- Dependência de segurança! Requer admin logado.
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
+    admin_user: Usuario = Depends(get_current_admin) # <--- Dependência de segurança! Requer admin logado.
 ):
     """
     Cria um novo ambiente no sistema.
@@ -50,18 +53,20 @@ def criar_ambiente(
     # A dependência get_current_admin já garantiu que quem chama é admin (lança 403 se não for).
 
     # Chama a função CRUD para criar o ambiente.
-    return crud.criar_ambiente(ambiente_create, session)
+    novo_ambiente = await crud.criar_ambiente(ambiente_create, session)
+    ambientes_cache.clear() # As listagens em cache não têm o novo ambiente: invalida.
+    return novo_ambiente
 
 # =============================================
 # Listar Ambientes 
 # Rota: GET /ambientes/
 # =============================================
 @router.get("/", response_model=List[AmbienteRead])
-def listar_ambientes(
-    session: Session = Depends(get_session), # Dependência da sessão do DB
+async def listar_ambientes(
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
     current_user: Usuario = Depends(get_current_user),
-    skip: int = Query(0, description="Número de ambientes a pular para paginação"), # Query parameter opcional para paginação
-    limit: int = Query(100, description="Número máximo de ambientes a retornar"), # Query parameter opcional para paginação
+    skip: int = Query(0, ge=0, description="Número de ambientes a pular para paginação"), # Query parameter opcional para paginação
+    limit: int = Query(100, ge=1, le=1000, description="Número máximo de ambientes a retornar"), # Query parameter opcional para paginação (limitado: faz parte da chave do cache)
     tipo: Optional[TipoAmbiente] = Query(None, description="Filtrar por tipo de ambiente"), # Query parameter opcional para filtrar por tipo
     ativo: Optional[bool] = Query(None, description="Filtrar por status ativo (true/false)"), # Query parameter opcional para filtrar por ativo
 ):
@@ -69,11 +74,21 @@ def listar_ambientes(
     Lista todos os ambientes cadastrados com paginação e filtros opcionais.
     Geralmente acesso público para visualizar ambientes disponíveis.
     """
-    # Chama a função CRUD para obter a lista de ambientes com filtros.
-    ambientes = crud.obter_ambientes(session, skip=skip, limit=limit, tipo=tipo, ativo=ativo)
+    # Ambientes mudam pouco (só admin escreve): a resposta de cada combinação de filtros fica em cache.
+    chave = ("lista", skip, limit, tipo, ativo)
+    corpo = ambientes_cache.get(chave)
+    if corpo is not None:
+        return Response(content=corpo, media_type="application/json")
+    geracao = ambientes_cache.geracao # Lida antes da consulta: uma escrita durante o envio invalida este corpo
 
-    # Retorna a lista de objetos Ambiente, que será serializada para List[AmbienteRead].
-    return ambientes
+    # Envia a lista em streaming (lotes via yield_per), sem montar a lista inteira em memória.
+    # O corpo é o mesmo array de AmbienteRead documentado pelo response_model.
+    # Ao terminar o envio, o corpo completo é guardado no cache (se nenhuma escrita o limpou nesse meio tempo).
+    return json_array_response(
+        crud.stream_ambientes(session, skip=skip, limit=limit, tipo=tipo, ativo=ativo),
+        AmbienteRead,
+        ao_concluir=lambda corpo_enviado: ambientes_cache.set(chave, corpo_enviado, geracao)
+    )
 
 
 # =============================================
@@ -81,9 +96,9 @@ def listar_ambientes(
 # Rota: GET /ambientes/{ambiente_id}
 # =============================================
 @router.get("/{ambiente_id}", response_model=AmbienteRead)
-def obter_ambiente_por_id(
+async def obter_ambiente_por_id(
     ambiente_id: int, # Path parameter: ID do ambiente
-    session: Session = Depends(get_session), # Dependência da sessão do DB
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
     current_user: Usuario = Depends(get_current_user)
 ):
     """
@@ -91,11 +106,18 @@ def obter_ambiente_por_id(
     Geralmente acesso público.
     Lança 404 se o ambiente não for encontrado.
     """
-    # Chama a função CRUD para buscar o ambiente pelo ID. O CRUD lida com o erro 404.
-    ambiente = crud.obter_ambiente(session, ambiente_id)
+    # Resposta em cache (JSON já serializado), se houver.
+    chave = ("id", ambiente_id)
+    corpo = ambientes_cache.get(chave)
+    if corpo is None:
+        geracao = ambientes_cache.geracao # Ver listar_ambientes: descarta o corpo se houve escrita durante a consulta
+        # Chama a função CRUD para buscar o ambiente pelo ID. O CRUD lida com o erro 404 (não vai para o cache).
+        ambiente = await crud.obter_ambiente(session, ambiente_id)
+        corpo = AmbienteRead.model_validate(ambiente).model_dump_json().encode()
+        ambientes_cache.set(chave, corpo, geracao)
 
-    # Retorna o objeto Ambiente, que será serializado para AmbienteRead.
-    return ambiente
+    # Retorna o JSON de AmbienteRead.
+    return Response(content=corpo, media_type="application/json")
 
 # =============================================
 # Atualizar Ambiente (Restrito a Admin)
@@ -103,11 +125,11 @@ def obter_ambiente_por_id(
 # =============================================
 @router.patch("/{ambiente_id}", response_model=AmbienteRead)
 # Requer que o usuário logado seja um administrador.
-def atualizar_ambiente(
+async def atualizar_ambiente(
     ambiente_id: int, # Path parameter: ID do ambiente a ser atualizado
     ambiente_update: AmbienteUpdate, # Body: Dados para atualização (campos opcionais)
-    session: Session = Depends(get_session), # Dependência da sessão do DB
-    admin_user: Ambiente = Depends(get_current_admin) # <--- Dependência de segurança! Requer admin logado.
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
+    admin_user: Usuario = Depends(get_current_admin) # <--- Dependência de segurança! Requer admin logado.
 ):
     """
     Atualiza os dados de um ambiente específico por ID.
@@ -117,10 +139,12 @@ def atualizar_ambiente(
     # A dependência get_current_admin já garantiu que quem chama é admin.
 
     # Busca o ambiente a ser atualizado (a função CRUD já lida com 404).
-    ambiente_no_db = crud.obter_ambiente(session, ambiente_id) # Retorna Ambiente ou lança 404
+    ambiente_no_db = await crud.obter_ambiente(session, ambiente_id) # Retorna Ambiente ou lança 404
 
     # Chama a função CRUD para realizar a atualização.
-    updated_ambiente = crud.atualizar_ambiente(session, ambiente_no_db, ambiente_update)
+    updated_ambiente = await crud.atualizar_ambiente(session, ambiente_no_db, ambiente_update)
+    ambientes_cache.clear() # Invalida as leituras em cache (listagens e o próprio ambiente).
+    dashboard_cache.clear() # O dashboard mostra nome/tipo do ambiente: invalida também.
 
     return updated_ambiente
 
@@ -130,10 +154,10 @@ def atualizar_ambiente(
 # =============================================
 @router.delete("/{ambiente_id}", response_model=AmbienteRead) # Retorna o objeto deletado ou uma mensagem de sucesso
 # Requer que o usuário logado seja um administrador.
-def deletar_ambiente(
+async def deletar_ambiente(
     ambiente_id: int, # Path parameter: ID do ambiente a ser deletado.
-    session: Session = Depends(get_session), # Dependência da sessão do DB
-    admin_user: Ambiente = Depends(get_current_admin) # <--- Dependência de segurança! Requer admin logado.
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
+    admin_user: Usuario = Depends(get_current_admin) # <--- Dependência de segurança! Requer admin logado.
 ):
     """
     Deleta um ambiente específico por ID.
@@ -143,7 +167,8 @@ def deletar_ambiente(
     # A dependência get_current_admin já garantiu que quem chama é admin.
 
     # Chama a função CRUD para deletar o ambiente. Ela busca, deleta e commita. Trata 404.
-    deleted_ambiente = crud.deletar_ambiente(session, ambiente_id)
+    deleted_ambiente = await crud.deletar_ambiente(session, ambiente_id)
+    ambientes_cache.clear() # Invalida as leituras em cache (listagens e o próprio ambiente).
 
     # Retorna o objeto deletado.
     return deleted_ambiente
@@ -154,9 +179,9 @@ def deletar_ambiente(
 # =============================================
 @router.get("/{ambiente_id}/tem-reservas", tags=["ambientes"], status_code=status.HTTP_204_NO_CONTENT) # Usar 204 No Content se tiver, ou 404 Not Found se não tiver
 # Requer que o usuário logado seja um administrador.
-def ambiente_tem_reservas_endpoint( # Nome do endpoint
+async def ambiente_tem_reservas_endpoint( # Nome do endpoint
     ambiente_id: int, # Path parameter: ID do ambiente a verificar.
-    session: Session = Depends(get_session), # Dependência da sessão do DB
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
     admin_user: Usuario = Depends(get_current_admin) # <--- Dependência de segurança! Requer admin logado.
 ):
     """
@@ -169,10 +194,10 @@ def ambiente_tem_reservas_endpoint( # Nome do endpoint
     # A dependência get_current_admin já garantiu que quem chama é admin.
 
     # Opcional: Verificar se o ambiente existe antes de verificar reservas.
-    # ambiente_existe = crud.obter_ambiente(session, ambiente_id) # Lançará 404 se não encontrar o ambiente
+    # ambiente_existe = await crud.obter_ambiente(session, ambiente_id) # Lançará 404 se não encontrar o ambiente
 
     # Chama a função CRUD para verificar reservas.
-    tem_reservas = crud.ambiente_tem_reservas(session, ambiente_id)
+    tem_reservas = await crud.ambiente_tem_reservas(session, ambiente_id)
 
     if tem_reservas:
         # Se tem reservas, retorna 204 No Content.
@@ -14,9 +14,12 @@ from fastapi import (
     HTTPException,  # Para levantar exceções HTTP (como 403)
     status,
     Query,          # Para definir parâmetros de query
-    Body            # Para definir parâmetros no corpo da requisição
+    Body,           # Para definir parâmetros no corpo da requisição
+    Header,         # Para ler cabeçalhos da requisição (ex: Accept)
+    Response        # Resposta sem corpo (ex: 204 da checagem de disponibilidade) e cabeçalhos do cursor
 )
-from sqlmodel import Session # Importa Session para tipagem da dependência de sessão
+from sqlmodel.ext.asyncio.session import AsyncSession # Importa AsyncSession para tipagem da dependência de sessão
+from pydantic import TypeAdapter # Serializa a lista do dashboard direto para JSON (bytes guardados no cache)
 from uuid import UUID # Importa UUID para lidar com IDs de usuário (relacionados a reservas)
 from typing import List, Optional # Importa para type hints
 from datetime import datetime, date # Importa datetime para filtros de data
@@ -24,7 +27,7 @@ from datetime import datetime, date # Importa datetime para filtros de data
 # Importações dos seus módulos locais
 from app.database import get_session # Dependência para obter sessão do DB
 # Importa schemas relevantes para Reserva e Histórico
-from app.schemas import ReservaCreate, ReservaRead, ReservaUpdate, ReservaList, HistoricoReservaRead, ReservaDashboard
+from app.schemas import ReservaCreate, ReservaRead, ReservaUpdate, ReservaList, HistoricoReservaRead, ReservaDashboard, ReservasMovidasResposta
 # Importa dependências de segurança
 from app.security import get_current_user, get_current_admin # get_current_user é crucial para saber quem está reservando
 # Importa Enums e Modelos relevantes
@@ -32,6 +35,8 @@ from app.models import StatusReserva, Reserva, Usuario, TipoUsuario
 
 # Importa o módulo CRUD para chamar suas funções de Reserva
 import app.crud as crud
+from app.cache import dashboard_cache # Cache em memória do dashboard público
+from app.responses import definir_proximo_cursor, decodificar_cursor, definir_total, aceita_ndjson, ndjson_response # Cursor/total nos cabeçalhos e exportação em NDJSON
 
 # =============================================
 # Configuração do Router
@@ -42,42 +47,82 @@ router = APIRouter(tags=["reservas"])
 # router = APIRouter(prefix="/reservas", tags=["reservas"], dependencies=[Depends(get_current_user)])
 
 
+# Tamanho máximo de um lote em POST /reservas/lote: o lote inteiro roda em uma única transação
+# (um INSERT multi-linha), então o tamanho precisa ser limitado.
+RESERVAS_LOTE_MAX = 200
+
+
+# =============================================
+# Dependências de Validação do Período
+# =============================================
+# Checagem barata que rejeita períodos inválidos (início >= fim) com 400 antes das demais
+# dependências: declarada primeiro na rota, roda antes de qualquer conexão do pool ser usada.
+# As dependências deste arquivo são async (sem I/O) para o FastAPI não despachá-las ao threadpool.
+# (Nos corpos JSON, ReservaCreate/ReservaUpdate já rejeitam o período inválido na validação do schema.)
+_ERRO_PERIODO = "Data de início deve ser anterior à data de fim."
+
+async def validar_periodo(
+    data_inicio: datetime = Query(..., description="Data e hora de início (ISO 8601)."),
+    data_fim: datetime = Query(..., description="Data e hora de fim (ISO 8601).")
+) -> tuple[datetime, datetime]:
+    """Valida o período recebido por query parameters e o devolve como (data_inicio, data_fim)."""
+    if not crud.periodo_valido(data_inicio, data_fim):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=_ERRO_PERIODO)
+    return data_inicio, data_fim
+
+# =============================================
+# Dependências de Paginação
+# =============================================
+# Posição da página nas listagens (paginação por cursor/keyset), aceita de duas formas:
+# - 'cursor': valor opaco do cabeçalho X-Next-Cursor da página anterior (preferível para clientes novos);
+# - cursor_data_inicio + cursor_id: as mesmas informações em parâmetros separados.
+_ERRO_CURSOR = "Cursor inválido."
+
+async def resolver_cursor(
+    cursor: Optional[str] = Query(None, description="Cursor opaco da próxima página (cabeçalho X-Next-Cursor da resposta anterior)"),
+    cursor_data_inicio: Optional[datetime] = Query(None, description="Paginação por cursor: data_inicio do último item da página anterior"),
+    cursor_id: Optional[int] = Query(None, description="Paginação por cursor: id do último item da página anterior")
+) -> tuple[Optional[datetime], Optional[int]]:
+    """Devolve a posição (cursor_data_inicio, cursor_id) da página; 'cursor', se informado, tem prioridade."""
+    if cursor is None:
+        return cursor_data_inicio, cursor_id
+    try:
+        return decodificar_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=_ERRO_CURSOR)
+
 # =============================================
 # Verificar Disponibilidade (Endpoint GET)
 # Rota: GET /reservas/check-availability
 # =============================================
-@router.get("/check-availability", status_code=status.HTTP_200_OK) # Retorna 200 OK se disponível
+@router.get("/check-availability", status_code=status.HTTP_204_NO_CONTENT, response_class=Response) # Retorna 204 No Content se disponível
 # Este endpoint pode ser PÚBLICO ou REQUERER autenticação (para saber quem verifica).
 # Geralmente, a checagem de disponibilidade pode ser pública para mostrar horários livres.
 # Se quiser que SÓ usuários logados possam checar, adicione Depends(get_current_user).
-def check_reserva_availability_endpoint( # Nome do endpoint
-    session: Session = Depends(get_session),
+async def check_reserva_availability_endpoint( # Nome do endpoint
+    periodo: tuple[datetime, datetime] = Depends(validar_periodo), # data_inicio/data_fim (query), validados antes de tudo
+    session: AsyncSession = Depends(get_session),
     # Opcional: Requires authentication
     # current_user: Usuario = Depends(get_current_user),
     ambiente_id: int = Query(..., description="ID do ambiente a verificar."), # Parâmetro de Query obrigatório
-    data_inicio: datetime = Query(..., description="Data e hora de início (ISO 8601)."), # Parâmetro de Query obrigatório
-    data_fim: datetime = Query(..., description="Data e hora de fim (ISO 8601)."),    # Parâmetro de Query obrigatório
     reserva_id: Optional[int] = Query(None, description="ID da reserva a excluir da checagem (para edição).") # Parâmetro opcional para edição
 ):
     """
     Verifica se um ambiente específico está disponível para reserva em um período.
-    Retorna 200 OK se disponível.
+    Retorna 204 No Content se disponível (sem corpo: a resposta é só o status).
     Retorna 409 Conflict se NÃO disponível.
     Acesso pode ser público ou restrito (definir Requires).
     Lança 400 Bad Request para datas inválidas ou parâmetros ausentes.
     Lança 404 Not Found se ambiente_id não existir (opcional).
     """
     # Opcional: Verificar se o ambiente_id existe antes de checar disponibilidade
-    # ambiente_existe = crud.obter_ambiente(session, ambiente_id) # obter_ambiente já lida com 404
-
-    # Validar datas básicas (início < fim) se necessário
-    # O frontend já valida, mas backend deve sempre validar dados de entrada.
-    if data_inicio >= data_fim:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Data de início deve ser anterior à data de fim.")
+    # ambiente_existe = await crud.obter_ambiente(session, ambiente_id) # obter_ambiente já lida com 404
 
+    # As datas básicas (início < fim) já foram validadas pela dependência validar_periodo (400 se inválidas).
+    data_inicio, data_fim = periodo
 
     # Chama a função CRUD para verificar a disponibilidade.
-    is_available = crud.check_reserva_availability(
+    is_available = await crud.check_reserva_availability(
         session,
         ambiente_id=ambiente_id,
         data_inicio=data_inicio, # Datetimes com fuso horário (backend lida)
@@ -86,8 +131,9 @@ def check_reserva_availability_endpoint( # Nome do endpoint
     )
 
     if is_available:
-        # Se disponível, retorna 200 OK (corpo vazio ou mensagem opcional)
-        return {"message": "Ambiente disponível."} # Retornar uma mensagem ou corpo vazio
+        # Se disponível, retorna 204 No Content. Endpoint chamado a cada mudança de data no formulário:
+        # sem corpo, não há serialização nem bytes extras.
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
     else:
         # Se NÃO disponível, retorna 409 Conflict.
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="O ambiente não está disponível para o período solicitado.")
@@ -99,9 +145,9 @@ def check_reserva_availability_endpoint( # Nome do endpoint
 # =============================================
 @router.post("/", response_model=ReservaRead, status_code=status.HTTP_201_CREATED)
 # Requer que o usuário esteja logado para criar a reserva.
-def criar_reserva(
+async def criar_reserva(
     reserva_create: ReservaCreate, # Dados da reserva (ambiente_id, datas, motivo)
-    session: Session = Depends(get_session), # Dependência da sessão do DB
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
     current_user: Usuario = Depends(get_current_user), # Obtém o usuário logado
     # **ADICIONADO:** Parametro de query opcional para admin reservar para outro
     reservar_para_usuario_id: Optional[UUID] = Query(None, description="ID do usuário para quem a reserva está sendo feita (apenas para admin)")
@@ -127,17 +173,52 @@ def criar_reserva(
             )
         else:
             # Se for admin, usar o reservar_para_usuario_id fornecido.
-            # Opcional: Verificar se o usuário com esse ID existe.
-            usuario_para_reserva = session.get(Usuario, reservar_para_usuario_id)
-            if not usuario_para_reserva:
-                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuário para quem reservar não encontrado.")
+            # Admin reservando para si mesmo: o usuário já foi carregado pela autenticação, não precisa buscar de novo.
+            if reservar_para_usuario_id != current_user.id:
+                # Verificar se o usuário com esse ID existe.
+                usuario_para_reserva = await session.get(Usuario, reservar_para_usuario_id)
+                if not usuario_para_reserva:
+                     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuário para quem reservar não encontrado.")
 
-            user_id_para_reserva = reservar_para_usuario_id # Usa o ID fornecido pelo admin
+                user_id_para_reserva = reservar_para_usuario_id # Usa o ID fornecido pelo admin
 
 
     # Chama a função CRUD para criar a reserva, passando o ID determinado pela lógica acima.
     # **MODIFICAR CHAMADA CRUD:** Passar user_id_para_reserva como argumento.
-    return crud.criar_reserva(reserva_create, session, user_id_para_reserva)
+    nova_reserva = await crud.criar_reserva(reserva_create, session, user_id_para_reserva)
+    dashboard_cache.clear() # O dashboard em cache não tem a nova reserva: invalida.
+    return nova_reserva
+
+# =============================================
+# Criar Reservas em Lote (Restrito a Admin)
+# Rota: POST /reservas/lote
+# =============================================
+@router.post("/lote", response_model=List[ReservaRead], status_code=status.HTTP_201_CREATED)
+# Requer que o usuário logado seja um administrador (importações e reservas recorrentes).
+async def criar_reservas_lote(
+    reservas_create: List[ReservaCreate] = Body(..., max_length=RESERVAS_LOTE_MAX), # Lista de reservas validadas pelo schema (no máximo RESERVAS_LOTE_MAX)
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
+    admin_user: Usuario = Depends(get_current_admin), # <--- Dependência de segurança! Requer admin logado.
+    reservar_para_usuario_id: Optional[UUID] = Query(None, description="ID do usuário para quem as reservas estão sendo feitas (padrão: o próprio admin)")
+):
+    """
+    Cria várias reservas de uma vez (ex: importações, reservas recorrentes), em uma única transação.
+    Requer autenticação e privilégios de administrador; as reservas são do próprio admin ou de reservar_para_usuario_id.
+    Tudo ou nada: lança 409 Conflict se qualquer período estiver indisponível ou se sobrepor a outro do lote.
+    Lança 422 se o lote tiver mais de RESERVAS_LOTE_MAX reservas.
+    Lança 404 se algum ambiente_id ou o reservar_para_usuario_id não existir.
+    """
+    user_id_para_reserva: UUID = admin_user.id # Por padrão, as reservas são do próprio admin
+
+    if reservar_para_usuario_id is not None and reservar_para_usuario_id != admin_user.id: # Para si mesmo: nada a buscar
+        usuario_para_reserva = await session.get(Usuario, reservar_para_usuario_id)
+        if not usuario_para_reserva:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuário para quem reservar não encontrado.")
+        user_id_para_reserva = reservar_para_usuario_id
+
+    novas_reservas = await crud.criar_reservas_bulk(session, reservas_create, user_id_para_reserva)
+    dashboard_cache.clear() # Invalida o dashboard em cache
+    return novas_reservas
 
 
 # =============================================
@@ -146,11 +227,13 @@ def criar_reserva(
 # =============================================
 @router.get("/historico/me", response_model=List[HistoricoReservaRead])
 # Requer que o usuário esteja logado (qualquer tipo).
-def listar_meu_historico_reservas_endpoint( # Novo nome para o endpoint
-    session: Session = Depends(get_session),
+async def listar_meu_historico_reservas_endpoint( # Novo nome para o endpoint
+    response: Response, # Para devolver o cursor da próxima página nos cabeçalhos
+    session: AsyncSession = Depends(get_session),
     current_user: Usuario = Depends(get_current_user), # <--- Requer usuário logado
     skip: int = Query(0, description="Número de registros de histórico a pular para paginação"),
     limit: int = Query(100, description="Número máximo de registros de histórico a retornar"),
+    posicao: tuple[Optional[datetime], Optional[int]] = Depends(resolver_cursor), # Cursor da página (ver resolver_cursor)
     # Opcional: Adicionar filtros para o histórico pessoal (status, datas...)
     status: Optional[StatusReserva] = Query(None, description="Filtrar histórico pessoal por status"),
     data_inicio_ge: Optional[datetime] = Query(None, description="Filtrar histórico pessoal: data início >= este valor"),
@@ -161,10 +244,13 @@ def listar_meu_historico_reservas_endpoint( # Novo nome para o endpoint
 ):
     """
     Lista os registros de histórico de reservas do usuário logado.
+    Página cheia: os cabeçalhos X-Next-Cursor-Data-Inicio/X-Next-Cursor-Id trazem o cursor da próxima página.
     Requer autenticação (usuário logado).
     """
+    cursor_data_inicio, cursor_id = posicao # Posição da página (cursor opaco já decodificado)
+
     # Chama a função CRUD para obter o histórico, passando o ID do usuário logado como filtro obrigatório.
-    historico_reservas = crud.obter_historico_reservas(
+    historico_reservas = await crud.obter_historico_reservas(
          session,
          skip=skip,
          limit=limit,
@@ -174,19 +260,24 @@ def listar_meu_historico_reservas_endpoint( # Novo nome para o endpoint
          data_inicio_ge=data_inicio_ge,
          data_inicio_le=data_inicio_le,
          data_fim_ge=data_fim_ge,
-         data_fim_le=data_fim_le
+         data_fim_le=data_fim_le,
+         cursor_data_inicio=cursor_data_inicio,
+         cursor_id=cursor_id
     )
 
+    definir_proximo_cursor(response, historico_reservas, limit) # Cursor da próxima página (se houver)
     return historico_reservas
 
 # endpoint para listar histórico de reservas (GET /reservas/historico). Restrito a Admin.
 @router.get("/historico", response_model=List[HistoricoReservaRead])
 # Requer que o usuário logado seja um administrador.
-def listar_historico_reservas_endpoint( # Nome renomeado
-    session: Session = Depends(get_session),
+async def listar_historico_reservas_endpoint( # Nome renomeado
+    response: Response, # Para devolver o cursor da próxima página nos cabeçalhos
+    session: AsyncSession = Depends(get_session),
     admin_user: Usuario = Depends(get_current_admin), # Requer admin logado
     skip: int = Query(0, description="Número de registros de histórico a pular para paginação"),
     limit: int = Query(100, description="Número máximo de registros de histórico a retornar"),
+    posicao: tuple[Optional[datetime], Optional[int]] = Depends(resolver_cursor), # Cursor da página (ver resolver_cursor)
     # Query parameters para filtros (usuario_id, ambiente_id, status, período)
     usuario_id: Optional[UUID] = Query(None, description="Filtrar histórico por ID de usuário"),
     ambiente_id: Optional[int] = Query(None, description="Filtrar histórico por ID de ambiente"),
@@ -197,15 +288,21 @@ def listar_historico_reservas_endpoint( # Nome renomeado
     data_fim_le: Optional[datetime] = Query(None, description="Filtrar: data fim da reserva <= este valor"),
     # **ADICIONADO:** Query parameters para filtrar por nome de ambiente e usuário
     nome_amb: Optional[str] = Query(None, description="Filtrar por nome de ambiente (busca parcial)"), # <--- ADICIONADO
-    nome_usu: Optional[str] = Query(None, description="Filtrar por nome de usuário (busca parcial)")  # <--- ADICIONADO
+    nome_usu: Optional[str] = Query(None, description="Filtrar por nome de usuário (busca parcial)"),  # <--- ADICIONADO
+    incluir_total: bool = Query(False, description="Se true, devolve o total de registros filtrados no cabeçalho X-Total-Count"),
+    accept: Optional[str] = Header(None, description="Envie application/x-ndjson para receber o histórico em streaming (um registro por linha)")
 ):
     """
     Lista todos os registros de histórico de reservas com paginação e filtros.
+    Página cheia: os cabeçalhos X-Next-Cursor-Data-Inicio/X-Next-Cursor-Id trazem o cursor da próxima página.
+    Com 'Accept: application/x-ndjson', envia um registro por linha em streaming (exportação de limites grandes).
+    Com incluir_total=true, o total de registros filtrados vem no cabeçalho X-Total-Count.
     Requer autenticação e privilégios de administrador.
     """
-    # Chama a função CRUD para obter a lista de histórico de reservas com todos os filtros.
-    historico_reservas = crud.obter_historico_reservas(
-         session,
+    cursor_data_inicio, cursor_id = posicao # Posição da página (cursor opaco já decodificado)
+
+    # Filtros repassados ao CRUD (iguais na listagem, na contagem e na exportação).
+    filtros = dict(
          skip=skip,
          limit=limit,
          usuario_id=usuario_id,
@@ -217,9 +314,28 @@ def listar_historico_reservas_endpoint( # Nome renomeado
          data_fim_le=data_fim_le,
          # **ADICIONADO:** Passa os novos filtros para a função CRUD
          nome_amb=nome_amb, # <--- ADICIONADO
-         nome_usu=nome_usu  # <--- ADICIONADO
+         nome_usu=nome_usu, # <--- ADICIONADO
+         cursor_data_inicio=cursor_data_inicio,
+         cursor_id=cursor_id
     )
 
+    # Exportação: NDJSON em streaming, lido do banco em lotes (memória constante, qualquer 'limit').
+    # O corpo é lido com a sessão da requisição, que o FastAPI (>= 0.118) só fecha depois do envio.
+    if aceita_ndjson(accept):
+        return ndjson_response(
+            crud.stream_historico_reservas(session, **filtros),
+            HistoricoReservaRead
+        )
+
+    # Chama a função CRUD para obter a lista de histórico de reservas com todos os filtros.
+    if incluir_total:
+        # Total por um COUNT enxuto (sem joins nem paginação), devolvido no cabeçalho X-Total-Count.
+        historico_reservas, total = await crud.obter_historico_reservas_com_total(session, **filtros)
+        definir_total(response, total)
+    else:
+        historico_reservas = await crud.obter_historico_reservas(session, **filtros)
+
+    definir_proximo_cursor(response, historico_reservas, limit) # Cursor da próxima página (se houver)
     # Retorna a lista de objetos HistoricoReserva. O response_model fará a serialização.
     return historico_reservas
 
@@ -228,9 +344,9 @@ def listar_historico_reservas_endpoint( # Nome renomeado
 # Rota: GET /reservas/{reserva_id}
 # =============================================
 @router.get("/{reserva_id}", response_model=ReservaRead)
-def obter_reserva_por_id(
+async def obter_reserva_por_id(
     reserva_id: int, # Path parameter: ID da reserva
-    session: Session = Depends(get_session), # Dependência da sessão do DB
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
     current_user: Usuario = Depends(get_current_user) # <--- Dependência de segurança! Requer usuário logado para ver detalhes.
     # Adicionar lógica de autorização aqui para que apenas o dono da reserva ou admin possam ver.
     # admin_user: Usuario = Depends(get_current_admin) # Se apenas admin puder ver.
@@ -242,13 +358,13 @@ def obter_reserva_por_id(
     Opcional: Implementar lógica de autorização (dono vs admin).
     """
     # Lógica de Autorização: Permitir que apenas o dono da reserva ou admin veja.
-    # reserva = crud.obter_reserva(session, reserva_id) # Busca a reserva primeiro
+    # reserva = await crud.obter_reserva(session, reserva_id) # Busca a reserva primeiro
     # if not reserva.usuario_id == current_user.id and current_user.tipo != TipoUsuario.admin:
     #     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso negado. Você só pode ver suas próprias reservas ou precisa ser admin.")
     # return reserva # Retorna a reserva já buscada
 
     # Chama a função CRUD para buscar a reserva pelo ID (ela já carrega relacionamentos e trata 404).
-    reserva = crud.obter_reserva(session, reserva_id)
+    reserva = await crud.obter_reserva(session, reserva_id)
 
     # Se chegou aqui, a reserva foi encontrada e a autenticação/autorização (se implementada acima) passou.
     return reserva # FastAPI serializará para ReservaRead.
@@ -261,11 +377,13 @@ def obter_reserva_por_id(
 @router.get("/", response_model=List[ReservaRead])
 # Requer que o usuário esteja logado (autenticado).
 # Usamos get_current_user para obter a identidade do usuário logado, seja ele user ou admin.
-def listar_reservas(
-    session: Session = Depends(get_session),
+async def listar_reservas(
+    response: Response, # Para devolver o cursor da próxima página nos cabeçalhos
+    session: AsyncSession = Depends(get_session),
     current_user: Usuario = Depends(get_current_user), # Obtém o usuário logado
     skip: int = Query(0, description="Número de reservas a pular para paginação"),
     limit: int = Query(100, description="Número máximo de reservas a retornar"),
+    posicao: tuple[Optional[datetime], Optional[int]] = Depends(resolver_cursor), # Cursor da página (ver resolver_cursor)
     usuario_id: Optional[UUID] = Query(None, description="Filtrar por ID de usuário (apenas para admin ou o próprio usuário)"),
     ambiente_id: Optional[int] = Query(None, description="Filtrar por ID de ambiente"),
     status: Optional[StatusReserva] = Query(None, description="Filtrar por status"),
@@ -273,13 +391,18 @@ def listar_reservas(
     data_inicio_le: Optional[Optional[datetime]] = Query(None, description="Filtrar: data início <= este valor"), # Corrigir Optional aninhado
     data_fim_ge: Optional[datetime] = Query(None, description="Filtrar: data fim >= este valor"),
     data_fim_le: Optional[datetime] = Query(None, description="Filtrar: data fim <= este valor"),
+    incluir_total: bool = Query(False, description="Se true, devolve o total de reservas filtradas no cabeçalho X-Total-Count"),
 ):
     """
     Lista reservas cadastradas com paginação e filtros.
+    Página cheia: os cabeçalhos X-Next-Cursor-Data-Inicio/X-Next-Cursor-Id trazem o cursor da próxima página.
+    Com incluir_total=true, o total de reservas filtradas vem no cabeçalho X-Total-Count.
     Requer autenticação (usuário logado).
     Usuário comum pode listar apenas suas próprias reservas (se fornecer usuario_id=seu_id, ou sem filtro).
     Admin pode listar todas ou filtrar por qualquer usuario_id.
     """
+    cursor_data_inicio, cursor_id = posicao # Posição da página (cursor opaco já decodificado)
+
     filtro_usuario_id: Optional[UUID] = None # Variável que será usada para filtrar no CRUD
 
     if current_user.tipo == TipoUsuario.admin:
@@ -301,8 +424,7 @@ def listar_reservas(
 
     # Chama a função CRUD para obter a lista de reservas com os filtros.
     # Passamos o filtro_usuario_id controlado para o CRUD.
-    reservas = crud.obter_reservas(
-        session,
+    filtros = dict(
         skip=skip,
         limit=limit,
         usuario_id=filtro_usuario_id, # <--- Usa o filtro_usuario_id determinado pela lógica de permissão
@@ -311,19 +433,28 @@ def listar_reservas(
         data_inicio_ge=data_inicio_ge,
         data_inicio_le=data_inicio_le,
         data_fim_ge=data_fim_ge,
-        data_fim_le=data_fim_le
+        data_fim_le=data_fim_le,
+        cursor_data_inicio=cursor_data_inicio,
+        cursor_id=cursor_id
     )
+    if incluir_total:
+        # Total por um COUNT enxuto (sem joins nem paginação), devolvido no cabeçalho X-Total-Count.
+        reservas, total = await crud.obter_reservas_com_total(session, **filtros)
+        definir_total(response, total)
+    else:
+        reservas = await crud.obter_reservas(session, **filtros)
 
+    definir_proximo_cursor(response, reservas, limit) # Cursor da próxima página (se houver)
     return reservas
 
 
 # PATCH /reservas/{reserva_id} que o usuário comum ou admin pode usar para mudar datas/motivo/ambiente.
 @router.patch("/{reserva_id}", response_model=ReservaRead) # mesmo endpoint do PATCH genérico
 # Requer autenticação. Pode permitir atualização pelo próprio usuário OU por admin.
-def atualizar_reserva_endpoint( # Renomeado para evitar conflito com a função CRUD
+async def atualizar_reserva_endpoint( # Renomeado para evitar conflito com a função CRUD
     reserva_id: int, # Path parameter: ID da reserva a ser atualizado.
     reserva_update: ReservaUpdate, # Body: Dados para atualização (campos opcionais). Ver schema ReservaUpdate.
-    session: Session = Depends(get_session), # Dependência da sessão do DB
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
     current_user: Usuario = Depends(get_current_user) # Dependência para obter o usuário logado.
 ):
     """
@@ -339,11 +470,12 @@ def atualizar_reserva_endpoint( # Renomeado para evitar conflito com a função
     # que a lógica de permissão no CRUD seja mais eficiente, pode passar apenas o ID
     # e a função CRUD busca e verifica permissão em uma única operação.
     # No entanto, a estrutura atual (buscar no router e passar a instância) é clara.
-    reserva_no_db = crud.obter_reserva(session, reserva_id) # Lança 404 se não existir
+    reserva_no_db = await crud.obter_reserva(session, reserva_id) # Lança 404 se não existir
 
     # Chama a função CRUD para realizar a atualização.
     # A função crud.atualizar_reserva lida com permissão, verificação de disponibilidade e o salvamento.
-    updated_reserva = crud.atualizar_reserva(session, reserva_no_db, reserva_update, current_user) # Passa o usuário logado para o CRUD
+    updated_reserva = await crud.atualizar_reserva(session, reserva_no_db, reserva_update, current_user) # Passa o usuário logado para o CRUD
+    dashboard_cache.clear() # Datas/ambiente podem ter mudado: invalida o dashboard em cache
 
     return updated_reserva # Retorna o objeto Reserva atualizado.
 
@@ -351,10 +483,10 @@ def atualizar_reserva_endpoint( # Renomeado para evitar conflito com a função
 @router.patch("/{reserva_id}/status", response_model=ReservaRead)
 # **MODIFICADO:** Requer APENAS autenticação (qualquer usuário logado).
 # A lógica de permissão (Admin vs User dono) está DENTRO da função CRUD.
-def atualizar_status_reserva_endpoint(
+async def atualizar_status_reserva_endpoint(
     reserva_id: int,
     novo_status: StatusReserva = Body(..., embed=True, description="Novo status desejado para a reserva"),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     # **MODIFICADO:** Usa get_current_user para obter o usuário logado (seja user ou admin)
     current_user: Usuario = Depends(get_current_user) # <--- Usa get_current_user!
 ):
@@ -371,7 +503,8 @@ def atualizar_status_reserva_endpoint(
 
     # Chama a função CRUD para atualizar o status. O CRUD lida com TUDO:
     # 404, permissão (403), validação de transição (400), atualização, commit e mover para histórico.
-    updated_reserva = crud.atualizar_status_reserva(session, reserva_id, novo_status, current_user) # <--- Passa current_user
+    updated_reserva = await crud.atualizar_status_reserva(session, reserva_id, novo_status, current_user) # <--- Passa current_user
+    dashboard_cache.clear() # O status decide se a reserva aparece no dashboard: invalida o cache
 
     return updated_reserva
 
@@ -381,7 +514,7 @@ def atualizar_status_reserva_endpoint(
 # # Requer autenticação. Implemente lógica de permissão (dono se PENDENTE, ou admin).
 # def deletar_reserva_endpoint( # Renomeado para evitar conflito com a função CRUD
 #     reserva_id: int, # Path parameter: ID da reserva a ser deletado.
-#     session: Session = Depends(get_session), # Dependência da sessão do DB
+#     session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
 #     current_user: Usuario = Depends(get_current_user) # <--- Dependência de segurança! Requer autenticação.
 # ):
 #     """
@@ -393,7 +526,7 @@ def atualizar_status_reserva_endpoint(
 #     # Lógica de Autorização está DENTRO da função crud.deletar_reserva.
 
 #     # Chama a função CRUD para deletar a reserva. Ela busca, verifica permissão e deleta. Trata 404 e 403.
-#     deleted_reserva = crud.deletar_reserva(session, reserva_id, current_user) # Passa o usuário logado para o CRUD
+#     deleted_reserva = await crud.deletar_reserva(session, reserva_id, current_user) # Passa o usuário logado para o CRUD
 
 #     # Retorna o objeto deletado.
 #     return deleted_reserva 
@@ -402,16 +535,39 @@ def atualizar_status_reserva_endpoint(
 # Nota: A função mover_reserva_para_historico não tem um endpoint API dedicado.
 # Ela é chamada internamente pela função atualizar_status_reserva no CRUD.
 
+# =============================================
+# Mover Reservas Expiradas para o Histórico (Restrito a Admin)
+# Rota: POST /reservas/mover-expiradas
+# =============================================
+@router.post("/mover-expiradas", response_model=ReservasMovidasResposta)
+# Requer que o usuário logado seja um administrador. Pode ser chamada por um agendador (cron) periodicamente.
+async def mover_reservas_expiradas_endpoint(
+    session: AsyncSession = Depends(get_session),
+    admin_user: Usuario = Depends(get_current_admin) # Requer admin logado
+):
+    """
+    Move para o histórico (como FINALIZADA) as reservas CONFIRMADAS cujo período já terminou.
+    Mantém a tabela de reservas ativas pequena.
+    Requer autenticação e privilégios de administrador.
+    """
+    movidas = await crud.mover_reservas_expiradas(session)
+    if movidas:
+        dashboard_cache.clear() # Reservas saíram da tabela: invalida o dashboard em cache
+    return {"movidas": movidas}
+
 
 
 # =============================================
 # Dashboard Público (Reservas por Dia e Turno)
 # Rota: GET /reservas/dashboard/dia-turno
 # =============================================
+# Serializador da lista do dashboard (montado uma vez): gera os bytes JSON que vão para o cache.
+_DASHBOARD_ADAPTER = TypeAdapter(List[ReservaDashboard])
+
 @router.get("/dashboard/dia-turno", response_model=List[ReservaDashboard])
 # **ACESSÓ PÚBLICO:** NÃO requer Depends(get_current_user) ou Depends(get_current_admin)
-def dashboard_reservas_dia_turno(
-    session: Session = Depends(get_session), # Dependência da sessão do DB
+async def dashboard_reservas_dia_turno(
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
     data_alvo: date = Query(..., description="A data para obter as reservas (formato YYYY-MM-DD)"), # Parâmetro de Query para a data
     turno_alvo: str = Query(..., description="O turno para obter as reservas ('manha', 'tarde', 'noite')") # Parâmetro de Query para o turno
 ):
@@ -421,15 +577,23 @@ def dashboard_reservas_dia_turno(
     """
     # Acesso é público, sem necessidade de verificar usuário logado.
 
-    # Chama a função CRUD para obter os dados do dashboard.
-    # O CRUD lida com a lógica de filtrar, carregar relacionamentos e adaptar para o schema de saída.
-    # O CRUD também lida com a validação do turno e erros 400.
-    reservas_dashboard = crud.obter_reservas_dashboard(
-        session,
-        data_alvo=data_alvo, # Passa a data (objeto date)
-        turno_alvo=turno_alvo # Passa o turno (string)
-    )
-
-    # Retorna a lista de objetos ReservaDashboard.
-    return reservas_dashboard
+    # Rota pública e muito repetida (vários navegadores pedindo o mesmo dia/turno):
+    # a resposta fica em cache por alguns segundos (ver DASHBOARD_CACHE_TTL) e é limpa a cada escrita em reservas.
+    chave = (data_alvo, turno_alvo.lower())
+    corpo = dashboard_cache.get(chave)
+    if corpo is None:
+        geracao = dashboard_cache.geracao # Lida antes da consulta: escrita concorrente descarta este corpo no set()
+        # Chama a função CRUD para obter os dados do dashboard.
+        # O CRUD lida com a lógica de filtrar e adaptar para o schema de saída.
+        # O CRUD também lida com a validação do turno e erros 400 (não vão para o cache).
+        reservas_dashboard = await crud.obter_reservas_dashboard(
+            session,
+            data_alvo=data_alvo, # Passa a data (objeto date)
+            turno_alvo=turno_alvo # Passa o turno (string)
+        )
+        corpo = _DASHBOARD_ADAPTER.dump_json(reservas_dashboard)
+        dashboard_cache.set(chave, corpo, geracao)
+
+    # Retorna o JSON da lista de ReservaDashboard.
+    return Response(content=corpo, media_type="application/json")
 
@@ -5,8 +5,8 @@
 # =============================================
 # Importações
 # =============================================
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlmodel import Session # Importa Session para tipagem da dependência de sessão
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query
+from sqlmodel.ext.asyncio.session import AsyncSession # Importa AsyncSession para tipagem da dependência de sessão
 from fastapi.security import OAuth2PasswordRequestForm # Schema padrão para form login
 from uuid import UUID # Importa UUID para tipagem de IDs
 from typing import List # Importa List para schemas de listagem
@@ -21,6 +21,7 @@ from app.security import (
     get_current_user, # Dependência para obter o usuário logado (Autenticação JWT)
     get_current_admin # Dependência para obter o usuário admin logado (Autenticação e Autorização)
 )
+from app.responses import json_array_response # Listagens grandes enviadas em streaming
 import app.crud as crud # Importa o módulo CRUD como 'crud' para chamar suas funções
 from app.models import Usuario, TipoUsuario # Importa modelos (útil para tipagem de dependências como get_current_user/admin)
 
@@ -31,15 +32,19 @@ from app.models import Usuario, TipoUsuario # Importa modelos (útil para tipage
 # O prefixo da URL (/usuarios) será definido no main.py ao incluir este router.
 router = APIRouter(tags=["usuarios"])
 
+# Tamanho máximo de um lote em POST /usuarios/lote: cada usuário custa um hash bcrypt no executor
+# compartilhado com login/cadastro, e o lote inteiro roda em uma única transação.
+USUARIOS_LOTE_MAX = 200
+
 # =============================================
 # Criar Usuário (Acesso Público)
 # Rota: POST / (dentro deste router) -> /usuarios/ (URL final)
 # =============================================
 @router.post("/", response_model=UsuarioRead, status_code=status.HTTP_201_CREATED)
 # Esta rota é pública, não precisa de dependências de segurança no header/token.
-def criar_usuario(
+async def criar_usuario(
     usuario_create: UsuarioCreate, # Dados de entrada validados pelo schema
-    session: Session = Depends(get_session) # Dependência da sessão do DB
+    session: AsyncSession = Depends(get_session) # Dependência da sessão do DB
 ):
     """
     Cria um novo usuário no sistema com privilégios padrão (user).
@@ -48,7 +53,26 @@ def criar_usuario(
     Lança 400 se o email já estiver em uso.
     """
     # Chama a função CRUD para criar o usuário. O CRUD lida com a lógica e erros.
-    return crud.criar_usuario(usuario_create, session)
+    return await crud.criar_usuario(usuario_create, session)
+
+# =============================================
+# Criar Usuários em Lote (Restrito a Admin)
+# Rota: POST /lote (dentro deste router) -> /usuarios/lote (URL final)
+# =============================================
+@router.post("/lote", response_model=List[UsuarioRead], status_code=status.HTTP_201_CREATED)
+# Requer que o usuário logado seja um administrador.
+async def criar_usuarios_lote(
+    usuarios_create: List[UsuarioCreate] = Body(..., max_length=USUARIOS_LOTE_MAX), # Lista de usuários validados pelo schema (no máximo USUARIOS_LOTE_MAX)
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
+    admin_user: Usuario = Depends(get_current_admin) # <--- Dependência de segurança! Requer admin logado.
+):
+    """
+    Cria vários usuários (tipo 'user') de uma vez, em uma única transação.
+    Requer autenticação e privilégios de administrador.
+    E-mails já cadastrados são ignorados; retorna apenas os usuários efetivamente criados.
+    Lança 422 se o lote tiver mais de USUARIOS_LOTE_MAX usuários.
+    """
+    return await crud.criar_usuarios_bulk(session, usuarios_create)
 
 # =============================================
 # Login (Acesso Público)
@@ -57,21 +81,21 @@ def criar_usuario(
 @router.post("/login", response_model=Token) # Define o schema de resposta (Token)
 # Esta rota é pública, não precisa de dependências de segurança.
 # A dependência OAuth2PasswordRequestForm lida com os dados de entrada do formulário.
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(), # Dependência para obter email/senha do form (espera 'username' e 'password')
-    session: Session = Depends(get_session) # Dependência da sessão do DB
+    session: AsyncSession = Depends(get_session) # Dependência da sessão do DB
 ):
     """
     Autentica um usuário com email e senha fornecidos em um formulário.
     Em caso de sucesso, retorna um token de acesso JWT.
     Lança 401 Unauthorized se as credenciais forem inválidas.
     """
-    # Chama a função CRUD para autenticar o usuário. Ela retorna Usuario ou None.
+    # Chama a função CRUD para autenticar o usuário. Ela retorna o ID do usuário ou None.
     # form_data.username contém o email, form_data.password contém a senha.
-    usuario = crud.autenticar_usuario(session, form_data.username, form_data.password)
+    usuario_id = await crud.autenticar_usuario(session, form_data.username, form_data.password)
 
     # Se a autenticação falhou (retornou None), levanta HTTPException 401.
-    if not usuario:
+    if not usuario_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Credenciais inválidas.",
@@ -80,10 +104,10 @@ def login(
 
     # Se autenticado com sucesso, cria o token de acesso.
     # O payload do token deve conter o 'sub' (subject), que aqui é o ID do usuário (como string).
-    access_token = create_access_token(data={"sub": str(usuario.id)})
+    access_token = create_access_token(data={"sub": str(usuario_id)})
 
     # Opcional: Se também precisar de refresh tokens, crie aqui
-    # refresh_token = create_refresh_token(data={"sub": str(usuario.id)})
+    # refresh_token = create_refresh_token(data={"sub": str(usuario_id)})
 
     # Retorna o token de acesso (e refresh token opcional) no formato do schema Token.
     # O response_model=Token garante a formatação correta.
@@ -97,7 +121,7 @@ def login(
 @router.get("/me", response_model=UsuarioRead) # Rota /me (dentro deste router)
 # Esta rota requer que o usuário esteja logado. A dependência get_current_user cuidará disso.
 # O cadeado aparecerá automaticamente.
-def ler_meu_perfil(
+async def ler_meu_perfil(
     usuario: Usuario = Depends(get_current_user) # <--- Dependência de segurança! Injeta o usuário autenticado.
 ):
     """
@@ -114,9 +138,9 @@ def ler_meu_perfil(
 # =============================================
 @router.get("/{usuario_id}", response_model=UsuarioRead)
 # Esta rota requer autenticação. A dependência get_current_user cuidará disso.
-def obter_usuario_por_id(
+async def obter_usuario_por_id(
     usuario_id: UUID, # Path parameter: UUID do usuário a ser buscado. FastAPI/Pydantic converterá a string do URL para UUID.
-    session: Session = Depends(get_session), # Dependência da sessão do DB
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
     current_user: Usuario = Depends(get_current_user) # <--- Dependência de segurança! Obtém o usuário logado (requer token).
 ):
     """
@@ -131,7 +155,7 @@ def obter_usuario_por_id(
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso negado. Você só pode ver seu próprio perfil ou precisa ser admin.")
 
     # Chama a função CRUD para buscar o usuário pelo ID. O CRUD lida com o erro 404.
-    usuario = crud.obter_usuario(session, usuario_id)
+    usuario = await crud.obter_usuario(session, usuario_id)
 
     # Se chegou aqui, o usuário foi encontrado e a autenticação/autorização (se implementada) passou.
     return usuario # FastAPI serializará para UsuarioRead.
@@ -143,9 +167,9 @@ def obter_usuario_por_id(
 @router.patch("/{usuario_id}/promover", response_model=UsuarioRead)
 # Esta rota requer que o usuário logado seja um administrador. A dependência get_current_admin cuidará disso.
 # O cadeado aparecerá automaticamente.
-def promover_usuario(
+async def promover_usuario(
     usuario_id: UUID, # Path parameter: UUID do usuário a ser promovido.
-    session: Session = Depends(get_session), # Dependência da sessão do DB
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
     admin_user: Usuario = Depends(get_current_admin) # <--- Dependência de segurança! Requer admin logado.
 ):
     """
@@ -158,7 +182,7 @@ def promover_usuario(
 
     # Chama a função CRUD para promover o usuário. Ela busca, atualiza e salva.
     # A função também trata o erro 404 se o usuário a ser promovido não for encontrado.
-    promovido = crud.promover_usuario_admin(session, usuario_id)
+    promovido = await crud.promover_usuario_admin(session, usuario_id)
 
     # Retorna o objeto do usuário promovido.
     return promovido
@@ -170,9 +194,9 @@ def promover_usuario(
 # =============================================
 @router.patch("/{usuario_id}/rebaixar", response_model=UsuarioRead) # Use response_model=UsuarioRead para retornar o usuário atualizado
 # Requer que o usuário logado seja um administrador.
-def rebaixar_usuario_endpoint( # Nome do endpoint
+async def rebaixar_usuario_endpoint( # Nome do endpoint
     usuario_id: UUID, # Path parameter: UUID do usuário a ser rebaixado.
-    session: Session = Depends(get_session), # Dependência da sessão do DB
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
     admin_user: Usuario = Depends(get_current_admin) # <--- Dependência de segurança! Requer admin logado.
 ):
     """
@@ -192,7 +216,7 @@ def rebaixar_usuario_endpoint( # Nome do endpoint
     # Chama a função CRUD para rebaixar o usuário.
     # crud.rebaixar_admin_para_usuario busca o usuário, verifica se ele é admin, atualiza o tipo e commita.
     # Ela trata o erro 404 (não encontrado) e 400 (não é admin).
-    rebaixado = crud.rebaixar_admin_para_usuario(session, usuario_id) # Passa o ID para o CRUD
+    rebaixado = await crud.rebaixar_admin_para_usuario(session, usuario_id) # Passa o ID para o CRUD
 
     # Retorna o objeto do usuário rebaixado, que será serializado pelo response_model.
     return rebaixado
@@ -204,9 +228,9 @@ def rebaixar_usuario_endpoint( # Nome do endpoint
 # =============================================
 @router.get("/{usuario_id}/tem-reservas", tags=["usuarios"], status_code=status.HTTP_204_NO_CONTENT) # Usar 204 No Content se tiver reservas, ou 404 Not Found se não tiver
 # Requer que o usuário logado seja um administrador.
-def usuario_tem_reservas_endpoint( # Nome do endpoint
+async def usuario_tem_reservas_endpoint( # Nome do endpoint
     usuario_id: UUID, # Path parameter: UUID do usuário a verificar.
-    session: Session = Depends(get_session), # Dependência da sessão do DB
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
     admin_user: Usuario = Depends(get_current_admin) # <--- Dependência de segurança! Requer admin logado.
 ):
     """
@@ -218,7 +242,7 @@ def usuario_tem_reservas_endpoint( # Nome do endpoint
     # A dependência get_current_admin já garantiu que quem chama é admin.
 
     # Chama a função CRUD para verificar reservas.
-    tem_reservas = crud.usuario_tem_reservas(session, usuario_id)
+    tem_reservas = await crud.usuario_tem_reservas(session, usuario_id)
 
     if tem_reservas:
         # Se tem reservas, retorna 204 No Content.
@@ -237,10 +261,10 @@ def usuario_tem_reservas_endpoint( # Nome do endpoint
 @router.patch("/{usuario_id}", response_model=UsuarioRead)
 # Requer autenticação. Dependência get_current_user cuidará disso.
 # Implemente lógica de autorização interna.
-def atualizar_usuario(
+async def atualizar_usuario(
     usuario_id: UUID, # Path parameter: UUID do usuário a ser atualizado.
     usuario_update: UsuarioUpdate, # Body: Dados para atualização (campos opcionais). Ver schema UsuarioUpdate.
-    session: Session = Depends(get_session), # Dependência da sessão do DB
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
     current_user: Usuario = Depends(get_current_user) # <--- Dependência de segurança! Obtém o usuário logado.
 ):
     """
@@ -254,10 +278,10 @@ def atualizar_usuario(
          raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso negado. Você só pode atualizar seu próprio perfil ou precisa ser admin.")
 
     # Busca o usuário a ser atualizado (a função CRUD já lida com 404).
-    usuario_no_db = crud.obter_usuario(session, usuario_id) # Retorna Usuario ou lança 404
+    usuario_no_db = await crud.obter_usuario(session, usuario_id) # Retorna Usuario ou lança 404
 
     # Chama a função CRUD para realizar a atualização. Ela aplica os dados e salva.
-    updated_usuario = crud.atualizar_usuario(session, usuario_no_db, usuario_update)
+    updated_usuario = await crud.atualizar_usuario(session, usuario_no_db, usuario_update)
 
     return updated_usuario # Retorna o objeto Usuario atualizado.
 
@@ -268,9 +292,9 @@ def atualizar_usuario(
 # =============================================
 @router.delete("/{usuario_id}", response_model=UsuarioRead) # Retorna o objeto deletado ou uma mensagem de sucesso
 # Requer que o usuário logado seja um administrador. Dependência get_current_admin cuidará disso.
-def deletar_usuario(
+async def deletar_usuario(
     usuario_id: UUID, # Path parameter: UUID do usuário a ser deletado.
-    session: Session = Depends(get_session), # Dependência da sessão do DB
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
     admin_user: Usuario = Depends(get_current_admin) # <--- Dependência de segurança! Requer admin logado.
 ):
     """
@@ -282,7 +306,7 @@ def deletar_usuario(
     # A dependência get_current_admin já garantiu que quem chama é admin.
 
     # Chama a função CRUD para deletar o usuário. Ela busca, deleta e commita. Trata 404.
-    deleted_usuario = crud.deletar_usuario(session, usuario_id)
+    deleted_usuario = await crud.deletar_usuario(session, usuario_id)
 
     # Retorna o objeto deletado.
     return deleted_usuario # Ou retorne um dict de sucesso se preferir, mas response_model é UsuarioRead.
@@ -321,18 +345,20 @@ def deletar_usuario(
 # Mas neste código GET "/" é apenas para listar usuários.
 # =============================================
 @router.get("/", response_model=List[UsuarioRead]) # Rota: GET / (dentro deste router) -> /usuarios/ (URL final)
-def listar_usuarios(
-    session: Session = Depends(get_session), # Dependência da sessão do DB
+async def listar_usuarios(
+    session: AsyncSession = Depends(get_session), # Dependência da sessão do DB
     admin_user: Usuario = Depends(get_current_admin), # <--- Dependência de segurança! Requer admin logado.
-    skip: int = 0, # Query parameter opcional para paginação (padrão 0)
-    limit: int = 100 # Query parameter opcional para paginação (padrão 100)
+    skip: int = Query(0, ge=0, description="Número de usuários a pular para paginação"), # Query parameter opcional para paginação (padrão 0)
+    limit: int = Query(100, ge=1, le=1000, description="Número máximo de usuários a retornar") # Query parameter opcional para paginação (padrão 100, máximo 1000)
 ):
     """
     Lista todos os usuários cadastrados com paginação.
     Requer autenticação e privilégios de administrador.
     """
-    # Chama a função CRUD para obter a lista de usuários com paginação.
-    usuarios = crud.obter_usuarios(session, skip=skip, limit=limit)
-
-    # Retorna a lista de objetos Usuario, que será serializada para List[UsuarioRead].
-    return usuarios
\ No newline at end of file
+    # Envia a lista em streaming: os usuários são lidos do banco em lotes (yield_per) e
+    # serializados aos poucos, então a memória não cresce com 'limit'.
+    # O corpo é o mesmo array de UsuarioRead; response_model continua documentando o formato.
+    return json_array_response(
+        crud.stream_usuarios(session, skip=skip, limit=limit),
+        UsuarioRead
+    )
\ No newline at end of file
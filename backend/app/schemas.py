@@ -6,7 +6,7 @@
 # Importações
 # =============================================
 from sqlmodel import SQLModel, Field # Importa o base para definir schemas
-from pydantic import EmailStr, validator # Importa tipos específicos e o decorador validator
+from pydantic import EmailStr, validator, ConfigDict # Importa tipos específicos, o decorador validator e ConfigDict
 from typing import Optional, List # Importa Optional para campos opcionais e List para listas paginadas/coleções
 from .models import TipoUsuario, TipoAmbiente, StatusReserva # Importa Enum
 
@@ -14,6 +14,11 @@ from datetime import datetime, timezone, timedelta # Importa datetime para campo
 import re # Importa regex para validações de string
 import uuid # Importa uuid para lidar com IDs do tipo UUID
 
+# Configuração compartilhada pelos schemas de LEITURA (respostas da API).
+# from_attributes: lê direto dos atributos da instância ORM (getattr), sem converter para dict.
+# Só os campos declarados no schema são lidos; os demais atributos do objeto são ignorados.
+READ_CONFIG = ConfigDict(from_attributes=True)
+
 # =============================================
 # Schemas Base
 # =============================================
@@ -86,8 +91,7 @@ class UsuarioRead(UsuarioBase):
     data_criacao: datetime # Data e hora da criação do usuário
 
     # Configuração necessária para que o Pydantic possa ler dados de uma instância do modelo ORM (SQLModel).
-    class Config:
-        from_attributes = True      
+    model_config = READ_CONFIG
 
 
 # Esquema para atualização de usuário (campos opcionais para atualização parcial via PATCH).
@@ -174,8 +178,7 @@ class AmbienteRead(AmbienteBase): # Herda de AmbienteBase
     ativo: bool # Status de ativação do ambiente
 
     # Configuração necessária para ler de uma instância do modelo ORM (Ambiente).
-    class Config:
-        from_attributes = True
+    model_config = READ_CONFIG
 
 
 # Esquema para atualização de ambiente (campos opcionais para atualização parcial via PATCH).
@@ -248,12 +251,21 @@ class ReservaBase(SQLModel):
     #      return dt # Retorna o datetime (agora ciente de fuso horário se era string/ingênuo)
 
 
+    # **VALIDADOR DE FUSO HORÁRIO**
+    # Datas sem fuso são tratadas como UTC. Sem isso, comparar naive com aware levantaria TypeError
+    # e o modelo Reserva recusaria a data naive no INSERT (ambos viravam erro 500).
+    @validator('data_inicio', 'data_fim')
+    def datas_em_utc(cls, v: Optional[datetime]) -> Optional[datetime]:
+        if v is not None and v.tzinfo is None:
+            return v.replace(tzinfo=timezone.utc)
+        return v
+
     # **VALIDADOR DATA FIM DEPOIS DE DATA INICIO**
     @validator('data_fim')
     def data_fim_depois_data_inicio(cls, v: datetime, values): # v: data_fim
-        # Nota: datas_futuras já rodou, v e values['data_inicio'] DEVEM ser datetimes (agora cientes)
+        # Nota: datas_em_utc já rodou, v e values['data_inicio'] são datetimes cientes de fuso
         if 'data_inicio' in values and values['data_inicio'] is not None and v is not None:
-             if v <= values['data_inicio']: # Comparação segura entre datetimes (agora cientes)
+             if v <= values['data_inicio']: # Comparação segura entre datetimes cientes
                  raise ValueError('Data fim deve ser posterior à data início')
         return v
 
@@ -279,8 +291,7 @@ class ReservaRead(ReservaBase): # Herda de ReservaBase
 
     # Configuração necessária para ler de uma instância do modelo ORM (Reserva),
     # incluindo relacionamentos carregados.
-    class Config:
-        from_attributes = True
+    model_config = READ_CONFIG
 
 
 # Esquema para atualização de reserva (campos opcionais via PATCH).
@@ -325,8 +336,7 @@ class HistoricoReservaRead(SQLModel):
     status: StatusReserva
     motivo: str
 
-    class Config:
-        from_attributes = True
+    model_config = READ_CONFIG
 
 
 # =============================================
@@ -349,8 +359,18 @@ class ReservaDashboard(SQLModel):
 
     # Configuração necessária para ler de um resultado de query (que pode não ser um modelo completo)
     # ou de um dicionário/objeto criado no CRUD.
-    class Config:
-        from_attributes = True # Útil se os dados vierem de um resultado ORM ou objeto com atributos
+    model_config = READ_CONFIG
+
+
+# =============================================
+# Schemas de Respostas Simples
+# =============================================
+# Com response_model declarado, o FastAPI serializa a resposta direto para bytes JSON
+# pelo Pydantic (caminho rápido), em vez de passar o dict pelo jsonable_encoder + json.dumps.
+
+class ReservasMovidasResposta(SQLModel):
+    """Resposta de POST /reservas/mover-expiradas."""
+    movidas: int # Quantidade de reservas movidas para o histórico
 
 
 # ... (Outros schemas) ...
\ No newline at end of file
@@ -5,13 +5,15 @@
 # Importações para segurança
 # =============================================
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from uuid import UUID
 from typing import Dict # Importação específica para Dict
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from passlib.context import CryptContext
 
 from app.database import get_session
@@ -20,7 +22,12 @@ from app.models import Usuario, TipoUsuario # Importa o modelo Usuario e o Enum
 # =============================================
 # Hash de Senhas com Bcrypt
 # =============================================
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Custo (rounds) do bcrypt, configurável por variável de ambiente. Cada +1 dobra o tempo de CPU
+# por hash: é o ajuste entre segurança e vazão de logins. Hashes gravados com um custo diferente
+# são recalculados automaticamente no próximo login bem-sucedido (ver password_needs_rehash).
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def hash_password(senha: str) -> str:
     """Gera um hash seguro da senha do usuário"""
@@ -30,6 +37,27 @@ def verify_password(senha_plain: str, senha_hash: str) -> bool:
     """Verifica se a senha em texto corresponde ao hash armazenado"""
     return pwd_context.verify(senha_plain, senha_hash)
 
+def password_needs_rehash(senha_hash: str) -> bool:
+    """Indica se o hash foi gerado com parâmetros diferentes dos atuais (ex: outro BCRYPT_ROUNDS)"""
+    return pwd_context.needs_update(senha_hash)
+
+# Executor dedicado para o hash de senhas.
+# O bcrypt é propositalmente lento (~100-500ms por chamada) e libera o GIL enquanto calcula,
+# então um pool de threads do tamanho do número de CPUs permite calcular vários hashes em paralelo
+# sem ocupar o event loop nem o threadpool padrão usado pelas rotas.
+HASH_WORKERS = os.cpu_count() or 1 # Threads do executor (hashes calculados ao mesmo tempo)
+hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="hash_senha")
+
+async def hash_password_async(senha: str) -> str:
+    """Versão assíncrona de hash_password: executa o bcrypt no executor dedicado."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(hash_executor, hash_password, senha)
+
+async def verify_password_async(senha_plain: str, senha_hash: str) -> bool:
+    """Versão assíncrona de verify_password: executa o bcrypt no executor dedicado."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(hash_executor, verify_password, senha_plain, senha_hash)
+
 # =============================================
 # Configurações do JWT
 # =============================================
@@ -114,9 +142,9 @@ def verify_token(token: str) -> Dict:
 # tokenUrl aponta para o endpoint de login onde o cliente obtém o token.
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/usuarios/login") 
 
-def get_current_user(
+async def get_current_user(
     token: str = Depends(oauth2_scheme), # Injete o token do header Authorization
-    session: Session = Depends(get_session) # Injete a sessão do banco de dados
+    session: AsyncSession = Depends(get_session) # Injete a sessão do banco de dados
 ) -> Usuario:
     """
     Obtém o usuário autenticado a partir do token JWT.
@@ -159,7 +187,7 @@ def get_current_user(
         raise credentials_exception from e # Relança como a exceção de credenciais padrão
 
     # Busca o usuário no banco de dados usando o ID extraído
-    usuario = session.get(Usuario, user_id)
+    usuario = await session.get(Usuario, user_id)
     if usuario is None:
         # Se o usuário com o ID do token não for encontrado no banco
         raise credentials_exception
@@ -167,9 +195,12 @@ def get_current_user(
     # Retorna a instância do usuário autenticado
     return usuario
 
-def get_current_admin(user: Usuario = Depends(get_current_user)) -> Usuario:
+async def get_current_admin(user: Usuario = Depends(get_current_user)) -> Usuario:
     """
     Garante que o usuário autenticado (obtido por get_current_user) seja um administrador.
+    O token é decodificado uma única vez por requisição: o FastAPI reaproveita o resultado de
+    get_current_user entre as dependências. É async (sem I/O) para o FastAPI não despachá-la
+    ao threadpool, como faz com dependências síncronas.
 
     Args:
         user: A instância do usuário obtida pela dependência get_current_user.
@@ -291,12 +291,12 @@ function RequestReservaPage() {
                }
            });
 
-           // Se a requisição GET retornar 200 OK, está disponível.
+           // Se a requisição GET retornar 204 No Content, está disponível.
            // Se retornar 409 Conflict, o catch será acionado.
 
-           console.log("Verificação de disponibilidade retornou sucesso (200 OK).");
+           console.log("Verificação de disponibilidade retornou sucesso (204 No Content).");
 
-           return {}; // Retorna objeto vazio (sem erros) se a API retornar 200
+           return {}; // Retorna objeto vazio (sem erros) se a API retornar 204
 
       } catch (err: any) {
           console.error("Erro na verificação de disponibilidade:", err);